@@ -0,0 +1,196 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from mineru_ocr import mineru_api_url, request_mineru_sharded, request_mineru_translate
+from concurrent_translate import translate_paper
+from service.llm_client import ensure_pool_size
+from service.providers import ProviderRouter
+from service.rate_limiter import RateLimiter
+
+# 队列中表示"上游已结束"的标记
+_DONE = None
+
+
+def _collect_pdfs(input_path: str) -> List[str]:
+    if os.path.isdir(input_path):
+        return sorted(
+            os.path.join(input_path, name)
+            for name in os.listdir(input_path)
+            if name.lower().endswith(".pdf")
+        )
+    return [input_path]
+
+
+def batch_translate(
+    input_path: str,
+    output_dir: str = "./output",
+    lang: str = "en",
+    ocr_workers: int = 1,
+    paper_workers: int = 2,
+    llm_workers: int = 16,
+    queue_size: int = 4,
+    max_tokens: int = 2048,
+    max_retries: int = 3,
+    delete_zip: bool = True,
+    mineru_url: Optional[str] = None,
+    pages_per_shard: int = 0,
+    mineru_urls: Optional[List[str]] = None
+) -> List[Dict]:
+    """
+    批量翻译一个文件夹中的 PDF：OCR 与翻译两个阶段流水线并行。
+
+    - OCR 阶段：ocr_workers 个线程依次调用 MinerU，产出的 Markdown 路径放入有界队列；
+      队列满时 OCR 暂停，避免 OCR 远远领先于翻译而堆积；
+    - 翻译阶段：paper_workers 个线程从队列取论文并调用 translate_paper，
+      所有论文共用一个 llm_workers 大小的 LLM 线程池、同一份 RPM/TPM 限流预算与多提供商路由器（若已配置），
+      前一篇论文的尾部块还在翻译时，下一篇论文的块就可以填满空闲的工作线程。
+
+    Args:
+        input_path: PDF 文件夹路径（或单个 PDF 文件）
+        output_dir: OCR 结果与译文的输出根目录
+        lang: OCR 语言
+        ocr_workers: 同时进行 OCR 的论文数
+        paper_workers: 同时进行翻译的论文数
+        llm_workers: 全局 LLM 工作线程数（所有论文共享）
+        queue_size: OCR 与翻译之间的队列容量
+        max_tokens: 每个块的最大 token 数
+        max_retries: 每个块的最大重试次数
+        delete_zip: OCR 解压后是否删除 zip 包
+        mineru_url: MinerU 接口地址，None 时使用 mineru_ocr 的默认地址
+        pages_per_shard: 大于 0 时按该页数对每篇论文分片并行 OCR（见 request_mineru_sharded）
+        mineru_urls: 分片 OCR 可使用的多个 MinerU 实例地址，None 时只使用 mineru_url
+
+    Returns:
+        每篇论文的结果列表：{file, markdown, status, ocr_seconds, translate_seconds}，按输入顺序排列
+    """
+    pdf_files = _collect_pdfs(input_path)
+    if not pdf_files:
+        print(f"未找到需要翻译的 PDF: {input_path}")
+        return []
+
+    print(f"批量翻译 {len(pdf_files)} 篇论文: OCR 并发 {ocr_workers}, 论文并发 {paper_workers}, LLM 并发 {llm_workers}\n")
+
+    todo: "queue.Queue[Optional[int]]" = queue.Queue()
+    for i in range(len(pdf_files)):
+        todo.put(i)
+    ready: "queue.Queue[Optional[int]]" = queue.Queue(maxsize=queue_size)
+
+    results: List[Dict] = [
+        {"file": path, "markdown": "", "status": "pending", "ocr_seconds": 0.0, "translate_seconds": 0.0}
+        for path in pdf_files
+    ]
+    lock = threading.Lock()
+    finished = [0]
+    start = time.monotonic()
+
+    ensure_pool_size(llm_workers)
+    llm_pool = ThreadPoolExecutor(max_workers=llm_workers, thread_name_prefix="llm")
+    router = ProviderRouter.from_env()
+    # 多提供商时各自按 {NAME}_RPM / {NAME}_TPM 限流
+    rate_limiter = RateLimiter.from_env("DEEPSEEK") if router is None else None
+
+    def report(i: int) -> None:
+        with lock:
+            finished[0] += 1
+            result = results[i]
+            mark = "✓" if result["status"] == "done" else "❌"
+            print(
+                f"\n[{finished[0]}/{len(pdf_files)}] {mark} {os.path.basename(result['file'])}: "
+                f"{result['status']}, OCR {result['ocr_seconds']:.0f}s, 翻译 {result['translate_seconds']:.0f}s, "
+                f"已用时 {time.monotonic() - start:.0f}s"
+            )
+
+    def ocr_stage() -> None:
+        while True:
+            try:
+                i = todo.get_nowait()
+            except queue.Empty:
+                return
+            t0 = time.monotonic()
+            try:
+                if pages_per_shard > 0:
+                    md_path = request_mineru_sharded(
+                        filepath=pdf_files[i], urls=mineru_urls or [mineru_url or mineru_api_url],
+                        output_dir=output_dir, lang=lang, pages_per_shard=pages_per_shard,
+                        delete_zip=delete_zip
+                    )
+                else:
+                    md_path = request_mineru_translate(
+                        filepath=pdf_files[i], url=mineru_url or mineru_api_url, output_dir=output_dir,
+                        lang=lang, extract_zip_after=True, delete_zip=delete_zip
+                    )
+            except Exception as e:
+                print(f"OCR 出错 {pdf_files[i]}: {e}")
+                md_path = ""
+            results[i]["ocr_seconds"] = time.monotonic() - t0
+            if not md_path.endswith(".md"):
+                results[i]["status"] = "ocr_failed"
+                report(i)
+                continue
+            results[i]["markdown"] = md_path
+            # 队列满时阻塞，等待翻译阶段赶上
+            ready.put(i)
+
+    def translate_stage() -> None:
+        while True:
+            i = ready.get()
+            if i is _DONE:
+                return
+            t0 = time.monotonic()
+            try:
+                ok = translate_paper(
+                    input_md_path=results[i]["markdown"],
+                    max_tokens=max_tokens,
+                    max_workers=llm_workers,
+                    max_retries=max_retries,
+                    executor=llm_pool,
+                    rate_limiter=rate_limiter,
+                    router=router
+                )
+            except Exception as e:
+                # 单篇论文出错不能让翻译线程退出，否则队列无人消费，OCR 线程会一直阻塞
+                print(f"翻译出错 {results[i]['markdown']}: {e}")
+                ok = False
+            results[i]["translate_seconds"] = time.monotonic() - t0
+            results[i]["status"] = "done" if ok else "translate_failed"
+            report(i)
+
+    ocr_threads = [threading.Thread(target=ocr_stage, name=f"ocr-{k}") for k in range(ocr_workers)]
+    translate_threads = [threading.Thread(target=translate_stage, name=f"paper-{k}") for k in range(paper_workers)]
+    for thread in ocr_threads + translate_threads:
+        thread.start()
+
+    for thread in ocr_threads:
+        thread.join()
+    # OCR 全部结束后，给每个翻译线程发送结束标记
+    for _ in translate_threads:
+        ready.put(_DONE)
+    for thread in translate_threads:
+        thread.join()
+    llm_pool.shutdown(wait=True)
+    if router is not None:
+        router.close()
+
+    done = sum(1 for r in results if r["status"] == "done")
+    print(f"\n批量翻译完成: 成功 {done}/{len(pdf_files)}, 总耗时 {time.monotonic() - start:.0f}s")
+    for result in results:
+        if result["status"] != "done":
+            print(f"  ❌ {result['file']}: {result['status']}")
+    return results
+
+
+if __name__ == "__main__":
+    # 示例用法
+    batch_translate(
+        input_path="./papers",
+        output_dir="./output",
+        lang="en",
+        ocr_workers=1,     # MinerU 通常只有一个 GPU 实例
+        paper_workers=2,   # 同时翻译的论文数
+        llm_workers=16,    # 所有论文共享的 LLM 并发数
+        queue_size=4
+    )
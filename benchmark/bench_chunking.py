@@ -0,0 +1,169 @@
+"""
+分块与分词微基准：对不同大小的合成论文，分别记录 chunk_md 各阶段的耗时与峰值内存（tracemalloc），
+写入 JSON 报告；传入 --baseline 时与旧报告对比，超出容差的阶段视为性能回退并以非零状态退出。
+
+阶段:
+    split_by_headings          读取文件并按标题切分
+    merge_major_headings       按 "# 1" 式一级章节合并
+    count_tokens_batch         对合并后的章节批量分词
+    count_tokens_full_text     对全文一次性分词
+    greedy_merge_chunks        贪心合并
+    greedy_merge_approximate   贪心合并（近似 token 计数，接近上限时精确分词）
+    balanced_merge_chunks      均衡合并
+    chunk_md                   端到端分块（greedy）
+    iter_chunks                流式分块（mmap 单遍扫描，结果与 chunk_md 相同）
+
+用法:
+    python -m benchmark.bench_chunking
+    python -m benchmark.bench_chunking --sizes 10KB 1MB 10MB 100MB --output bench_chunking.json
+    python -m benchmark.bench_chunking --baseline bench_chunking.json --tolerance 0.25
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+from chunk_md import (
+    balanced_merge_chunks,
+    chunk_md,
+    greedy_merge_chunks,
+    iter_chunks,
+    merge_chunks_by_major_headings,
+    split_by_headings,
+)
+from service.count_token import count_tokens, count_tokens_batch
+
+from benchmark.synthetic_paper import parse_size, write_paper
+
+
+def measure(func: Callable, *args, repeat: int = 1, memory: bool = True, **kwargs) -> Tuple[object, float, int]:
+    """
+    运行 func，返回 (结果, 最短耗时秒数, 峰值内存字节数)。
+
+    耗时在未开启 tracemalloc 时测量（tracemalloc 本身会显著拖慢分配密集的代码），
+    峰值内存在额外的一次运行中用 tracemalloc 测量；memory=False 时跳过内存测量并返回 0。
+    """
+    best = float("inf")
+    result = None
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+
+    peak = 0
+    if memory:
+        tracemalloc.start()
+        try:
+            func(*args, **kwargs)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return result, best, peak
+
+
+def bench_file(path: str, max_tokens: int, repeat: int, memory: bool) -> List[Dict]:
+    """
+    对一个 Markdown 文件依次测量各个分块阶段，前一阶段的结果作为后一阶段的输入。
+    """
+    rows = []
+
+    def run(stage: str, func: Callable, *args, **kwargs):
+        result, seconds, peak = measure(func, *args, repeat=repeat, memory=memory, **kwargs)
+        rows.append({"stage": stage, "seconds": round(seconds, 4), "peak_bytes": peak})
+        print(f"  {stage:<24} {seconds:>9.3f}s  {peak / 1024 / 1024:>9.1f} MB")
+        return result
+
+    sections = run("split_by_headings", split_by_headings, path)
+    sections_str = [''.join(section) for section in sections]
+    merged = run("merge_major_headings", merge_chunks_by_major_headings, sections_str)
+    run("count_tokens_batch", count_tokens_batch, merged)
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    run("count_tokens_full_text", count_tokens, text)
+    del text
+    run("greedy_merge_chunks", greedy_merge_chunks, merged, max_tokens=max_tokens)
+    run("greedy_merge_approximate", greedy_merge_chunks, merged, max_tokens=max_tokens, approximate=True)
+    run("balanced_merge_chunks", balanced_merge_chunks, merged, max_tokens=max_tokens)
+    run("chunk_md", chunk_md, path, max_tokens=max_tokens)
+    run("iter_chunks", lambda: list(iter_chunks(path, max_tokens=max_tokens)))
+    return rows
+
+
+def compare(results: List[Dict], baseline: List[Dict], tolerance: float, min_seconds: float) -> List[str]:
+    """
+    与基线报告逐项对比，返回超出容差的回退描述。耗时低于 min_seconds 的阶段只比较内存，避免计时噪声误报。
+    """
+    old = {(r["size"], r["stage"]): r for r in baseline}
+    regressions = []
+    for r in results:
+        base = old.get((r["size"], r["stage"]))
+        if base is None:
+            continue
+        if base["seconds"] >= min_seconds and r["seconds"] > base["seconds"] * (1 + tolerance):
+            regressions.append(
+                f"{r['size']} {r['stage']}: 耗时 {base['seconds']:.3f}s → {r['seconds']:.3f}s"
+            )
+        if base["peak_bytes"] and r["peak_bytes"] > base["peak_bytes"] * (1 + tolerance):
+            regressions.append(
+                f"{r['size']} {r['stage']}: 峰值内存 {base['peak_bytes'] / 1024 / 1024:.1f} MB "
+                f"→ {r['peak_bytes'] / 1024 / 1024:.1f} MB"
+            )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="chunk_md 各阶段的耗时与峰值内存基准")
+    parser.add_argument("--sizes", nargs="+", default=["10KB", "1MB", "10MB"], help="合成论文大小列表，如 10KB 1MB 100MB")
+    parser.add_argument("--max-tokens", type=int, default=2048)
+    parser.add_argument("--repeat", type=int, default=3, help="每个阶段重复次数，取最短耗时")
+    parser.add_argument("--no-memory", action="store_true", help="不测量峰值内存（更快）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_chunking.json", help="JSON 报告路径")
+    parser.add_argument("--baseline", default=None, help="用于对比的旧报告")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="允许的相对回退幅度")
+    parser.add_argument("--min-seconds", type=float, default=0.05, help="低于该耗时的阶段不比较耗时")
+    args = parser.parse_args()
+
+    # 先加载分词器，避免把编码器初始化计入第一个阶段
+    count_tokens("warm up")
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for size in args.sizes:
+            path = os.path.join(work_dir, f"paper_{size}.md")
+            written = write_paper(path, parse_size(size), seed=args.seed)
+            print(f"\n[{size}] 合成论文 {written / 1024 / 1024:.2f} MB")
+            for row in bench_file(path, args.max_tokens, args.repeat, not args.no_memory):
+                results.append({"size": size, "bytes": written, **row})
+            os.remove(path)
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "max_tokens": args.max_tokens,
+        "repeat": args.repeat,
+        "results": results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n报告已保存到: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance, args.min_seconds)
+        if regressions:
+            print(f"\n❌ 发现 {len(regressions)} 项性能回退（容差 {args.tolerance:.0%}）:")
+            for line in regressions:
+                print(f"  - {line}")
+            sys.exit(1)
+        print(f"\n✅ 与基线相比没有超过 {args.tolerance:.0%} 的回退")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+greedy_merge_chunks 性能基准：对比旧的二次复杂度实现与当前的线性实现。
+
+用法:
+    python -m benchmark.bench_greedy_merge                      # 使用合成的大型 Markdown
+    python -m benchmark.bench_greedy_merge path/to/paper.md     # 使用指定文件
+    python -m benchmark.bench_greedy_merge --sections 2000 --max-tokens 8192
+"""
+import argparse
+import random
+import time
+from typing import List
+
+from chunk_md import split_by_headings, greedy_merge_chunks
+from service.count_token import count_tokens
+
+
+def greedy_merge_chunks_quadratic(chunks: List[str], max_tokens: int = 2048) -> List[str]:
+    """
+    旧实现（作为对照）：每次迭代都对整个增长中的缓冲区重新分词。
+    """
+    result = []
+    current_merged = ""
+    for chunk in chunks:
+        chunk_tokens = count_tokens(chunk)
+        if chunk_tokens > max_tokens:
+            if current_merged:
+                result.append(current_merged)
+                current_merged = ""
+            result.append(chunk)
+            continue
+        if count_tokens(current_merged + chunk) <= max_tokens:
+            current_merged += chunk
+        else:
+            if current_merged:
+                result.append(current_merged)
+            current_merged = chunk
+    if current_merged:
+        result.append(current_merged)
+    return result
+
+
+def synthetic_sections(num_sections: int, seed: int = 0) -> List[str]:
+    """
+    生成若干带小节标题的英文段落，大部分很短，模拟 MinerU 输出中密集的小标题。
+    """
+    rng = random.Random(seed)
+    words = (
+        "model training data attention layer token transformer result method "
+        "baseline evaluation dataset performance loss gradient parameter"
+    ).split()
+    sections = []
+    for i in range(num_sections):
+        paragraph_count = rng.randint(1, 4)
+        paragraphs = []
+        for _ in range(paragraph_count):
+            sentence_count = rng.randint(2, 8)
+            sentences = [
+                " ".join(rng.choice(words) for _ in range(rng.randint(8, 25))).capitalize() + "."
+                for _ in range(sentence_count)
+            ]
+            paragraphs.append(" ".join(sentences) + "\n")
+        sections.append(f"## {i // 10 + 1}.{i % 10 + 1} Section {i}\n" + "".join(paragraphs))
+    return sections
+
+
+def _time(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="greedy_merge_chunks 性能基准")
+    parser.add_argument("markdown", nargs="?", help="Markdown 文件路径，不指定时使用合成数据")
+    parser.add_argument("--sections", type=int, default=1000, help="合成数据的小节数")
+    parser.add_argument("--max-tokens", type=int, default=2048)
+    args = parser.parse_args()
+
+    if args.markdown:
+        # 直接使用按标题拆分的小节（不做主要章节合并），块数更多，更能体现合并阶段的开销
+        chunks = [''.join(c) for c in split_by_headings(args.markdown)]
+    else:
+        chunks = synthetic_sections(args.sections)
+
+    total_chars = sum(len(c) for c in chunks)
+    print(f"输入: {len(chunks)} 个块, {total_chars / 1024:.0f} KB, max_tokens={args.max_tokens}")
+
+    # 预热编码器，避免把加载 BPE 表的时间算进第一个实现
+    count_tokens("warm up")
+
+    old_result, old_time = _time(greedy_merge_chunks_quadratic, chunks, args.max_tokens)
+    new_result, new_time = _time(greedy_merge_chunks, chunks, args.max_tokens)
+
+    oversized = [count_tokens(c) for c in new_result if count_tokens(c) > args.max_tokens]
+    print(f"旧实现（二次）: {old_time * 1000:8.1f} ms, {len(old_result)} 个块")
+    print(f"新实现（线性）: {new_time * 1000:8.1f} ms, {len(new_result)} 个块")
+    print(f"加速比: {old_time / new_time:.1f}x")
+    print(f"超过 max_tokens 的合并块: {len(oversized)}（仅可能来自本身超限的单个小节）")
+
+
+if __name__ == "__main__":
+    main()
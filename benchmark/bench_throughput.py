@@ -0,0 +1,180 @@
+"""
+端到端吞吐基准：启动本地模拟的 OpenAI 兼容服务，在不同 max_workers / max_tokens 组合下
+对合成论文运行 translate_paper，记录块/秒、token/秒、块延迟 p50/p95 与总耗时，写入 JSON 报告。
+
+用法:
+    python -m benchmark.bench_throughput
+    python -m benchmark.bench_throughput --workers 1 4 16 --max-tokens 1024 2048 --size 200KB
+    python -m benchmark.bench_throughput --error-429 0.1 --retry-after 0.5 --output bench_throughput.json
+"""
+import argparse
+import json
+import os
+import platform
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+import concurrent_translate
+from concurrent_translate import translate_paper
+from service.llm_client import configure_client
+from service.run_metrics import percentile
+
+from benchmark.mock_openai_server import MockOpenAIServer
+from benchmark.synthetic_paper import generate_paper, parse_size
+
+
+class _ChunkTimer:
+    """
+    包装 concurrent_translate.translate_chunk_with_retry，记录每个块从开始处理到完成的耗时（含重试）。
+    """
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self._lock = threading.Lock()
+        self._original = concurrent_translate.translate_chunk_with_retry
+
+    def __enter__(self) -> "_ChunkTimer":
+        original = self._original
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.latencies.append(time.perf_counter() - start)
+
+        concurrent_translate.translate_chunk_with_retry = timed
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        concurrent_translate.translate_chunk_with_retry = self._original
+
+
+def run_case(server: MockOpenAIServer, paper_path: str, work_dir: str, max_workers: int, max_tokens: int, max_retries: int) -> Dict:
+    """
+    运行一组参数并返回该组的指标。每组都关闭缓存与断点续传，保证每个块都真正请求一次服务。
+    """
+    server.reset_stats()
+    output_path = os.path.join(work_dir, f"out_w{max_workers}_t{max_tokens}.md")
+    with _ChunkTimer() as timer:
+        start = time.perf_counter()
+        ok = translate_paper(
+            input_md_path=paper_path,
+            output_md_path=output_path,
+            max_tokens=max_tokens,
+            max_workers=max_workers,
+            max_retries=max_retries,
+            use_cache=False,
+            resume=False,
+            rpm=None,
+            tpm=None,
+        )
+        wall = time.perf_counter() - start
+
+    stats = server.stats()
+    chunks = len(timer.latencies)
+    tokens = stats["prompt_tokens"] + stats["completion_tokens"]
+    return {
+        "max_workers": max_workers,
+        "max_tokens": max_tokens,
+        "ok": ok,
+        "chunks": chunks,
+        "wall_seconds": round(wall, 3),
+        "chunks_per_second": round(chunks / wall, 3) if wall else 0.0,
+        "tokens_per_second": round(tokens / wall, 1) if wall else 0.0,
+        "latency_p50": round(percentile(timer.latencies, 50), 3),
+        "latency_p95": round(percentile(timer.latencies, 95), 3),
+        "requests": stats["requests"],
+        "rate_limited": stats["rate_limited"],
+        "server_errors": stats["server_errors"],
+        "prompt_tokens": stats["prompt_tokens"],
+        "completion_tokens": stats["completion_tokens"],
+        "prompt_cache_hit_tokens": stats["prompt_cache_hit_tokens"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="translate_paper 端到端吞吐基准（本地模拟服务）")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16], help="要测试的 max_workers 列表")
+    parser.add_argument("--max-tokens", type=int, nargs="+", default=[1024, 2048], help="要测试的 max_tokens 列表")
+    parser.add_argument("--size", default="100KB", help="合成论文大小，如 50KB、1MB")
+    parser.add_argument("--paper", default=None, help="使用指定的 Markdown 代替合成论文")
+    parser.add_argument("--max-retries", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=1.0, help="模拟服务基础延迟中位数（秒）")
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--per-token", type=float, default=0.002, help="每个输出 token 的耗时（秒）")
+    parser.add_argument("--error-429", type=float, default=0.0)
+    parser.add_argument("--error-500", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--time-scale", type=float, default=0.1, help="延迟缩放系数，默认把延迟缩短为 1/10")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_throughput.json", help="JSON 报告路径")
+    args = parser.parse_args()
+
+    server = MockOpenAIServer(
+        latency=args.latency,
+        latency_sigma=args.latency_sigma,
+        seconds_per_output_token=args.per_token,
+        error_429_rate=args.error_429,
+        error_500_rate=args.error_500,
+        retry_after=args.retry_after,
+        time_scale=args.time_scale,
+        seed=args.seed,
+    )
+    results = []
+    with server, tempfile.TemporaryDirectory() as work_dir:
+        # 让共享客户端指向模拟服务，并忽略 .env 中真实服务的限流配置
+        os.environ["DEEPSEEK_API_URL"] = server.base_url
+        os.environ["DEEPSEEK_API_KEY"] = "mock-key"
+        os.environ.pop("DEEPSEEK_RPM", None)
+        os.environ.pop("DEEPSEEK_TPM", None)
+        configure_client(max_connections=max(args.workers))
+
+        paper_path = args.paper
+        if paper_path is None:
+            paper_path = os.path.join(work_dir, "synthetic_paper.md")
+            with open(paper_path, 'w', encoding='utf-8') as f:
+                f.write(generate_paper(parse_size(args.size), seed=args.seed))
+
+        for max_tokens in args.max_tokens:
+            for max_workers in args.workers:
+                result = run_case(server, paper_path, work_dir, max_workers, max_tokens, args.max_retries)
+                results.append(result)
+                print(
+                    f"\n[bench] workers={max_workers:<3} max_tokens={max_tokens:<5} "
+                    f"{result['chunks_per_second']:.2f} 块/s, {result['tokens_per_second']:.0f} token/s, "
+                    f"p50 {result['latency_p50']:.2f}s, p95 {result['latency_p95']:.2f}s, 总耗时 {result['wall_seconds']:.1f}s\n"
+                )
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "paper": args.paper or f"synthetic {args.size} (seed={args.seed})",
+        "server": {
+            "latency": args.latency,
+            "latency_sigma": args.latency_sigma,
+            "seconds_per_output_token": args.per_token,
+            "error_429_rate": args.error_429,
+            "error_500_rate": args.error_500,
+            "retry_after": args.retry_after,
+            "time_scale": args.time_scale,
+        },
+        "results": results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(f"{'workers':>8} {'max_tokens':>10} {'块/s':>8} {'token/s':>10} {'p50':>7} {'p95':>7} {'总耗时':>8}")
+    for r in results:
+        print(
+            f"{r['max_workers']:>8} {r['max_tokens']:>10} {r['chunks_per_second']:>8.2f} {r['tokens_per_second']:>10.0f} "
+            f"{r['latency_p50']:>7.2f} {r['latency_p95']:>7.2f} {r['wall_seconds']:>8.1f}"
+        )
+    print(f"\n报告已保存到: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
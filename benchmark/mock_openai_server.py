@@ -0,0 +1,275 @@
+"""
+本地模拟的 OpenAI 兼容 /v1/chat/completions 服务，供吞吐基准测试使用，不消耗真实 API 额度。
+
+- 延迟 = 对数正态分布的基础延迟 + 与输出 token 数成正比的生成耗时，再乘以 time_scale；
+- 可按比例注入 429（附带 Retry-After 头）与 500 错误；
+- 译文直接回显用户消息中的原文，usage 中的 token 数按字符数粗略估算；
+- 模拟 DeepSeek 的上下文硬盘缓存：系统消息与之前的请求相同时，按 64 token 为单位计入 prompt_cache_hit_tokens。
+
+用法:
+    python -m benchmark.mock_openai_server --port 8001 --latency 2.0 --error-429 0.05
+    # 然后在 .env 中设置 DEEPSEEK_API_URL=http://127.0.0.1:8001/v1
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+# 估算 token 数时每个 token 对应的字符数
+CHARS_PER_TOKEN = 4
+# 上下文缓存的存储单位（token）
+CACHE_UNIT_TOKENS = 64
+# llm_translate 在用户消息中放在原文之前的引导语
+_USER_PREFIX = "待翻译的英文论文内容："
+
+
+class MockOpenAIServer:
+    """
+    在后台线程中运行的模拟服务，可作为上下文管理器使用：
+
+        with MockOpenAIServer(latency=1.0, error_429_rate=0.1) as server:
+            os.environ["DEEPSEEK_API_URL"] = server.base_url
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 1.0,
+        latency_sigma: float = 0.5,
+        seconds_per_output_token: float = 0.002,
+        output_ratio: float = 1.0,
+        error_429_rate: float = 0.0,
+        error_500_rate: float = 0.0,
+        retry_after: float = 1.0,
+        time_scale: float = 1.0,
+        seed: int = 0
+    ):
+        """
+        Args:
+            host: 监听地址
+            port: 监听端口，0 表示自动分配
+            latency: 基础延迟的中位数（秒）
+            latency_sigma: 基础延迟对数正态分布的 sigma，0 表示固定延迟
+            seconds_per_output_token: 每个输出 token 额外增加的耗时（秒）
+            output_ratio: 输出 token 数相对于原文 token 数的比例
+            error_429_rate: 返回 429 的概率
+            error_500_rate: 返回 500 的概率
+            retry_after: 429 响应中 Retry-After 头的秒数
+            time_scale: 所有延迟的缩放系数，小于 1 时可以更快地跑完基准
+            seed: 随机数种子
+        """
+        self.latency = latency
+        self.latency_sigma = latency_sigma
+        self.seconds_per_output_token = seconds_per_output_token
+        self.output_ratio = output_ratio
+        self.error_429_rate = error_429_rate
+        self.error_500_rate = error_500_rate
+        self.retry_after = retry_after
+        self.time_scale = time_scale
+
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._stats: Dict = {}
+        self._cached_prefixes = set()
+        self.reset_stats()
+
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._stats = {
+                "requests": 0,
+                "ok": 0,
+                "rate_limited": 0,
+                "server_errors": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "prompt_cache_hit_tokens": 0,
+                "latencies": [],
+            }
+
+    def stats(self) -> Dict:
+        """
+        返回请求计数与 token 统计的快照（latencies 为成功请求的服务端耗时列表）。
+        """
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["latencies"] = list(self._stats["latencies"])
+            return snapshot
+
+    def start(self) -> "MockOpenAIServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "MockOpenAIServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.stop()
+
+    def _draw(self):
+        """
+        抽取一次请求的结果（"429" / "500" / "ok"）与基础延迟。
+        """
+        with self._lock:
+            self._stats["requests"] += 1
+            roll = self._rng.random()
+            if self.latency_sigma > 0:
+                base = self._rng.lognormvariate(math.log(max(self.latency, 1e-6)), self.latency_sigma)
+            else:
+                base = self.latency
+        if roll < self.error_429_rate:
+            return "429", base
+        if roll < self.error_429_rate + self.error_500_rate:
+            return "500", base
+        return "ok", base
+
+    def _complete(self, body: dict):
+        """
+        处理一次 chat.completions 请求，返回 (状态码, 响应头, 响应体)。
+        """
+        outcome, base_latency = self._draw()
+        if outcome == "429":
+            time.sleep(0.05 * self.time_scale)
+            with self._lock:
+                self._stats["rate_limited"] += 1
+            error = {"error": {"message": "Rate limit reached", "type": "rate_limit_error", "code": "rate_limit"}}
+            return 429, {"Retry-After": f"{self.retry_after:g}"}, error
+        if outcome == "500":
+            time.sleep(base_latency * self.time_scale)
+            with self._lock:
+                self._stats["server_errors"] += 1
+            return 500, {}, {"error": {"message": "Internal server error", "type": "server_error"}}
+
+        messages: List[dict] = body.get("messages", [])
+        prompt_text = "".join(str(m.get("content", "")) for m in messages)
+        user_text = str(messages[-1].get("content", "")) if messages else ""
+        source = user_text.split(_USER_PREFIX, 1)[-1].strip()
+        prompt_tokens = max(1, len(prompt_text) // CHARS_PER_TOKEN)
+        completion_tokens = max(1, int(len(source) / CHARS_PER_TOKEN * self.output_ratio))
+        system_text = str(messages[0].get("content", "")) if messages and messages[0].get("role") == "system" else ""
+
+        latency = (base_latency + completion_tokens * self.seconds_per_output_token) * self.time_scale
+        time.sleep(latency)
+        with self._lock:
+            hit_tokens = 0
+            if system_text in self._cached_prefixes:
+                hit_tokens = len(system_text) // CHARS_PER_TOKEN // CACHE_UNIT_TOKENS * CACHE_UNIT_TOKENS
+            elif system_text:
+                self._cached_prefixes.add(system_text)
+            self._stats["prompt_cache_hit_tokens"] += hit_tokens
+            self._stats["ok"] += 1
+            self._stats["prompt_tokens"] += prompt_tokens
+            self._stats["completion_tokens"] += completion_tokens
+            self._stats["latencies"].append(latency)
+
+        return 200, {}, {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": source},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_cache_hit_tokens": hit_tokens,
+                "prompt_cache_miss_tokens": prompt_tokens - hit_tokens,
+            },
+        }
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                raw = self.rfile.read(length) if length else b"{}"
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._reply(404, {}, {"error": {"message": f"unknown path {self.path}"}})
+                    return
+                try:
+                    body = json.loads(raw)
+                except json.JSONDecodeError:
+                    self._reply(400, {}, {"error": {"message": "invalid json"}})
+                    return
+                self._reply(*server._complete(body))
+
+            def _reply(self, status: int, headers: Dict[str, str], payload: dict):
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                # 基准测试时不打印每个请求的访问日志
+                pass
+
+        return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="本地模拟的 OpenAI 兼容 chat.completions 服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=1.0, help="基础延迟中位数（秒）")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="基础延迟对数正态分布的 sigma")
+    parser.add_argument("--per-token", type=float, default=0.002, help="每个输出 token 的耗时（秒）")
+    parser.add_argument("--error-429", type=float, default=0.0, help="返回 429 的概率")
+    parser.add_argument("--error-500", type=float, default=0.0, help="返回 500 的概率")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="429 响应的 Retry-After（秒）")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="所有延迟的缩放系数")
+    args = parser.parse_args()
+
+    server = MockOpenAIServer(
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        latency_sigma=args.latency_sigma,
+        seconds_per_output_token=args.per_token,
+        error_429_rate=args.error_429,
+        error_500_rate=args.error_500,
+        retry_after=args.retry_after,
+        time_scale=args.time_scale,
+    )
+    print(f"模拟服务已启动: {server.base_url}（Ctrl+C 退出）")
+    server.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
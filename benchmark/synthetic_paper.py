@@ -0,0 +1,165 @@
+"""
+合成 MinerU 风格的英文论文 Markdown，供基准测试使用。
+
+用法:
+    python -m benchmark.synthetic_paper output/synthetic.md --size 200KB
+    python -m benchmark.synthetic_paper output/huge.md --size 100MB
+
+内容包括 "# 1" 式的一级章节与 "# 1.1" 式小节、行内与行间 LaTeX 公式、HTML 表格、图片链接与图表标题。
+"""
+import argparse
+import random
+from typing import Iterator, List
+
+_WORDS = (
+    "model training data attention layer token transformer result method baseline "
+    "evaluation dataset performance loss gradient parameter inference latency accuracy "
+    "architecture benchmark encoder decoder embedding representation optimization"
+).split()
+
+_MAJOR_TITLES = ["Introduction", "Related Work", "Method", "Experiments", "Analysis", "Discussion", "Conclusion"]
+
+
+_INLINE_MATH = [r"$x_i$", r"$\mathcal{L}$", r"$O(n^2)$", r"$\alpha = 0.1$", r"$d_{model}$", r"$\nabla_\theta$"]
+
+
+def _sentence(rng: random.Random) -> str:
+    words = [rng.choice(_WORDS) for _ in range(rng.randint(8, 25))]
+    if rng.random() < 0.2:
+        words.insert(rng.randrange(len(words)), rng.choice(_INLINE_MATH))
+    sentence = " ".join(words)
+    return sentence[0].upper() + sentence[1:] + "."
+
+
+def _paragraph(rng: random.Random) -> str:
+    return " ".join(_sentence(rng) for _ in range(rng.randint(2, 8)))
+
+
+def _display_math(rng: random.Random, number: int) -> str:
+    terms = " + ".join(
+        rf"\frac{{{rng.choice('abcdxyz')}_{{{i}}}}}{{\sqrt{{d_k}}}}" for i in range(rng.randint(2, 5))
+    )
+    return "$$\n" + rf"\mathcal{{L}}_{{{number}}} = \sum_{{i=1}}^{{N}} {terms} \tag{{{number}}}" + "\n$$"
+
+
+def _html_table(rng: random.Random, number: int) -> str:
+    """
+    MinerU pipeline 后端输出的 HTML 表格。
+    """
+    cols = rng.randint(3, 6)
+    header = "".join(f"<td>{rng.choice(_WORDS).capitalize()}</td>" for _ in range(cols))
+    rows = "".join(
+        "<tr>" + "".join(f"<td>{rng.uniform(0, 100):.2f}</td>" for _ in range(cols)) + "</tr>"
+        for _ in range(rng.randint(3, 10))
+    )
+    caption = f"Table {number}: {_sentence(rng)}"
+    return f"{caption}\n\n<html><body><table><tr>{header}</tr>{rows}</table></body></html>"
+
+
+def _image(rng: random.Random, number: int) -> str:
+    name = "%064x" % rng.getrandbits(256)
+    return f"![](images/{name}.jpg)\n\nFigure {number}: {_sentence(rng)}"
+
+
+def _body_block(rng: random.Random, counters: dict) -> str:
+    """
+    正文中的一个块：大多是段落，偶尔是行间公式、表格或图片。
+    """
+    roll = rng.random()
+    if roll < 0.08:
+        counters["equation"] += 1
+        return _display_math(rng, counters["equation"])
+    if roll < 0.12:
+        counters["table"] += 1
+        return _html_table(rng, counters["table"])
+    if roll < 0.17:
+        counters["figure"] += 1
+        return _image(rng, counters["figure"])
+    return _paragraph(rng)
+
+
+def _title(rng: random.Random) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(rng.randint(2, 5))).title()
+
+
+def _section(rng: random.Random, major: int, counters: dict) -> List[str]:
+    """
+    生成一个 "# 1 Introduction" 式的一级章节及其若干 "# 1.1" 小节（MinerU 输出的标题统一使用一个 #）。
+    """
+    title = _MAJOR_TITLES[(major - 1) % len(_MAJOR_TITLES)]
+    blocks = [f"# {major} {title}", _paragraph(rng)]
+    for sub in range(1, rng.randint(1, 4) + 1):
+        blocks.append(f"# {major}.{sub} {_title(rng)}")
+        blocks.extend(_body_block(rng, counters) for _ in range(rng.randint(1, 5)))
+    return blocks
+
+
+def iter_paper_blocks(target_bytes: int = 100 * 1024, seed: int = 0) -> Iterator[str]:
+    """
+    逐块生成大约 target_bytes 字节的合成论文：标题、摘要、若干编号章节（含公式、表格、图片），
+    末尾附参考文献。逐块产出，生成 100 MB 级别的文件时不必把全文放在内存中。
+    """
+    rng = random.Random(seed)
+    counters = {"equation": 0, "table": 0, "figure": 0}
+    size = 0
+    for block in ("# A Synthetic Study of Efficient Translation", "# Abstract", _paragraph(rng)):
+        size += len(block.encode("utf-8")) + 2
+        yield block
+    major = 1
+    while size < target_bytes:
+        for block in _section(rng, major, counters):
+            size += len(block.encode("utf-8")) + 2
+            yield block
+            if size >= target_bytes:
+                break
+        major += 1
+    yield "# References"
+    for i in range(1, 11):
+        yield f"[{i}] A. Author. {_sentence(rng)} 2024."
+
+
+def generate_paper(target_bytes: int = 100 * 1024, seed: int = 0) -> str:
+    """
+    生成大约 target_bytes 字节的合成论文，返回完整文本。
+    """
+    return "\n\n".join(iter_paper_blocks(target_bytes, seed)) + "\n"
+
+
+def write_paper(path: str, target_bytes: int = 100 * 1024, seed: int = 0) -> int:
+    """
+    把合成论文流式写入 path，返回写入的字节数。
+    """
+    written = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        for i, block in enumerate(iter_paper_blocks(target_bytes, seed)):
+            text = block if i == 0 else "\n\n" + block
+            f.write(text)
+            written += len(text.encode("utf-8"))
+        f.write("\n")
+    return written + 1
+
+
+def parse_size(text: str) -> int:
+    """
+    解析 "10KB" / "5MB" / "2048" 形式的大小。
+    """
+    text = text.strip().upper()
+    for suffix, factor in (("KB", 1024), ("MB", 1024 ** 2), ("GB", 1024 ** 3), ("B", 1)):
+        if text.endswith(suffix):
+            return int(float(text[:-len(suffix)]) * factor)
+    return int(text)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="生成合成的 MinerU 风格论文 Markdown")
+    parser.add_argument("output", help="输出文件路径")
+    parser.add_argument("--size", default="100KB", help="目标大小，如 10KB、5MB")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    written = write_paper(args.output, parse_size(args.size), seed=args.seed)
+    print(f"已生成: {args.output} ({written / 1024:.1f} KB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,19 @@
-from typing import List, Tuple
+from typing import Iterable, Iterator, List, Tuple
+import mmap
 import re
-from service.count_token import count_tokens, count_tokens_batch
+from service.count_token import count_tokens, count_tokens_batch, estimate_bounds, estimate_tokens
+
+# 两段文本拼接后，边界处的 BPE 合并可能使 token 数与分别计数之和相差少量 token，
+# greedy_merge_chunks 为每个拼接边界预留该余量，保证合并结果不超过 max_tokens
+BOUNDARY_TOKENS = 1
+
+# 按行分类用到的模式：ATX 标题、"# 1" 式一级章节标题、参考文献标题
+_HEADING_PATTERN = re.compile(r'^#{1,6}\s')
+_MAJOR_HEADING_PATTERN = re.compile(r'^#\s\d+')
+_REFERENCE_PATTERN = re.compile(r'^#*\s*reference', re.IGNORECASE)
+
 def _detect_atx_headings(line:str)->bool:
-    return bool(re.match(r'^#{1,6}\s', line))
+    return bool(_HEADING_PATTERN.match(line))
 
 def split_by_headings(file_path) -> List[List[str]]:
     # 读取文件内容
@@ -46,15 +57,14 @@ def merge_chunks_by_major_headings(chunks: list[str]) -> list[str]:
     # current_block_chunks 用于临时存储属于同一个大章节的所有小块
     current_block_chunks = []
 
-    # 定义一个正则表达式来识别主要章节标题，例如 "# 1", "# 2", etc.
-    # ^ 表示字符串开头, #\s 匹配 "# "， \d+ 匹配一个或多个数字
-    major_heading_pattern = re.compile(r'^#\s\d+')
+    # 主要章节标题，例如 "# 1", "# 2", etc.（见 _MAJOR_HEADING_PATTERN）
+    major_heading_pattern = _MAJOR_HEADING_PATTERN
 
     for chunk in chunks:
         trimmed_chunk = chunk.strip()     
 
         # 当遇到以reference开头的块时，停止处理（支持普通文本和markdown标题格式）
-        if re.match(r'^#*\s*reference', trimmed_chunk, re.IGNORECASE):
+        if _REFERENCE_PATTERN.match(trimmed_chunk):
             break
         
         if major_heading_pattern.match(trimmed_chunk):
@@ -74,15 +84,257 @@ def merge_chunks_by_major_headings(chunks: list[str]) -> list[str]:
     return merged_blocks
 
 
-def greedy_merge_chunks(chunks: list[str], max_tokens: int = 2048) -> list[str]:
+# 结构化拆分用到的模式：围栏代码块、行间公式、Markdown 表格行、HTML 表格、句末标点
+_FENCE_PATTERN = re.compile(r'^\s*(`{3,}|~{3,})')
+_TABLE_ROW_PATTERN = re.compile(r'^\s*\|')
+_HTML_TABLE_OPEN_PATTERN = re.compile(r'<table\b', re.IGNORECASE)
+_HTML_TABLE_CLOSE_PATTERN = re.compile(r'</table>', re.IGNORECASE)
+_SENTENCE_END_PATTERN = re.compile(r'(?<=[.!?。！？])\s+')
+# 以这些缩写结尾的"句子"不是真正的句末
+_ABBREVIATIONS = ("e.g.", "i.e.", "et al.", "Fig.", "Figs.", "Eq.", "Eqs.", "Sec.", "Tab.", "vs.", "etc.", "cf.", "No.")
+
+
+def _split_structural_blocks(text: str) -> List[Tuple[str, bool]]:
+    """
+    将文本按行拆成块，返回 (块文本, 是否不可拆分)。
+
+    行间公式 $$...$$、围栏代码块、连续的 Markdown 表格行以及 <table>...</table>
+    各自作为一个不可拆分的整体；其余每一行（分块时已去掉空行，一行即一个段落）单独成块。
+    """
+    lines = text.splitlines(keepends=True)
+    blocks = []
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        stripped = line.strip()
+        end = i + 1
+
+        fence = _FENCE_PATTERN.match(line)
+        if fence:
+            marker = fence.group(1)
+            while end < len(lines) and not lines[end].strip().startswith(marker):
+                end += 1
+            end = min(end + 1, len(lines))
+        elif stripped.startswith("$$") and stripped.count("$$") == 1:
+            while end < len(lines) and "$$" not in lines[end]:
+                end += 1
+            end = min(end + 1, len(lines))
+        elif _TABLE_ROW_PATTERN.match(line):
+            while end < len(lines) and _TABLE_ROW_PATTERN.match(lines[end]):
+                end += 1
+        elif _HTML_TABLE_OPEN_PATTERN.search(line) and not _HTML_TABLE_CLOSE_PATTERN.search(line):
+            while end < len(lines) and not _HTML_TABLE_CLOSE_PATTERN.search(lines[end]):
+                end += 1
+            end = min(end + 1, len(lines))
+        else:
+            atomic = stripped.startswith("$$") or bool(_HTML_TABLE_OPEN_PATTERN.search(line))
+            blocks.append((line, atomic))
+            i = end
+            continue
+
+        blocks.append(("".join(lines[i:end]), True))
+        i = end
+    return blocks
+
+
+def _split_sentences(paragraph: str) -> List[str]:
+    """
+    将段落拆成句子，句后的空白保留在前一句末尾（拼接后与原文完全一致）。
+    不在行内公式 $...$ 内部或常见缩写（e.g.、Fig. 等）之后断句。
+    """
+    sentences = []
+    start = 0
+    for match in _SENTENCE_END_PATTERN.finditer(paragraph):
+        head = paragraph[start:match.start()]
+        if head.count("$") % 2 == 1 or head.endswith(_ABBREVIATIONS):
+            continue
+        sentences.append(paragraph[start:match.end()])
+        start = match.end()
+    if start < len(paragraph):
+        sentences.append(paragraph[start:])
+    return sentences
+
+
+# 片段：(文本, token 数, token 数是否精确)；近似模式下远离预算上限的片段只有估计值
+Piece = Tuple[str, int, bool]
+
+
+def _token_bounds(tokens: int, exact: bool) -> Tuple[float, float]:
+    """
+    片段真实 token 数的范围：精确值的上下界相同，估计值见 estimate_bounds。
+    """
+    return (tokens, tokens) if exact else estimate_bounds(tokens)
+
+
+def _straddles(tokens: int, exact: bool, max_tokens: float) -> bool:
+    low, high = _token_bounds(tokens, exact)
+    return low <= max_tokens < high
+
+
+def _measure(texts: List[str], max_tokens: int, approximate: bool = False) -> List[Tuple[int, bool]]:
+    """
+    返回每个文本的 (token 数, 是否精确)。
+    
+    近似模式下先用 estimate_tokens 估计，只有估计范围跨过 max_tokens（无法确定是否超限）的文本
+    才一起交给 count_tokens_batch 精确分词。
+    """
+    if not approximate:
+        return [(tokens, True) for tokens in count_tokens_batch(texts)]
+    measured = [(estimate_tokens(text), False) for text in texts]
+    near = [i for i, (tokens, _) in enumerate(measured) if _straddles(tokens, False, max_tokens)]
+    if near:
+        for i, tokens in zip(near, count_tokens_batch([texts[i] for i in near])):
+            measured[i] = (tokens, True)
+    return measured
+
+
+def _split_oversized(chunk: str, max_tokens: int, approximate: bool = False) -> List[Piece]:
+    """
+    将超过 max_tokens 的块逐级拆细：先按段落/结构块，段落仍超限时再按句子。
+    返回片段列表，由 _pack_pieces 重新装箱。不可拆分的结构块即使超限也保持完整。
+    """
+    blocks = _split_structural_blocks(chunk)
+    pieces = []
+    for (block, atomic), (block_tokens, exact) in zip(blocks, _measure([b for b, _ in blocks], max_tokens, approximate)):
+        if _token_bounds(block_tokens, exact)[0] <= max_tokens or atomic:
+            pieces.append((block, block_tokens, exact))
+            continue
+        sentences = _split_sentences(block)
+        pieces.extend(
+            (sentence, tokens, exact)
+            for sentence, (tokens, exact) in zip(sentences, _measure(sentences, max_tokens, approximate))
+        )
+    return pieces
+
+
+def _pack_pieces(pieces: List[Piece], max_tokens: int) -> List[str]:
+    """
+    按顺序贪心装箱：累加 token 数，超过 max_tokens 时开启新块。
+    """
+    return list(_iter_packed(pieces, max_tokens))
+
+
+def _iter_packed(pieces: Iterable[Piece], max_tokens: int) -> Iterator[str]:
+    """
+    _pack_pieces 的生成器版本：每装满一个块就立即产出，pieces 可以是惰性的迭代器。
+    
+    片段的 token 数可以是估计值：合并后的 token 范围整体低于或高于上限时直接决定；
+    范围跨过上限时，才对当前块与新片段中只有估计值的部分精确分词后再判断，
+    因此只要估计误差在 estimate_bounds 的范围内，结果与全部精确计数时相同。
+    """
+    current_parts = []
+    current_tokens = []  # 当前块各片段的 (token 数, 是否精确)
+    current_low = current_high = 0.0  # 当前块 token 数的范围（含拼接边界余量）
+    
+    for piece, piece_tokens, exact in pieces:
+        low, high = _token_bounds(piece_tokens, exact)
+        # 如果单个片段就超过限制（无法再拆分的公式/表格/超长句），只能单独作为一个块
+        if low > max_tokens:
+            # 先保存当前已合并的内容
+            if current_parts:
+                yield "".join(current_parts)
+                current_parts, current_tokens = [], []
+                current_low = current_high = 0.0
+            yield piece
+            approx = "" if exact else "约 "
+            print(f"警告: 发现无法拆分的片段 token 数 ({approx}{piece_tokens}) 超过限制 ({max_tokens})")
+            continue
+        
+        # 尝试合并当前片段：拼接处的分词可能与分别分词略有差异，按边界余量保守估计
+        boundary = BOUNDARY_TOKENS if current_parts else 0
+        if current_low + low + boundary <= max_tokens < current_high + high + boundary:
+            # 估计范围跨过上限，精确计数后再判断
+            pending = [i for i, (_, known) in enumerate(current_tokens) if not known]
+            counts = count_tokens_batch([current_parts[i] for i in pending] + ([] if exact else [piece]))
+            for i, tokens in zip(pending, counts):
+                current_tokens[i] = (tokens, True)
+            if not exact:
+                piece_tokens, exact = counts[-1], True
+                low = high = piece_tokens
+            current_low = current_high = (
+                sum(tokens for tokens, _ in current_tokens) + BOUNDARY_TOKENS * max(0, len(current_tokens) - 1)
+            )
+        
+        if current_high + high + boundary <= max_tokens:
+            # 可以合并
+            current_parts.append(piece)
+            current_tokens.append((piece_tokens, exact))
+            current_low += low + boundary
+            current_high += high + boundary
+        else:
+            # 无法合并，保存当前已合并的内容，开始新的合并块
+            if current_parts:
+                yield "".join(current_parts)
+            current_parts = [piece]
+            current_tokens = [(piece_tokens, exact)]
+            current_low, current_high = low, high
+    
+    # 保存最后一个合并块
+    if current_parts:
+        yield "".join(current_parts)
+
+
+def split_oversized_chunk(chunk: str, max_tokens: int = 2048) -> List[str]:
+    """
+    将单个超过 max_tokens 的块拆分成若干不超过 max_tokens 的块（段落 → 句子逐级拆分）。
+    
+    不会在 $$ 行间公式、围栏代码块、Markdown/HTML 表格内部切开，拆分结果按顺序拼接后与原文一致。
+    
+    Args:
+        chunk: 待拆分的文本块
+        max_tokens: 每个块允许的最大 token 数
+    
+    Returns:
+        拆分后的文本块列表；只有无法拆分的单个结构块才可能仍超过 max_tokens
+    """
+    return _pack_pieces(_split_oversized(chunk, max_tokens), max_tokens)
+
+
+def _expand_pieces(chunks: List[str], max_tokens: int, approximate: bool = False) -> List[Piece]:
+    """
+    计算每个块的 token 数（approximate=True 时远离上限的块只做估计），超限的块先拆细，返回片段列表。
+    """
+    pieces = []
+    for chunk, (chunk_tokens, exact) in zip(chunks, _measure(chunks, max_tokens, approximate)):
+        if _token_bounds(chunk_tokens, exact)[0] > max_tokens:
+            pieces.extend(_split_oversized(chunk, max_tokens, approximate))
+        else:
+            pieces.append((chunk, chunk_tokens, exact))
+    return pieces
+
+
+def _count_packed(pieces: List[Piece], cap: int) -> int:
+    """
+    按上限 cap 贪心装箱时得到的块数（与 _pack_pieces 的规则一致，但不拼接字符串）。
+    """
+    count = 0
+    current_tokens = None
+    for _, piece_tokens, _ in pieces:
+        if current_tokens is not None and current_tokens + piece_tokens + BOUNDARY_TOKENS <= cap:
+            current_tokens += piece_tokens + BOUNDARY_TOKENS
+        else:
+            count += 1
+            current_tokens = piece_tokens
+    return count
+
+
+def greedy_merge_chunks(chunks: list[str], max_tokens: int = 2048, approximate: bool = False) -> list[str]:
     """
     贪心合并文本块，确保每个块的 token 数不超过 max_tokens。
     
     使用贪心策略：尽可能地将连续的块合并在一起，直到添加下一个块会超过限制。
+    每个块只分词一次（count_tokens_batch），合并时直接累加 token 数，
+    并为每个拼接边界预留 BOUNDARY_TOKENS 个 token 的余量，整体为线性时间。
+    单个超过限制的块会先按段落、句子拆细（见 split_oversized_chunk），再参与合并。
+    
+    approximate=True 时先用 estimate_tokens 按字符比例估计 token 数，只有估计范围跨过
+    max_tokens 时才精确分词。大文件中绝大多数合并判断远离上限，可以省去大部分分词开销；
+    估计误差在 estimate_bounds 范围内时，结果与精确计数相同。
     
     Args:
         chunks: 待合并的文本块列表
         max_tokens: 每个块允许的最大 token 数，默认为 2048
+        approximate: 是否使用近似 token 计数（接近上限时回退到精确计数）
     
     Returns:
         合并后的文本块列表，每个块的 token 数不超过 max_tokens
@@ -90,55 +342,55 @@ def greedy_merge_chunks(chunks: list[str], max_tokens: int = 2048) -> list[str]:
     if not chunks:
         return []
     
-    result = []
-    current_merged = ""
-    current_tokens = 0
+    return _pack_pieces(_expand_pieces(chunks, max_tokens, approximate), max_tokens)
+
+
+def balanced_merge_chunks(chunks: list[str], max_tokens: int = 2048) -> list[str]:
+    """
+    均衡合并文本块：块数与贪心合并相同，但让各块的 token 数尽量接近。
     
-    for chunk in chunks:
-        chunk_tokens = count_tokens(chunk)
-        
-        # 如果单个块就超过限制，只能单独作为一个块
-        if chunk_tokens > max_tokens:
-            # 先保存当前已合并的内容
-            if current_merged:
-                result.append(current_merged)
-                current_merged = ""
-                current_tokens = 0
-            # 将超大块单独添加（可能需要后续处理）
-            result.append(chunk)
-            print(f"警告: 发现单个块的 token 数 ({chunk_tokens}) 超过限制 ({max_tokens})")
-            continue
-        
-        # 尝试合并当前块
-        potential_tokens = count_tokens(current_merged + chunk)
-        
-        if potential_tokens <= max_tokens:
-            # 可以合并
-            current_merged += chunk
-            current_tokens = potential_tokens
-        else:
-            # 无法合并，保存当前已合并的内容，开始新的合并块
-            if current_merged:
-                result.append(current_merged)
-            current_merged = chunk
-            current_tokens = chunk_tokens
+    贪心合并会把前面的块填满，最后往往剩下一个很小的块，而最大的块决定了并发翻译的
+    完成时间。这里在 [最大的未超限片段, max_tokens] 区间二分查找最小的装箱上限，
+    使按该上限装箱得到的块数不多于贪心结果，从而在不增加请求数的前提下压低最大块。
     
-    # 保存最后一个合并块
-    if current_merged:
-        result.append(current_merged)
+    Args:
+        chunks: 待合并的文本块列表
+        max_tokens: 每个块允许的最大 token 数，默认为 2048
+    
+    Returns:
+        合并后的文本块列表，每个块的 token 数不超过 max_tokens
+    """
+    if not chunks:
+        return []
     
-    return result
+    pieces = _expand_pieces(chunks, max_tokens)
+    target = _count_packed(pieces, max_tokens)
+    
+    # 无法再拆分的超限片段无论上限取多少都单独成块，不参与下界，否则一个超长公式就会让整篇文档退化为贪心结果
+    low = max((tokens for _, tokens, _ in pieces if tokens <= max_tokens), default=max_tokens)
+    high = max_tokens
+    while low < high:
+        cap = (low + high) // 2
+        if _count_packed(pieces, cap) <= target:
+            high = cap
+        else:
+            low = cap + 1
+    
+    return _pack_pieces(pieces, low)
 
 
-def chunk_md(file_path: str, max_tokens: int = 2048) -> List[str]:
+def chunk_md(file_path: str, max_tokens: int = 2048, strategy: str = "greedy", approximate: bool = False) -> List[str]:
     """
     读取 Markdown 文件，
     1.按章节标题分块，
-    2.进行贪心合并，确保每个块的 token 数不超过 max_tokens。
+    2.进行贪心（或均衡）合并，确保每个块的 token 数不超过 max_tokens。
     
     Args:
         file_path: Markdown 文件路径
         max_tokens: 每个块允许的最大 token 数，默认为 2048
+        strategy: 合并策略，"greedy" 尽量填满每个块；"balanced" 块数不变但各块大小更均匀，
+                  可缩短并发翻译时最大块造成的尾部等待
+        approximate: greedy 合并时是否使用近似 token 计数，见 greedy_merge_chunks
     
     Returns:
         合并后的文本块列表，每个块的 token 数不超过 max_tokens
@@ -154,12 +406,81 @@ def chunk_md(file_path: str, max_tokens: int = 2048) -> List[str]:
     # 先按主要章节合并
     merged = merge_chunks_by_major_headings(split_chunks_str)
     
-    # 再进行贪心合并，确保每个块不超过 max_tokens
-    greedy_merged = greedy_merge_chunks(merged, max_tokens=max_tokens)
+    # 再进行贪心（或均衡）合并，确保每个块不超过 max_tokens
+    if strategy == "balanced":
+        return balanced_merge_chunks(merged, max_tokens=max_tokens)
+    if strategy != "greedy":
+        raise ValueError(f"未知的合并策略: {strategy}")
+    greedy_merged = greedy_merge_chunks(merged, max_tokens=max_tokens, approximate=approximate)
     
     return greedy_merged
 
 
+def _iter_lines(file_path: str) -> Iterator[str]:
+    """
+    通过 mmap 逐行读取文件（不把整个文件读入 Python 字符串），跳过空行，\r\n 统一为 \n。
+    """
+    with open(file_path, 'rb') as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # 空文件无法映射
+            return
+        with mm:
+            for raw in iter(mm.readline, b""):
+                if not raw.strip():
+                    continue
+                if raw.endswith(b"\r\n"):
+                    raw = raw[:-2] + b"\n"
+                yield raw.decode("utf-8")
+
+
+def _iter_major_blocks(file_path: str) -> Iterator[str]:
+    """
+    单遍扫描文件，逐个产出按一级章节合并后的块，等价于
+    merge_chunks_by_major_headings(split_by_headings(...))，但同一时刻只在内存中保留当前章节。
+    """
+    block_lines = []
+    at_section_start = True
+    for line in _iter_lines(file_path):
+        # 与 split_by_headings 一致：每个 ATX 标题（以及文件第一行）开始一个新的小节
+        if at_section_start or _HEADING_PATTERN.match(line):
+            head = line.lstrip()
+            if _REFERENCE_PATTERN.match(head):
+                break
+            if _MAJOR_HEADING_PATTERN.match(head) and block_lines:
+                yield "".join(block_lines)
+                block_lines = []
+            at_section_start = False
+        block_lines.append(line)
+    if block_lines:
+        yield "".join(block_lines)
+
+
+def iter_chunks(file_path: str, max_tokens: int = 2048, approximate: bool = False) -> Iterator[str]:
+    """
+    流式分块：单遍扫描内存映射的 Markdown 文件，逐个产出与 chunk_md(strategy="greedy") 相同的块。
+
+    每读完一个一级章节就立即分词、拆分超限内容并装箱，装满的块马上产出，
+    因此翻译阶段可以在整个文件分块完成之前就开始翻译前面的块，内存占用与文件大小无关
+    （只与单个章节的大小有关）。均衡合并需要预先知道全部片段，不支持流式。
+
+    Args:
+        file_path: Markdown 文件路径
+        max_tokens: 每个块允许的最大 token 数，默认为 2048
+        approximate: 是否使用近似 token 计数，见 greedy_merge_chunks
+
+    Yields:
+        合并后的文本块，每个块的 token 数不超过 max_tokens（无法拆分的单个结构块除外）
+    """
+    pieces = (
+        piece
+        for block in _iter_major_blocks(file_path)
+        for piece in _expand_pieces([block], max_tokens, approximate)
+    )
+    yield from _iter_packed(pieces, max_tokens)
+
+
 # if __name__ == "__main__":
 #     split = split_by_headings("./output/2504.17550v1/2504.17550v1.md")
     
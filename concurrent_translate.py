@@ -1,17 +1,52 @@
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import List, Tuple, Optional
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from functools import partial
+from typing import Dict, Iterable, List, Tuple, Optional
+import asyncio
+import queue
 import time
 import os
 from tqdm import tqdm
-from service.llm_translate import translate_text
-from chunk_md import chunk_md
+from service.llm_translate import translate_text, translate_text_async, MODEL_NAME, SYSTEM_PROMPT
+from service.prompt_template import TRANSLATE_TEMPLATE
+from service.span_mask import MIN_PROSE_WORDS, PlaceholderMismatchError, mask_spans, needs_translation, restore_spans
+from chunk_md import chunk_md, iter_chunks
 from service.filename_clean import sanitize_filename
+from service.translation_cache import TranslationCache, DEFAULT_CACHE_PATH
+from service.translation_memory import DEFAULT_MEMORY_PATH, MIN_SIMILARITY, MemoryAlignmentError, TranslationMemory
+from service.llm_client import ensure_pool_size, close_async_client
+from service.adaptive_concurrency import AdaptiveConcurrencyController
+from service.rate_limiter import RateLimiter, estimate_request_tokens
+from service.ordered_writer import OrderedChunkWriter
+from service.checkpoint import CheckpointJournal, file_sha256
+from service.scheduling import lpt_order, simulate_makespan, windowed_lpt_order
+from service.count_token import count_tokens, count_tokens_batch
+from service.run_metrics import RunMetrics, cached_prompt_tokens
+from service.hedging import HedgePolicy
+from service.providers import ProviderRouter
+
+# 已提交但未完成的块数上限为 MAX_PENDING_PER_WORKER × 工作线程数，超过时先等待已提交的块完成再继续提交，
+# 避免流式输入时分块远远领先于翻译、把整篇文档的块都堆积在线程池队列中
+MAX_PENDING_PER_WORKER = 2
+
+# 有序流式写入（writer）时 LPT 只在文档顺序上最前面 LPT_WINDOW_PER_WORKER × 工作线程数个未派发的块中选最大的，
+# 否则开头的小块最后才派发，重排缓冲会积压几乎整篇文档、输出文件直到结束前都是空的
+LPT_WINDOW_PER_WORKER = 2
 
 def translate_chunk_with_retry(
     chunk: str,
     chunk_index: int,
     max_retries: int = 3,
-    initial_delay: float = 1.0
+    initial_delay: float = 1.0,
+    cache: Optional[TranslationCache] = None,
+    controller: Optional[AdaptiveConcurrencyController] = None,
+    rate_limiter: Optional[RateLimiter] = None,
+    metrics: Optional[RunMetrics] = None,
+    mask: bool = False,
+    skip_min_words: int = 0,
+    hedge: Optional[HedgePolicy] = None,
+    router: Optional[ProviderRouter] = None,
+    memory: Optional[TranslationMemory] = None
 ) -> Tuple[int, Optional[str], Optional[str]]:
     """
     翻译单个文本块，支持指数退避重试。
@@ -21,6 +56,19 @@ def translate_chunk_with_retry(
         chunk_index: 文本块的索引（用于保持顺序）
         max_retries: 最大重试次数
         initial_delay: 初始重试延迟（秒）
+        cache: 翻译缓存（可选），命中时直接返回缓存的译文，不调用 LLM
+        controller: 自适应并发控制器（可选），每次请求都需先获取名额
+        rate_limiter: RPM/TPM 限流器（可选），每次请求前按估计 token 数扣除预算
+        metrics: 逐块指标收集器（可选），记录 token 数、等待时间、延迟与尝试次数
+        mask: 是否先把公式、代码块、图片链接与数据表格替换为占位符再发送，译文返回后还原
+              （见 service.span_mask）；占位符对不上时，之后的尝试改为发送未替换的原文
+        skip_min_words: 大于 0 时，公式、代码、图片与数据表格之外不足该数量英文单词（且没有带文字标题）的块
+                        不调用 LLM，原文直接作为结果（见 service.span_mask.needs_translation）
+        hedge: 对冲请求策略（可选），请求耗时超过近期延迟分位数时再发一个相同的请求，先成功者胜出
+        router: 多提供商路由器（可选），每次请求（含重试与对冲请求）由它按实时延迟、错误率与空闲容量
+                选择提供商，翻译缓存按 router.model_name 区分；为 None 时使用默认的单一提供商
+        memory: 段落级翻译记忆（可选），所有段落都命中时直接拼出译文、不调用 LLM；部分命中时只发送未命中的段落，
+                译文段落数对不上时之后的尝试改为发送整块原文。LLM 翻译的段落对齐后写回记忆
     
     Returns:
         (chunk_index, translated_text, error_message)
@@ -28,12 +76,93 @@ def translate_chunk_with_retry(
         - translated_text: 翻译后的文本，失败则为 None
         - error_message: 错误信息，成功则为 None
     """
+    started_at = time.monotonic()
+    if skip_min_words and not needs_translation(chunk, skip_min_words):
+        if metrics is not None:
+            metrics.record(chunk_index, "skipped", started_at=started_at, skipped_tokens=count_tokens(chunk))
+        return (chunk_index, chunk, None)
+
+    cache_key = None
+    if cache is not None:
+        model = router.model_name if router is not None else MODEL_NAME
+        cache_key = TranslationCache.make_key(chunk, model, SYSTEM_PROMPT)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            if metrics is not None:
+                metrics.record(chunk_index, "cached", started_at=started_at)
+            return (chunk_index, cached, None)
+
+    plan = memory.lookup(chunk) if memory is not None else None
+    if plan is not None and plan.complete:
+        translated = plan.merge("")
+        if metrics is not None:
+            metrics.record(chunk_index, "memory", started_at=started_at, memory_tokens=count_tokens(chunk))
+        return (chunk_index, translated, None)
+    if plan is not None and not plan.partial:
+        plan = None
+    # 部分段落命中翻译记忆时只发送未命中的段落
+    source = plan.pending_text() if plan is not None else chunk
+
+    text, spans = mask_spans(source) if mask else (source, [])
+
+    request = partial(router.call, translate_text) if router is not None else translate_text
     delay = initial_delay
+    throttle_wait = 0.0
     
     for attempt in range(max_retries):
         try:
-            response = translate_text(chunk)
+            # 限流扣费与对冲落败请求的 token 统计都需要估计值；每次尝试按实际发送的文本重新估计
+            estimated_tokens = 0
+            if rate_limiter is not None or hedge is not None:
+                estimated_tokens = estimate_request_tokens(text, SYSTEM_PROMPT)
+            wait_start = time.monotonic()
+            charged_tokens = 0
+            if rate_limiter is not None:
+                charged_tokens = rate_limiter.acquire(estimated_tokens)
+            with controller.slot() if controller is not None else nullcontext():
+                request_start = time.monotonic()
+                throttle_wait += request_start - wait_start
+                if hedge is not None:
+                    # 两个请求发送相同的文本，扣费相同：对冲请求按同样的估计值申请预算，落败请求按实际用量结算
+                    response, _, _ = hedge.call(
+                        request, text,
+                        before_hedge=(lambda: rate_limiter.acquire(estimated_tokens)) if rate_limiter is not None else None,
+                        on_loser=partial(_settle_loser, rate_limiter, charged_tokens) if rate_limiter is not None else None,
+                        estimated_tokens=estimated_tokens
+                    )
+                else:
+                    response = request(text)
+                latency = time.monotonic() - request_start
+            if rate_limiter is not None and response.usage is not None:
+                rate_limiter.settle(charged_tokens, response.usage.total_tokens)
             translated = response.choices[0].message.content
+            if spans:
+                try:
+                    translated = restore_spans(translated or "", spans)
+                except PlaceholderMismatchError:
+                    # 模型改动了占位符，之后的尝试发送未替换的原文
+                    text, spans = source, []
+                    raise
+            memory_tokens = 0
+            if memory is not None and translated:
+                if plan is not None:
+                    try:
+                        merged = plan.merge(translated)
+                    except MemoryAlignmentError:
+                        # 模型合并或拆分了段落，之后的尝试发送整块原文
+                        plan, source = None, chunk
+                        text, spans = mask_spans(source) if mask else (source, [])
+                        raise
+                    memory_tokens = count_tokens(chunk) - count_tokens(source)
+                memory.add(source, translated)
+                if plan is not None:
+                    translated = merged
+            if cache is not None and translated:
+                cache.put(cache_key, translated)
+            if metrics is not None:
+                masked_tokens = count_tokens(source) - count_tokens(text) if spans else 0
+                _record_response(metrics, chunk_index, response, started_at, latency, throttle_wait, attempt + 1,
+                                 masked_tokens, memory_tokens)
             return (chunk_index, translated, None)
         
         except Exception as e:
@@ -45,76 +174,565 @@ def translate_chunk_with_retry(
                 delay *= 2  # 指数退避
             else:
                 # 最后一次尝试也失败了
+                if metrics is not None:
+                    metrics.record(chunk_index, "failed", started_at=started_at, throttle_wait=throttle_wait,
+                                   attempts=attempt + 1, error=error_msg)
                 return (chunk_index, None, error_msg)
     
     return (chunk_index, None, f"Chunk {chunk_index} failed after {max_retries} retries")
 
 
+def _settle_loser(rate_limiter: RateLimiter, charged_tokens: int, response) -> None:
+    """
+    对冲落败的请求完成后，按它的实际用量结算限流预算。
+    """
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        rate_limiter.settle(charged_tokens, usage.total_tokens)
+
+
+def _record_response(
+    metrics: RunMetrics,
+    chunk_index: int,
+    response,
+    started_at: float,
+    latency: float,
+    throttle_wait: float,
+    attempts: int,
+    masked_tokens: int = 0,
+    memory_tokens: int = 0
+) -> None:
+    """
+    从成功的响应中提取 usage（含命中上下文缓存的 prompt token 数）与 finish_reason，记录到 metrics。
+    """
+    usage = getattr(response, "usage", None)
+    metrics.record(
+        chunk_index,
+        "ok",
+        started_at=started_at,
+        input_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+        output_tokens=getattr(usage, "completion_tokens", 0) or 0,
+        cached_tokens=cached_prompt_tokens(usage),
+        masked_tokens=masked_tokens,
+        memory_tokens=memory_tokens,
+        latency=latency,
+        throttle_wait=throttle_wait,
+        attempts=attempts,
+        finish_reason=getattr(response.choices[0], "finish_reason", None),
+    )
+
+
+def _timed(func, *args, **kwargs):
+    """
+    在工作线程中执行 func，返回 (func 的结果, 耗时秒数)。
+    """
+    start = time.monotonic()
+    result = func(*args, **kwargs)
+    return result, time.monotonic() - start
+
+
+def _dispatch_order(
+    chunk_tokens: List[int],
+    schedule: str,
+    writer: Optional[OrderedChunkWriter],
+    workers: int
+) -> List[int]:
+    """
+    派发顺序："document" 为文档顺序；"lpt" 为大块优先，传入有序写入器时限制在有界窗口内（见 LPT_WINDOW_PER_WORKER）。
+    """
+    if schedule == "document":
+        return list(range(len(chunk_tokens)))
+    if writer is not None:
+        return windowed_lpt_order(chunk_tokens, LPT_WINDOW_PER_WORKER * workers)
+    return lpt_order(chunk_tokens)
+
+
+def _print_makespan_report(
+    chunk_tokens: List[int],
+    durations: Dict[int, float],
+    workers: int,
+    schedule: str,
+    actual: float
+) -> None:
+    """
+    用实测的平均"每 token 耗时"估计各块耗时，模拟 LPT 与文档顺序两种派发方式的完成时间，
+    并与实际耗时对比。
+    """
+    indices = sorted(durations)
+    total_tokens = sum(chunk_tokens[i] for i in indices)
+    if not indices or total_tokens == 0:
+        return
+    seconds_per_token = sum(durations.values()) / total_tokens
+    estimated = {i: chunk_tokens[i] * seconds_per_token for i in indices}
+    lpt_indices = [indices[k] for k in lpt_order([chunk_tokens[i] for i in indices])]
+    lpt_estimate = simulate_makespan(estimated, lpt_indices, workers)
+    document_estimate = simulate_makespan(estimated, indices, workers)
+    print(f"  调度: {schedule}, 预计完成时间: LPT {lpt_estimate:.1f}s / 文档顺序 {document_estimate:.1f}s, 实际 {actual:.1f}s")
+
+
+def _print_metrics_summary(metrics: RunMetrics) -> None:
+    summary = metrics.summary()
+    print(
+        f"  Token: 输入 {summary['input_tokens']}（缓存命中 {summary['prompt_cache_hit_rate']:.0%}）, 输出 {summary['output_tokens']}, "
+        f"请求 {summary['requests']} 次（重试 {summary['retries']}）, "
+        f"延迟 p50 {summary['latency_p50']:.1f}s / p95 {summary['latency_p95']:.1f}s"
+    )
+    skipped = summary["status"].get("skipped", 0)
+    if skipped:
+        print(f"  跳过（无需翻译）: {skipped} 块, {summary['skipped_tokens']} tokens")
+    if summary["masked_tokens"]:
+        print(f"  占位符替换节省输入 {summary['masked_tokens']} tokens（输出约节省同样多）")
+    if summary["memory_tokens"]:
+        print(f"  翻译记忆: 整块复用 {summary['status'].get('memory', 0)} 块, 共复用原文 {summary['memory_tokens']} tokens")
+
+
 def translate_chunks_concurrent(
-    chunks: List[str],
+    chunks: Iterable[str],
     max_workers: int = 3,
-    max_retries: int = 3
+    max_retries: int = 3,
+    cache: Optional[TranslationCache] = None,
+    controller: Optional[AdaptiveConcurrencyController] = None,
+    rate_limiter: Optional[RateLimiter] = None,
+    writer: Optional[OrderedChunkWriter] = None,
+    journal: Optional[CheckpointJournal] = None,
+    schedule: str = "lpt",
+    executor: Optional[ThreadPoolExecutor] = None,
+    metrics: Optional[RunMetrics] = None,
+    mask: bool = False,
+    skip_min_words: int = 0,
+    hedge: Optional[HedgePolicy] = None,
+    router: Optional[ProviderRouter] = None,
+    memory: Optional[TranslationMemory] = None
 ) -> Tuple[List[str], List[str]]:
     """
     并发翻译多个文本块。
     
     Args:
-        chunks: 要翻译的文本块列表
-        max_workers: 最大并发线程数
+        chunks: 要翻译的文本块列表；也可以是惰性产出块的迭代器（如 chunk_md.iter_chunks），
+                此时每产出一个块就立即提交翻译，分块与翻译重叠进行，并固定按文档顺序派发；
+                未完成的块达到 MAX_PENDING_PER_WORKER × max_workers 时暂停从迭代器取块
+        max_workers: 最大并发线程数（传入 controller 时以 controller.max_limit 为准）
         max_retries: 每个块的最大重试次数
+        cache: 翻译缓存（可选），在所有工作线程间共享
+        controller: 自适应并发控制器（可选），在线程池内动态限制在途请求数
+        rate_limiter: RPM/TPM 限流器（可选），预算不足时阻塞请求的发出
+        writer: 有序流式写入器（可选），传入时每个块完成后按顺序直接写入磁盘，不在内存中保留
+        journal: 检查点日志（可选），已记录的块直接复用，新完成的块追加记录
+        schedule: 派发顺序，"lpt" 按 token 数从大到小派发，避免大块最后才开始而拖长总耗时
+                  （传入 writer 时只在 LPT_WINDOW_PER_WORKER × max_workers 个块的窗口内大块优先）；
+                  "document" 按文档顺序派发
+        executor: 外部共享的线程池（可选），批量模式下多篇论文共用同一个 LLM 工作池；
+                  此时 max_workers 应与该线程池大小一致，且函数结束时不会关闭它
+        metrics: 逐块指标收集器（可选），运行结束时调用 metrics.finish()
+        mask: 是否把公式、代码块、图片链接与数据表格替换为占位符再发送，见 translate_chunk_with_retry
+        skip_min_words: 大于 0 时不调用 LLM、直接输出只有图片/公式/数字表格/代码的块，见 translate_chunk_with_retry
+        hedge: 对冲请求策略（可选），慢请求超过近期延迟分位数时发出重复请求，统计中显示对冲次数、胜出次数与额外 token
+        router: 多提供商路由器（可选），统计中显示每个提供商的请求数、错误数与平均延迟；
+                max_workers 不应小于 router.capacity，否则部分提供商的名额用不满
+        memory: 段落级翻译记忆（可选），在所有工作线程间共享，见 translate_chunk_with_retry
     
     Returns:
         (translated_chunks, errors)
-        - translated_chunks: 翻译后的文本块列表（按原始顺序）
+        - translated_chunks: 翻译后的文本块列表（按原始顺序）；传入 writer 时为空列表
         - errors: 错误信息列表
     """
-    if not chunks:
+    # 列表/元组之外的可迭代对象（如 chunk_md.iter_chunks 生成器）按流式处理：边产出边提交
+    streaming = not isinstance(chunks, (list, tuple))
+    if not streaming and not chunks:
         return [], []
     
-    print(f"\n开始翻译 {len(chunks)} 个文本块...")
-    print(f"并发数: {max_workers}, 最大重试次数: {max_retries}\n")
+    if controller is not None:
+        # 线程池按上界创建，实际在途请求数由控制器动态限制
+        max_workers = controller.max_limit
+    
+    if streaming:
+        print(f"\n开始流式翻译（边分块边翻译）...")
+    else:
+        print(f"\n开始翻译 {len(chunks)} 个文本块...")
+    if controller is not None:
+        print(f"自适应并发: {controller.min_limit}~{controller.max_limit}（初始 {controller.limit}）, 最大重试次数: {max_retries}\n")
+    else:
+        print(f"并发数: {max_workers}, 最大重试次数: {max_retries}\n")
+    if router is not None and max_workers < router.capacity:
+        print(f"警告: 并发数 {max_workers} 小于提供商总并发上限 {router.capacity}，部分提供商的名额用不满")
     
     # 用于存储结果的字典，key 是 chunk_index
     results = {}
     errors = []
+    # 记录本次运行开始前的计数，缓存可能在多次运行间共享
+    cache_hits_before = cache.hits if cache is not None else 0
+    cache_misses_before = cache.misses if cache is not None else 0
+    memory_before = (memory.exact_hits, memory.near_hits, memory.misses) if memory is not None else None
+    # 共享客户端的连接池至少要容纳所有工作线程（对冲时每个线程最多两个请求），避免线程排队等待连接
+    ensure_pool_size(max_workers * 2 if hedge is not None else max_workers)
+    
+    # 确定派发顺序：线程池按提交顺序取任务，先提交大块可缩短尾部等待；
+    # 流式输入无法预知后面的块，只能按文档顺序派发
+    chunk_tokens = None
+    if schedule not in ("lpt", "document"):
+        raise ValueError(f"未知的调度策略: {schedule}")
+    if streaming:
+        schedule = "document"
+        items = enumerate(chunks)
+    else:
+        chunk_tokens = count_tokens_batch(chunks)
+        order = _dispatch_order(chunk_tokens, schedule, writer, max_workers)
+        items = ((i, chunks[i]) for i in order)
+    
+    total = 0
+    resumed_count = 0
+    # 已提交但尚未完成的块原文（失败占位与检查点记录需要），完成后即释放
+    in_flight: Dict[int, str] = {}
+    # 工作线程完成后把 future 放入队列，主线程在提交新块的间隙处理已完成的块
+    done: "queue.SimpleQueue" = queue.SimpleQueue()
+    durations = {}
+    started_at = time.monotonic()
+    
+    def deliver(chunk_index: int, translated: str) -> None:
+        if writer is not None:
+            writer.add(chunk_index, translated)
+        else:
+            results[chunk_index] = translated
     
-    # 使用线程池并发执行
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # 提交所有任务
-        future_to_index = {
-            executor.submit(
+    def handle(future) -> None:
+        (chunk_index, translated, error), elapsed = future.result()
+        durations[chunk_index] = elapsed
+        chunk = in_flight.pop(chunk_index)
+        
+        if error:
+            errors.append(error)
+            tqdm.write(f"❌ {error}")
+            # 即使失败也保存一个占位符，保持索引一致
+            translated = f"\n<!-- 翻译失败: {error} -->\n{chunk}\n"
+        else:
+            tqdm.write(f"✓ 块 {chunk_index} 翻译完成")
+            if journal is not None:
+                journal.record(chunk_index, chunk, translated)
+        
+        deliver(chunk_index, translated)
+        pbar.update(1)
+    
+    # 使用线程池并发执行（传入共享线程池时直接复用，不在这里关闭）
+    with (ThreadPoolExecutor(max_workers=max_workers) if executor is None else nullcontext(executor)) as pool, \
+            tqdm(total=None if streaming else len(chunks), desc="翻译进度", unit="块") as pbar:
+        submitted = 0
+        handled = 0
+        max_pending = MAX_PENDING_PER_WORKER * max_workers
+        for i, chunk in items:
+            total += 1
+            # 从检查点日志恢复已完成的块，这些块不再提交给 LLM
+            restored = journal.completed(i, chunk) if journal is not None else None
+            if restored is not None:
+                resumed_count += 1
+                if metrics is not None:
+                    metrics.record(i, "resumed")
+                deliver(i, restored)
+                pbar.update(1)
+                continue
+            
+            in_flight[i] = chunk
+            if metrics is not None:
+                metrics.submitted(i)
+            future = pool.submit(
+                _timed,
                 translate_chunk_with_retry,
                 chunk,
                 i,
-                max_retries
-            ): i
-            for i, chunk in enumerate(chunks)
-        }
+                max_retries,
+                cache=cache,
+                controller=controller,
+                rate_limiter=rate_limiter,
+                metrics=metrics,
+                mask=mask,
+                skip_min_words=skip_min_words,
+                hedge=hedge,
+                router=router,
+                memory=memory
+            )
+            future.add_done_callback(done.put)
+            submitted += 1
+            
+            # 流式输入时，分块与翻译交替进行：提交下一个块之前先写出已完成的块
+            while True:
+                try:
+                    finished = done.get_nowait()
+                except queue.Empty:
+                    break
+                handle(finished)
+                handled += 1
+            # 背压：在途块已达上限时阻塞等待，输入迭代器随之暂停产出
+            while len(in_flight) >= max_pending:
+                handle(done.get())
+                handled += 1
         
-        # 使用 tqdm 显示进度
-        with tqdm(total=len(chunks), desc="翻译进度", unit="块") as pbar:
-            for future in as_completed(future_to_index):
-                chunk_index, translated, error = future.result()
-                
-                if error:
-                    errors.append(error)
-                    tqdm.write(f"❌ {error}")
-                    # 即使失败也保存一个占位符，保持索引一致
-                    results[chunk_index] = f"\n<!-- 翻译失败: {error} -->\n{chunks[chunk_index]}\n"
-                else:
-                    results[chunk_index] = translated
-                    tqdm.write(f"✓ 块 {chunk_index} 翻译完成")
-                
-                pbar.update(1)
+        while handled < submitted:
+            handle(done.get())
+            handled += 1
+    
+    if total == 0:
+        return [], []
+    
+    wall_time = time.monotonic() - started_at
+    if metrics is not None:
+        metrics.finish()
     
     # 按索引顺序重建翻译后的列表
-    translated_chunks = [results[i] for i in range(len(chunks))]
+    translated_chunks = [results[i] for i in range(total)] if writer is None else []
     
     # 打印统计信息
+    success_count = total - len(errors)
+    print(f"\n翻译完成统计:")
+    print(f"  成功: {success_count}/{total}")
+    print(f"  失败: {len(errors)}/{total}")
+    if cache is not None:
+        print(f"  缓存命中: {cache.hits - cache_hits_before}, 未命中: {cache.misses - cache_misses_before}")
+    if memory is not None:
+        exact, near, missed = (now - before for now, before in zip(
+            (memory.exact_hits, memory.near_hits, memory.misses), memory_before
+        ))
+        print(f"  翻译记忆段落: 精确命中 {exact}, 近似命中 {near}, 未命中 {missed}")
+    if controller is not None:
+        print(f"  并发上限: {controller.summary()}")
+    if rate_limiter is not None:
+        print(f"  限流等待: {rate_limiter.total_wait:.1f}s (RPM={rate_limiter.rpm}, TPM={rate_limiter.tpm})")
+    if writer is not None:
+        print(f"  乱序缓冲峰值: {writer.max_pending} 块")
+    if hedge is not None:
+        hedging = hedge.summary()
+        print(f"  对冲请求: {hedging['hedges']} 次（p{hedging['percentile']:g} 触发），胜出 {hedging['wins']} 次，"
+              f"额外消耗 {hedging['extra_tokens']} tokens")
+    if router is not None:
+        for name, stats in router.summary().items():
+            latency = f"{stats['latency_ewma']:.1f}s" if stats['latency_ewma'] is not None else "-"
+            print(f"  提供商 {name}: 请求 {stats['requests']}，错误 {stats['errors']}，延迟 {latency}"
+                  + ("（熔断中）" if stats['down'] else ""))
+    if resumed_count:
+        print(f"  从检查点恢复: {resumed_count} 块")
+    if metrics is not None:
+        _print_metrics_summary(metrics)
+    if chunk_tokens is not None:
+        _print_makespan_report(chunk_tokens, durations, max_workers, schedule, wall_time)
+    
+    return translated_chunks, errors
+
+
+async def translate_chunk_with_retry_async(
+    chunk: str,
+    chunk_index: int,
+    semaphore: asyncio.Semaphore,
+    max_retries: int = 3,
+    initial_delay: float = 1.0,
+    cache: Optional[TranslationCache] = None,
+    rate_limiter: Optional[RateLimiter] = None,
+    metrics: Optional[RunMetrics] = None,
+    mask: bool = False,
+    skip_min_words: int = 0
+) -> Tuple[int, Optional[str], Optional[str]]:
+    """
+    translate_chunk_with_retry 的异步版本。
+    
+    只有真正发出 LLM 请求时才占用信号量，退避等待期间会释放名额给其他块。
+    
+    Args:
+        chunk: 要翻译的文本块
+        chunk_index: 文本块的索引（用于保持顺序）
+        semaphore: 限制同时在途请求数的信号量
+        max_retries: 最大重试次数
+        initial_delay: 初始重试延迟（秒）
+        cache: 翻译缓存（可选）
+        rate_limiter: RPM/TPM 限流器（可选）
+        metrics: 逐块指标收集器（可选），等待信号量的时间计入限流等待
+        mask: 是否替换不需要翻译的片段，含义同 translate_chunk_with_retry
+        skip_min_words: 跳过没有文字内容的块，含义同 translate_chunk_with_retry
+    
+    Returns:
+        (chunk_index, translated_text, error_message)，含义同 translate_chunk_with_retry
+    """
+    started_at = time.monotonic()
+    if skip_min_words and not needs_translation(chunk, skip_min_words):
+        if metrics is not None:
+            metrics.record(chunk_index, "skipped", started_at=started_at, skipped_tokens=count_tokens(chunk))
+        return (chunk_index, chunk, None)
+
+    cache_key = None
+    if cache is not None:
+        cache_key = TranslationCache.make_key(chunk, MODEL_NAME, SYSTEM_PROMPT)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            if metrics is not None:
+                metrics.record(chunk_index, "cached", started_at=started_at)
+            return (chunk_index, cached, None)
+
+    text, spans = mask_spans(chunk) if mask else (chunk, [])
+
+    delay = initial_delay
+    throttle_wait = 0.0
+    
+    for attempt in range(max_retries):
+        try:
+            estimated_tokens = 0
+            if rate_limiter is not None:
+                estimated_tokens = estimate_request_tokens(text, SYSTEM_PROMPT)
+            wait_start = time.monotonic()
+            charged_tokens = 0
+            if rate_limiter is not None:
+                charged_tokens = await rate_limiter.acquire_async(estimated_tokens)
+            async with semaphore:
+                request_start = time.monotonic()
+                throttle_wait += request_start - wait_start
+                response = await translate_text_async(text)
+                latency = time.monotonic() - request_start
+            if rate_limiter is not None and response.usage is not None:
+                rate_limiter.settle(charged_tokens, response.usage.total_tokens)
+            translated = response.choices[0].message.content
+            if spans:
+                try:
+                    translated = restore_spans(translated or "", spans)
+                except PlaceholderMismatchError:
+                    # 模型改动了占位符，之后的尝试发送未替换的原文
+                    text, spans = chunk, []
+                    raise
+            if cache is not None and translated:
+                cache.put(cache_key, translated)
+            if metrics is not None:
+                masked_tokens = count_tokens(chunk) - count_tokens(text) if spans else 0
+                _record_response(metrics, chunk_index, response, started_at, latency, throttle_wait, attempt + 1,
+                                 masked_tokens)
+            return (chunk_index, translated, None)
+        
+        except Exception as e:
+            error_msg = f"Chunk {chunk_index} attempt {attempt + 1}/{max_retries} failed: {str(e)}"
+            
+            if attempt < max_retries - 1:
+                await asyncio.sleep(delay)
+                delay *= 2  # 指数退避
+            else:
+                if metrics is not None:
+                    metrics.record(chunk_index, "failed", started_at=started_at, throttle_wait=throttle_wait,
+                                   attempts=attempt + 1, error=error_msg)
+                return (chunk_index, None, error_msg)
+    
+    return (chunk_index, None, f"Chunk {chunk_index} failed after {max_retries} retries")
+
+
+async def translate_chunks_concurrent_async(
+    chunks: List[str],
+    max_concurrency: int = 50,
+    max_retries: int = 3,
+    cache: Optional[TranslationCache] = None,
+    rate_limiter: Optional[RateLimiter] = None,
+    writer: Optional[OrderedChunkWriter] = None,
+    journal: Optional[CheckpointJournal] = None,
+    schedule: str = "lpt",
+    metrics: Optional[RunMetrics] = None,
+    mask: bool = False,
+    skip_min_words: int = 0
+) -> Tuple[List[str], List[str]]:
+    """
+    基于 asyncio 的并发翻译，所有请求在单个线程的事件循环中完成。
+    
+    与 translate_chunks_concurrent 的返回约定相同，但在途请求不占用系统线程，
+    适合把并发数提高到几百的批量任务。
+    
+    Args:
+        chunks: 要翻译的文本块列表
+        max_concurrency: 同时在途的最大请求数
+        max_retries: 每个块的最大重试次数
+        cache: 翻译缓存（可选）
+        rate_limiter: RPM/TPM 限流器（可选）
+        writer: 有序流式写入器（可选），含义同 translate_chunks_concurrent
+        journal: 检查点日志（可选），含义同 translate_chunks_concurrent
+        schedule: 派发顺序（"lpt" 或 "document"），含义同 translate_chunks_concurrent（传入 writer 时 LPT 同样限制在窗口内）
+        metrics: 逐块指标收集器（可选），含义同 translate_chunks_concurrent
+        mask: 是否替换不需要翻译的片段，含义同 translate_chunks_concurrent
+        skip_min_words: 跳过没有文字内容的块，含义同 translate_chunks_concurrent
+    
+    Returns:
+        (translated_chunks, errors)
+        - translated_chunks: 翻译后的文本块列表（按原始顺序）；传入 writer 时为空列表
+        - errors: 错误信息列表
+    """
+    if not chunks:
+        return [], []
+    
+    print(f"\n开始翻译 {len(chunks)} 个文本块（asyncio）...")
+    print(f"最大在途请求数: {max_concurrency}, 最大重试次数: {max_retries}\n")
+    
+    results = {}
+    errors = []
+    cache_hits_before = cache.hits if cache is not None else 0
+    cache_misses_before = cache.misses if cache is not None else 0
+    semaphore = asyncio.Semaphore(max_concurrency)
+    ensure_pool_size(max_concurrency)
+    
+    resumed = journal.completed_chunks(chunks) if journal is not None else {}
+    for chunk_index in sorted(resumed):
+        if metrics is not None:
+            metrics.record(chunk_index, "resumed")
+        if writer is not None:
+            writer.add(chunk_index, resumed[chunk_index])
+        else:
+            results[chunk_index] = resumed[chunk_index]
+    
+    # 信号量按等待顺序放行，任务的创建顺序即派发顺序
+    if schedule not in ("lpt", "document"):
+        raise ValueError(f"未知的调度策略: {schedule}")
+    order = _dispatch_order(count_tokens_batch(chunks), schedule, writer, max_concurrency)
+    
+    tasks = []
+    for i in order:
+        if i in resumed:
+            continue
+        if metrics is not None:
+            metrics.submitted(i)
+        tasks.append(asyncio.create_task(
+            translate_chunk_with_retry_async(
+                chunks[i], i, semaphore, max_retries, cache=cache, rate_limiter=rate_limiter, metrics=metrics,
+                mask=mask, skip_min_words=skip_min_words
+            )
+        ))
+    
+    with tqdm(total=len(chunks), initial=len(resumed), desc="翻译进度", unit="块") as pbar:
+        for task in asyncio.as_completed(tasks):
+            chunk_index, translated, error = await task
+            
+            if error:
+                errors.append(error)
+                tqdm.write(f"❌ {error}")
+                translated = f"\n<!-- 翻译失败: {error} -->\n{chunks[chunk_index]}\n"
+            else:
+                tqdm.write(f"✓ 块 {chunk_index} 翻译完成")
+                if journal is not None:
+                    journal.record(chunk_index, chunks[chunk_index], translated)
+            
+            if writer is not None:
+                writer.add(chunk_index, translated)
+            else:
+                results[chunk_index] = translated
+            
+            pbar.update(1)
+    
+    # 事件循环结束前关闭本循环的客户端，释放连接
+    await close_async_client()
+    if metrics is not None:
+        metrics.finish()
+    
+    translated_chunks = [results[i] for i in range(len(chunks))] if writer is None else []
+    
     success_count = len(chunks) - len(errors)
     print(f"\n翻译完成统计:")
     print(f"  成功: {success_count}/{len(chunks)}")
     print(f"  失败: {len(errors)}/{len(chunks)}")
+    if cache is not None:
+        print(f"  缓存命中: {cache.hits - cache_hits_before}, 未命中: {cache.misses - cache_misses_before}")
+    if rate_limiter is not None:
+        print(f"  限流等待: {rate_limiter.total_wait:.1f}s (RPM={rate_limiter.rpm}, TPM={rate_limiter.tpm})")
+    if writer is not None:
+        print(f"  乱序缓冲峰值: {writer.max_pending} 块")
+    if resumed:
+        print(f"  从检查点恢复: {len(resumed)} 块")
+    if metrics is not None:
+        _print_metrics_summary(metrics)
     
     return translated_chunks, errors
 
@@ -132,22 +750,11 @@ def save_translated_markdown(
         output_path: 输出文件路径
         errors: 错误信息列表（可选，会附加到文件末尾）
     """
-    # 确保输出目录存在
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    
-    # 合并所有翻译块
-    full_text = "\n\n".join(translated_chunks)
-    
-    # 写入文件
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(full_text)
-        
-        # 如果有错误，附加到文件末尾
-        if errors:
-            f.write("\n\n---\n\n")
-            f.write("## 翻译错误日志\n\n")
-            for error in errors:
-                f.write(f"- {error}\n")
+    # 与流式写入共用同一套格式：块之间以空行分隔，错误日志附加在末尾
+    writer = OrderedChunkWriter(output_path)
+    for i, chunk in enumerate(translated_chunks):
+        writer.add(i, chunk)
+    writer.close(errors)
     
     print(f"\n翻译结果已保存到: {output_path}")
 
@@ -157,7 +764,34 @@ def translate_paper(
     output_md_path = None,
     max_tokens: int = 2048,
     max_workers: int = 3,
-    max_retries: int = 3
+    max_retries: int = 3,
+    use_cache: bool = True,
+    cache_path: str = DEFAULT_CACHE_PATH,
+    use_async: bool = False,
+    adaptive_concurrency: bool = False,
+    min_workers: int = 1,
+    rpm: Optional[int] = None,
+    tpm: Optional[int] = None,
+    stream_output: bool = True,
+    resume: bool = True,
+    chunk_strategy: str = "greedy",
+    schedule: str = "lpt",
+    executor: Optional[ThreadPoolExecutor] = None,
+    rate_limiter: Optional[RateLimiter] = None,
+    write_report: bool = True,
+    prometheus_path: Optional[str] = None,
+    stream_chunks: bool = False,
+    approximate_tokens: bool = False,
+    include_prompt_overhead: bool = False,
+    mask_untranslatable: bool = True,
+    skip_min_prose_words: int = MIN_PROSE_WORDS,
+    hedge_percentile: Optional[float] = None,
+    hedge_max_ratio: float = 0.1,
+    providers_file: Optional[str] = None,
+    router: Optional[ProviderRouter] = None,
+    use_memory: bool = False,
+    memory_path: str = DEFAULT_MEMORY_PATH,
+    memory_min_similarity: float = MIN_SIMILARITY
 ) -> bool:
     """
     完整的论文翻译流程：分块 -> 并发翻译 -> 保存结果。
@@ -166,12 +800,60 @@ def translate_paper(
         input_md_path: 输入的 Markdown 文件路径
         output_md_path: 输出的 Markdown 文件路径或文件夹路径
         max_tokens: 每个块的最大 token 数
-        max_workers: 最大并发线程数
+        max_workers: 最大并发线程数（use_async=True 时为最大在途请求数）
         max_retries: 每个块的最大重试次数
+        use_cache: 是否启用持久化翻译缓存（重复运行时跳过已翻译过的块）
+        cache_path: 翻译缓存数据库路径
+        use_async: 是否使用 asyncio 引擎（translate_chunks_concurrent_async）代替线程池
+        adaptive_concurrency: 是否启用 AIMD 自适应并发，启用后 max_workers 作为并发上限
+        min_workers: 自适应并发的下限
+        rpm: 每分钟最大请求数，None 时读取环境变量 DEEPSEEK_RPM
+        tpm: 每分钟最大 token 数，None 时读取环境变量 DEEPSEEK_TPM
+        stream_output: 是否在每个块完成后按顺序立即写入输出文件（运行中即可查看已完成的前缀）
+        resume: 是否从检查点日志恢复上次中断的运行；为 False 时忽略并清空旧日志
+        chunk_strategy: 分块合并策略，"greedy" 或 "balanced"（块大小更均匀），见 chunk_md
+        schedule: 派发顺序，"lpt"（大块优先）或 "document"（文档顺序）
+        executor: 外部共享的 LLM 线程池（可选，批量模式使用），见 translate_chunks_concurrent
+        rate_limiter: 外部共享的限流器（可选，批量模式下多篇论文共用同一份 RPM/TPM 预算），
+                      传入时忽略 rpm/tpm 参数
+        write_report: 是否在输出文件旁写出 JSON 运行报告（<输出文件名>.report.json），
+                      包含逐块的 token 数、排队/限流等待、延迟、尝试次数与 finish_reason
+        prometheus_path: Prometheus textfile 路径（可选），写出本次运行的汇总指标，
+                         供 node_exporter 的 textfile collector 采集
+        stream_chunks: 是否使用流式分块（chunk_md.iter_chunks）：单遍扫描内存映射的文件，
+                       分块的同时就开始翻译前面的块，适合超大文件；只支持 greedy 合并与线程池引擎，
+                       派发顺序固定为文档顺序
+        approximate_tokens: greedy 分块时是否使用近似 token 计数（按字符比例估计，
+                            只在接近 max_tokens 时精确分词），大文件分块更快，见 chunk_md.greedy_merge_chunks
+        include_prompt_overhead: 为 True 时 max_tokens 表示整个请求的输入 token 上限，
+                                 分块预算扣除提示词模板的开销（系统消息、用户消息模板与 chat 格式）
+        mask_untranslatable: 是否把公式、代码块、图片链接与数据表格替换为短占位符再发送、译文返回后还原，
+                             节省输入与输出 token，并避免模型改动这些内容；运行报告中记录节省的 token 数
+        skip_min_prose_words: 公式、代码、图片与数据表格之外不足该数量英文单词（且没有带文字标题）的块
+                              不调用 LLM、原文直接输出；0 表示所有块都发送翻译
+        hedge_percentile: 启用对冲请求（仅线程池引擎）：请求耗时超过近期延迟的该分位数（如 95）时
+                          再发一个相同的请求，先成功者胜出；None 表示不对冲
+        hedge_max_ratio: 对冲请求数占总请求数的上限
+        providers_file: 多提供商配置文件（JSON，见 service.providers.load_providers_from_file），
+                        None 时读取环境变量 LLM_PROVIDERS_FILE / LLM_PROVIDERS；都未配置时只使用 DEEPSEEK。
+                        启用多提供商时请求按各提供商的实时延迟、错误率与空闲容量分配，出错的提供商自动熔断；
+                        各提供商的 RPM/TPM 分别限流（仅线程池引擎）
+        router: 外部共享的多提供商路由器（可选，批量模式下多篇论文共用），传入时忽略 providers_file
+        use_memory: 是否启用段落级翻译记忆（跨论文持久化，仅线程池引擎）：与记忆中段落相同或几乎相同
+                    （Jaccard 相似度不低于 memory_min_similarity，且只有大小写、空白与标点不同）的段落直接复用译文，
+                    整块都命中时不调用 LLM，部分命中时只发送其余段落；新翻译的段落写回记忆
+        memory_path: 翻译记忆数据库路径
+        memory_min_similarity: 近似命中所需的最低相似度，1 表示只复用完全相同的段落
     
     Returns:
         是否成功完成（即使有部分失败，只要保存了文件就返回 True）
     """
+    cache = None
+    writer = None
+    journal = None
+    hedge = None
+    owns_router = False
+    memory = None
     try:
         print(f"正在处理文件: {input_md_path}")
         if not output_md_path:
@@ -199,26 +881,142 @@ def translate_paper(
         print(f"输出路径: {output_md_path}\n")
         
         # 步骤 1: 分块
-        print("步骤 1/3: 分块处理...")
-        chunks = chunk_md(input_md_path, max_tokens=max_tokens)
-        
-        if not chunks:
-            print("错误: 未能从文件中提取任何内容块")
-            return False
-        
-        print(f"成功分割为 {len(chunks)} 个块\n")
+        chunk_budget = max_tokens
+        if include_prompt_overhead:
+            chunk_budget = TRANSLATE_TEMPLATE.chunk_budget(max_tokens)
+            print(f"提示词开销 {TRANSLATE_TEMPLATE.overhead_tokens} tokens，每块原文上限 {chunk_budget} tokens")
+        if stream_chunks and (use_async or chunk_strategy != "greedy"):
+            print("流式分块只支持 greedy 合并与线程池引擎，改为一次性分块")
+            stream_chunks = False
+        if stream_chunks:
+            # 生成器在步骤 2 中被逐块消费，分块与翻译同时进行
+            print("步骤 1/3: 流式分块（与翻译同时进行）...")
+            chunks = iter_chunks(input_md_path, max_tokens=chunk_budget, approximate=approximate_tokens)
+        else:
+            print("步骤 1/3: 分块处理...")
+            chunks = chunk_md(
+                input_md_path, max_tokens=chunk_budget, strategy=chunk_strategy, approximate=approximate_tokens
+            )
+            
+            if not chunks:
+                print("错误: 未能从文件中提取任何内容块")
+                return False
+            
+            print(f"成功分割为 {len(chunks)} 个块\n")
         
         # 步骤 2: 并发翻译
         print("步骤 2/3: 并发翻译...")
-        translated_chunks, errors = translate_chunks_concurrent(
-            chunks,
-            max_workers=max_workers,
-            max_retries=max_retries
+        if use_cache:
+            cache = TranslationCache(cache_path)
+        if router is None:
+            router = ProviderRouter.from_env(providers_file)
+            owns_router = router is not None
+        if router is not None and use_async:
+            print("asyncio 引擎不支持多提供商路由，只使用 DEEPSEEK")
+            router = None
+        if router is not None:
+            print(f"多提供商路由: {', '.join(p.name for p in router.providers)}（总并发上限 {router.capacity}）")
+        # 翻译缓存、翻译记忆与运行报告都按实际使用的模型（组合）区分
+        model = router.model_name if router is not None else MODEL_NAME
+        if use_memory and use_async:
+            print("asyncio 引擎不支持翻译记忆，忽略 use_memory")
+        elif use_memory:
+            memory = TranslationMemory(
+                memory_path, model=model, system_prompt=SYSTEM_PROMPT, min_similarity=memory_min_similarity
+            )
+        if rate_limiter is None:
+            if rpm or tpm:
+                rate_limiter = RateLimiter(rpm=rpm, tpm=tpm)
+            elif router is None:
+                # 多提供商时各自按 {NAME}_RPM / {NAME}_TPM 限流，没有全局预算
+                rate_limiter = RateLimiter.from_env("DEEPSEEK")
+        if stream_output:
+            writer = OrderedChunkWriter(output_md_path)
+        # 检查点日志按输入文件哈希命名，输出文件名带时间戳时也能找到上次的日志
+        input_hash = file_sha256(input_md_path)
+        journal_name = f".{sanitize_filename(os.path.splitext(os.path.basename(input_md_path))[0])}.{input_hash[:12]}.journal.jsonl"
+        journal = CheckpointJournal(
+            os.path.join(os.path.dirname(output_md_path), journal_name),
+            input_hash,
+            resume=resume
         )
+        metrics = RunMetrics()
+        if use_async:
+            if hedge_percentile is not None:
+                print("asyncio 引擎不支持对冲请求，忽略 hedge_percentile")
+            translated_chunks, errors = asyncio.run(translate_chunks_concurrent_async(
+                chunks,
+                max_concurrency=max_workers,
+                max_retries=max_retries,
+                cache=cache,
+                rate_limiter=rate_limiter,
+                writer=writer,
+                journal=journal,
+                schedule=schedule,
+                metrics=metrics,
+                mask=mask_untranslatable,
+                skip_min_words=skip_min_prose_words
+            ))
+        else:
+            controller = None
+            if adaptive_concurrency:
+                controller = AdaptiveConcurrencyController(min_limit=min_workers, max_limit=max_workers)
+            if hedge_percentile is not None:
+                hedge = HedgePolicy(percentile=hedge_percentile, max_ratio=hedge_max_ratio, max_workers=max_workers * 2)
+            translated_chunks, errors = translate_chunks_concurrent(
+                chunks,
+                max_workers=max_workers,
+                max_retries=max_retries,
+                cache=cache,
+                controller=controller,
+                rate_limiter=rate_limiter,
+                writer=writer,
+                journal=journal,
+                schedule=schedule,
+                executor=executor,
+                metrics=metrics,
+                mask=mask_untranslatable,
+                skip_min_words=skip_min_prose_words,
+                hedge=hedge,
+                router=router,
+                memory=memory
+            )
+        
+        if stream_chunks and not metrics.records:
+            print("错误: 未能从文件中提取任何内容块")
+            return False
         
         # 步骤 3: 保存结果
         print("\n步骤 3/3: 保存翻译结果...")
-        save_translated_markdown(translated_chunks, output_md_path, errors)
+        if writer is not None:
+            # 译文已在翻译过程中写入，只需附加错误日志
+            writer.close(errors)
+            print(f"\n翻译结果已保存到: {output_md_path}")
+        else:
+            save_translated_markdown(translated_chunks, output_md_path, errors)
+        
+        # 全部成功后不再需要检查点日志；有失败时保留，下次运行只重试失败的块
+        journal.close(remove=not errors)
+        
+        if write_report:
+            report_path = os.path.splitext(output_md_path)[0] + ".report.json"
+            metrics.write_json(report_path, extra={
+                "input": input_md_path,
+                "output": output_md_path,
+                "model": model,
+                "engine": "asyncio" if use_async else "threads",
+                "max_tokens": max_tokens,
+                "chunk_budget": chunk_budget,
+                "max_workers": max_workers,
+                "chunk_strategy": chunk_strategy,
+                "schedule": schedule,
+                "hedging": hedge.summary() if hedge is not None else None,
+                "providers": router.summary() if router is not None else None,
+            })
+            print(f"运行报告已保存到: {report_path}")
+        if prometheus_path:
+            paper = sanitize_filename(os.path.splitext(os.path.basename(input_md_path))[0])
+            metrics.write_prometheus(prometheus_path, labels={"paper": paper})
         
         if errors:
             print(f"\n⚠️ 警告: 有 {len(errors)} 个块翻译失败，详见输出文件末尾")
@@ -233,6 +1031,20 @@ def translate_paper(
         traceback.print_exc()
         return False
 
+    finally:
+        if journal is not None:
+            journal.close()
+        if writer is not None:
+            writer.close()
+        if cache is not None:
+            cache.close()
+        if memory is not None:
+            memory.close()
+        if hedge is not None:
+            hedge.close()
+        if owns_router:
+            router.close()
+
 
 if __name__ == "__main__":
     # 示例用法
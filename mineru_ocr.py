@@ -1,17 +1,51 @@
 import requests
 import os
+import posixpath
+import re
+import shutil
+import threading
+import time
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+from service.checkpoint import file_sha256
 from service.filename_clean import sanitize_filename
+from service.ocr_cache import OcrCache
 
 mineru_api_url = "http://localhost:8000/file_parse"
 
-def request_mineru_translate(filepath, url=mineru_api_url, output_dir="output", lang="en", extract_zip_after=True, delete_zip=False) -> str:
+# 流式下载时每次读取的字节数
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
 
-    if not os.path.exists(filepath):
-        print(f"需要翻译的文件不存在: {filepath}")
-        return ""
+# Markdown 图片链接与 HTML <img> 标签中的图片路径
+_MD_IMAGE_PATTERN = re.compile(r'!\[[^\]]*\]\(\s*<?([^)\s>]+)>?(?:\s+"[^"]*")?\s*\)')
+_HTML_IMAGE_PATTERN = re.compile(r'<img\b[^>]*\bsrc\s*=\s*["\']([^"\']+)["\']', re.IGNORECASE)
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def _get_session() -> requests.Session:
+    """
+    获取共享的 requests.Session，复用到 MinerU 服务的 keep-alive 连接。
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+        return _session
+
+
+def _format_size(num_bytes: int) -> str:
+    return f"{num_bytes / 1024 / 1024:.1f} MB"
+
+
+def _build_form_data(output_dir, lang, start_page_id=0, end_page_id=99999) -> dict:
+    """
+    构造 MinerU file_parse 接口的表单参数。
+    """
     #mineru api运行后，打开http://localhost:8000/docs查看文档
-    data = {
+    return {
         "output_dir": output_dir,
         "lang_list": lang,
         "backend": "pipeline",
@@ -25,56 +59,382 @@ def request_mineru_translate(filepath, url=mineru_api_url, output_dir="output",
         "return_content_list": "false",
         "return_images": "true",
         "response_format_zip": "true",
-        "start_page_id": "0",
-        "end_page_id": "99999",       
+        "start_page_id": str(start_page_id),
+        "end_page_id": str(end_page_id),
     }
-    # 获取原始文件名并清理
+
+
+def _download_mineru_zip(filepath, url, data, zip_path) -> bool:
+    """
+    上传文件到 MinerU，并把返回的 zip 流式写入 zip_path。成功返回 True。
+    """
     original_filename = os.path.basename(filepath)
-    filename, file_extension = os.path.splitext(original_filename)
-    
-    # 清理文件名，移除不合法字符
-    clean_filename = sanitize_filename(filename)
-    
-    files={
-        'files': (original_filename, open(filepath, 'rb'), f"application/{file_extension.replace('.', '')}"),
-    }
-    response = requests.post(url, data=data, files=files)
-    if response.status_code == 200:
-        os.makedirs(output_dir, exist_ok=True)
-        # 使用清理后的文件名保存
-        zip_path = os.path.join(output_dir, f"{clean_filename}.zip")
+    file_extension = os.path.splitext(original_filename)[1]
+
+    start = time.monotonic()
+    with open(filepath, 'rb') as pdf_file:
+        files={
+            'files': (original_filename, pdf_file, f"application/{file_extension.replace('.', '')}"),
+        }
+        # stream=True：响应体不会一次性读入内存，下面按块写入磁盘
+        response = _get_session().post(url, data=data, files=files, stream=True)
+    with response:
+        if response.status_code != 200:
+            print(f"Request failed with status code {response.status_code}: {response.text}")
+            return False
+
+        ocr_seconds = time.monotonic() - start
+        zip_dir = os.path.dirname(zip_path)
+        if zip_dir:
+            os.makedirs(zip_dir, exist_ok=True)
+        downloaded = 0
+        download_start = time.monotonic()
         with open(zip_path, "wb") as f:
-            f.write(response.content)
-        print(f"File saved to {zip_path}")
+            for block in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                f.write(block)
+                downloaded += len(block)
+        download_seconds = time.monotonic() - download_start
+    print(
+        f"File saved to {zip_path} "
+        f"(OCR {ocr_seconds:.1f}s, 下载 {_format_size(downloaded)} 用时 {download_seconds:.1f}s)"
+    )
+    return True
 
-        #解压下载的zip文件，解压路径同zip文件路径，是否删除zip文件可选
-        if extract_zip_after:
-            extract_zip(zip_path, delete_zip=delete_zip)
-            return os.path.join(output_dir, clean_filename, clean_filename + ".md")
-        return zip_path
 
+def _ocr_cache_key(filepath, data) -> str:
+    """
+    OCR 缓存键：PDF 内容哈希 + 除 output_dir 以外的全部 OCR 参数。
+    """
+    params = {k: v for k, v in data.items() if k != "output_dir"}
+    return OcrCache.make_key(file_sha256(filepath), params)
 
-    else:
-        print(f"Request failed with status code {response.status_code}: {response.text}")
+
+def request_mineru_translate(filepath, url=mineru_api_url, output_dir="output", lang="en", extract_zip_after=True, delete_zip=False, extract_mode="all", use_cache=True) -> str:
+    """
+    调用 MinerU 接口对 PDF 进行 OCR，流式下载结果 zip 并（可选）解压。
+
+    Args:
+        filepath: 待 OCR 的文件路径
+        url: MinerU file_parse 接口地址
+        output_dir: 输出目录
+        lang: OCR 语言
+        extract_zip_after: 下载后是否解压
+        delete_zip: 解压后是否删除 zip 包
+        extract_mode: 解压方式，"all" 解压全部文件；"referenced" 只解压 Markdown 及其引用的图片
+        use_cache: 是否使用 OCR 结果缓存（仅 extract_zip_after=True 时生效），
+            同一 PDF 以相同参数 OCR 过且结果仍在 output_dir 中时直接返回已有的 Markdown
+
+    Returns:
+        解压后的 Markdown 路径（extract_zip_after=True）或 zip 路径，失败返回空字符串
+    """
+
+    if not os.path.exists(filepath):
+        print(f"需要翻译的文件不存在: {filepath}")
+        return ""
+    data = _build_form_data(output_dir, lang)
+    cache = OcrCache(output_dir) if use_cache and extract_zip_after else None
+    if cache is not None:
+        cache_key = _ocr_cache_key(filepath, data)
+        cached = cache.get(cache_key)
+        if cached:
+            print(f"OCR 缓存命中，跳过 MinerU: {cached}")
+            return cached
+    # 获取原始文件名并清理
+    filename = os.path.splitext(os.path.basename(filepath))[0]
+
+    # 清理文件名，移除不合法字符
+    clean_filename = sanitize_filename(filename)
+
+    os.makedirs(output_dir, exist_ok=True)
+    # 使用清理后的文件名保存
+    zip_path = os.path.join(output_dir, f"{clean_filename}.zip")
+    if not _download_mineru_zip(filepath, url, data, zip_path):
         return ""
 
+    #解压下载的zip文件，解压路径同zip文件路径，是否删除zip文件可选
+    if extract_zip_after:
+        md_path, extracted = _extract_zip(zip_path, delete_zip=delete_zip, markdown_only=(extract_mode == "referenced"))
+        if md_path and cache is not None:
+            cache.put(cache_key, md_path, source=filepath, files=extracted)
+        return md_path or os.path.join(output_dir, clean_filename, clean_filename + ".md")
+    return zip_path
+
+
+def _referenced_images(markdown: str, md_member: str, names: List[str]) -> List[str]:
+    """
+    找出 Markdown 中引用、且确实存在于压缩包中的图片成员名。
+    """
+    base_dir = posixpath.dirname(md_member)
+    available = set(names)
+    referenced = []
+    for match in list(_MD_IMAGE_PATTERN.finditer(markdown)) + list(_HTML_IMAGE_PATTERN.finditer(markdown)):
+        ref = match.group(1)
+        if "://" in ref:
+            continue
+        member = posixpath.normpath(posixpath.join(base_dir, ref))
+        if member in available and member not in referenced:
+            referenced.append(member)
+    return referenced
+
+
+def read_markdown_from_zip(zip_path) -> Tuple[str, str]:
+    """
+    不解压，直接从 zip 中读取 Markdown 内容。
+
+    Returns:
+        (Markdown 在压缩包中的成员名, Markdown 文本)；压缩包中没有 Markdown 时返回 ("", "")
+    """
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        md_members = [name for name in zip_ref.namelist() if name.lower().endswith(".md")]
+        if not md_members:
+            return "", ""
+        with zip_ref.open(md_members[0]) as f:
+            return md_members[0], f.read().decode("utf-8")
 
-def extract_zip(zip_path, extract_to=None, delete_zip=False):
+
+def extract_zip(zip_path, extract_to=None, delete_zip=False, markdown_only=False) -> str:
+    """
+    解压 MinerU 返回的 zip。
+
+    Args:
+        zip_path: zip 文件路径
+        extract_to: 解压目录，默认与 zip 同目录
+        delete_zip: 解压后是否删除 zip
+        markdown_only: 为 True 时只解压 Markdown 及其引用的图片，跳过中间 JSON、未引用图片等
+
+    Returns:
+        解压出的 Markdown 文件路径，压缩包中没有 Markdown 时返回空字符串
+    """
+    return _extract_zip(zip_path, extract_to, delete_zip, markdown_only)[0]
+
+
+def _extract_zip(zip_path, extract_to=None, delete_zip=False, markdown_only=False) -> Tuple[str, List[str]]:
+    """
+    extract_zip 的实现，另外返回实际解压出的文件路径列表（供 OCR 缓存记录本次创建了哪些文件）。
+    """
     if not extract_to:
         extract_to = os.path.dirname(zip_path)
+    extract_root = os.path.realpath(extract_to)
+    start = time.monotonic()
+    extracted_bytes = 0
+    extracted = []
+    md_path = ""
     with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-        zip_ref.extractall(extract_to)
-        print(f"Extracted files to {extract_to}")
+        names = zip_ref.namelist()
+        md_members = [name for name in names if name.lower().endswith(".md")]
+        if markdown_only:
+            members = list(md_members)
+            for md_member in md_members:
+                with zip_ref.open(md_member) as f:
+                    markdown = f.read().decode("utf-8")
+                members.extend(_referenced_images(markdown, md_member, names))
+        else:
+            members = names
+
+        for member in members:
+            # 防止压缩包中的 ../ 路径写到解压目录之外
+            target = os.path.realpath(os.path.join(extract_to, member))
+            if not target.startswith(extract_root + os.sep):
+                print(f"跳过不安全的路径: {member}")
+                continue
+            path = zip_ref.extract(member, extract_to)
+            if not zip_ref.getinfo(member).is_dir():
+                extracted.append(path)
+            extracted_bytes += zip_ref.getinfo(member).file_size
+        if md_members:
+            md_path = os.path.join(extract_to, *md_members[0].split("/"))
+        print(
+            f"Extracted {len(members)}/{len(names)} files ({_format_size(extracted_bytes)}) "
+            f"to {extract_to} in {time.monotonic() - start:.1f}s"
+        )
 
     if delete_zip:
         if not os.path.exists(zip_path):
             print(f"Zip file does not exist: {zip_path}")
-            return
+            return md_path, extracted
         os.remove(zip_path)
         print(f"Deleted zip file: {zip_path}")
+    return md_path, extracted
+
+
+# 没有 pypdf 时，用正则在原始字节中统计页对象（/Type /Page，不含 /Pages）
+_PDF_PAGE_PATTERN = re.compile(rb"/Type\s*/Page(?![A-Za-z])")
+# 流式扫描时相邻块的重叠字节数，需大于一个页对象标记（含其中的空白）的长度
+_PAGE_SCAN_OVERLAP = 64
+
+
+def count_pdf_pages(filepath) -> int:
+    """
+    获取 PDF 页数。优先使用可选依赖 pypdf；未安装或解析失败时退回到正则扫描原始字节。
+    页对象被压缩在对象流中时正则可能数不到，此时返回 0。
+    """
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        PdfReader = None
+    if PdfReader is not None:
+        try:
+            return len(PdfReader(filepath).pages)
+        except Exception as e:
+            print(f"pypdf 读取页数失败，改用正则统计: {e}")
+    with open(filepath, 'rb') as f:
+        return _scan_page_objects(f)
+
+
+def _scan_page_objects(f, block_size: int = 1 << 20) -> int:
+    """
+    按块流式扫描 PDF 原始字节中的页对象，内存占用与文件大小无关。
+
+    每块末尾 _PAGE_SCAN_OVERLAP 字节内开始的匹配留到与下一块拼接后再统计，
+    跨块边界的 "/Type /Page" 不会被漏数、重复计数，也不会把 "/Pages" 的前缀误认作页对象。
+    """
+    count = 0
+    buffer = b""
+    while True:
+        block = f.read(block_size)
+        if not block:
+            return count + len(_PDF_PAGE_PATTERN.findall(buffer))
+        buffer += block
+        keep_from = len(buffer) - _PAGE_SCAN_OVERLAP
+        for match in _PDF_PAGE_PATTERN.finditer(buffer):
+            if match.start() >= keep_from:
+                break
+            count += 1
+            keep_from = max(keep_from, match.end())
+        buffer = buffer[max(keep_from, 0):]
+
+
+def plan_page_shards(total_pages: int, pages_per_shard: int) -> List[Tuple[int, int]]:
+    """
+    把 [0, total_pages) 切分为若干个闭区间 (start_page_id, end_page_id)。
+    """
+    pages_per_shard = max(1, pages_per_shard)
+    return [
+        (start, min(start + pages_per_shard, total_pages) - 1)
+        for start in range(0, total_pages, pages_per_shard)
+    ]
+
+
+def _relocate_images(markdown: str, md_dir: str, images_dir: str, prefix: str) -> str:
+    """
+    把分片 Markdown 引用的图片复制到合并后的 images 目录，并把链接改写为 images/<文件名>。
+    不同分片出现同名图片时按内容哈希比较，内容相同则复用，不同则加上分片前缀避免覆盖
+    （大小相同、内容不同的图片也会被区分）。
+    """
+    def replace(match):
+        ref = match.group(1)
+        if "://" in ref:
+            return match.group(0)
+        source = os.path.normpath(os.path.join(md_dir, ref))
+        if not os.path.isfile(source):
+            return match.group(0)
+        name = os.path.basename(source)
+        target = os.path.join(images_dir, name)
+        if not (os.path.exists(target) and file_sha256(target) == file_sha256(source)):
+            if os.path.exists(target):
+                name = f"{prefix}_{name}"
+                target = os.path.join(images_dir, name)
+            # 带分片前缀的文件名只属于本分片，直接覆盖（可能是上一次运行留下的旧文件）
+            os.makedirs(images_dir, exist_ok=True)
+            shutil.copyfile(source, target)
+        start, end = match.span(1)
+        whole_start = match.start(0)
+        text = match.group(0)
+        return text[:start - whole_start] + f"images/{name}" + text[end - whole_start:]
+
+    markdown = _MD_IMAGE_PATTERN.sub(replace, markdown)
+    return _HTML_IMAGE_PATTERN.sub(replace, markdown)
+
+
+def request_mineru_sharded(filepath, urls=(mineru_api_url,), output_dir="output", lang="en", pages_per_shard=10, max_workers=None, delete_zip=True, use_cache=True) -> str:
+    """
+    按页码范围分片并行 OCR：同一个 PDF 以不同的 start_page_id/end_page_id 并发提交，
+    分片轮流分配给 urls 中的多个 MinerU 实例，全部完成后按页码顺序拼接 Markdown 并合并图片目录。
+
+    单个实例时，并行分片可以让 MinerU 的上传、推理与结果打包互相重叠；
+    多个实例（多 GPU / 多机器）时，长论文的 OCR 时间大致按实例数缩短。
+    无法获取页数或只有一个分片时，退回到 request_mineru_translate。
+
+    Args:
+        filepath: 待 OCR 的 PDF 路径
+        urls: 一个或多个 MinerU file_parse 接口地址
+        output_dir: 输出目录，结果写入 output_dir/<文件名>/<文件名>.md
+        lang: OCR 语言
+        pages_per_shard: 每个分片的页数
+        max_workers: 同时进行的分片请求数，默认每个实例 2 个
+        delete_zip: 合并后是否删除分片 zip
+        use_cache: 是否使用 OCR 结果缓存，与整篇 OCR 共用同一个缓存键
+
+    Returns:
+        合并后的 Markdown 路径，任一分片失败时返回空字符串
+    """
+    if isinstance(urls, str):
+        urls = [urls]
+    urls = list(urls)
+    if not os.path.exists(filepath):
+        print(f"需要翻译的文件不存在: {filepath}")
+        return ""
+
+    total_pages = count_pdf_pages(filepath)
+    shards = plan_page_shards(total_pages, pages_per_shard)
+    if len(shards) <= 1:
+        return request_mineru_translate(filepath, url=urls[0], output_dir=output_dir, lang=lang, delete_zip=delete_zip, use_cache=use_cache)
+
+    cache = OcrCache(output_dir) if use_cache else None
+    if cache is not None:
+        cache_key = _ocr_cache_key(filepath, _build_form_data(output_dir, lang))
+        cached = cache.get(cache_key)
+        if cached:
+            print(f"OCR 缓存命中，跳过 MinerU: {cached}")
+            return cached
+
+    clean_filename = sanitize_filename(os.path.splitext(os.path.basename(filepath))[0])
+    shard_root = os.path.join(output_dir, f".{clean_filename}_shards")
+    if max_workers is None:
+        max_workers = 2 * len(urls)
+    print(f"分片 OCR: {total_pages} 页 → {len(shards)} 个分片, {len(urls)} 个 MinerU 实例, 并发 {max_workers}")
+
+    def run_shard(k: int) -> str:
+        start_page, end_page = shards[k]
+        name = f"p{start_page:05d}-{end_page:05d}"
+        zip_path = os.path.join(shard_root, f"{name}.zip")
+        data = _build_form_data(output_dir, lang, start_page, end_page)
+        if not _download_mineru_zip(filepath, urls[k % len(urls)], data, zip_path):
+            return ""
+        return extract_zip(zip_path, extract_to=os.path.join(shard_root, name), delete_zip=delete_zip)
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mineru") as pool:
+        shard_mds = list(pool.map(run_shard, range(len(shards))))
+
+    failed = [shards[k] for k, md in enumerate(shard_mds) if not md]
+    if failed:
+        print(f"分片 OCR 失败的页码范围: {failed}，分片结果保留在 {shard_root}")
+        return ""
+
+    final_dir = os.path.join(output_dir, clean_filename)
+    images_dir = os.path.join(final_dir, "images")
+    os.makedirs(final_dir, exist_ok=True)
+    parts = []
+    for k, md_path in enumerate(shard_mds):
+        with open(md_path, 'r', encoding='utf-8') as f:
+            markdown = f.read()
+        parts.append(_relocate_images(markdown, os.path.dirname(md_path), images_dir, f"p{shards[k][0]}").strip())
+
+    md_path = os.path.join(final_dir, clean_filename + ".md")
+    markdown = "\n\n".join(parts) + "\n"
+    with open(md_path, 'w', encoding='utf-8') as f:
+        f.write(markdown)
+    shutil.rmtree(shard_root, ignore_errors=True)
+    if cache is not None:
+        images = ["images/" + name for name in os.listdir(images_dir)] if os.path.isdir(images_dir) else []
+        files = [md_path] + [os.path.join(final_dir, *ref.split("/")) for ref in _referenced_images(markdown, "", images)]
+        cache.put(cache_key, md_path, source=filepath, files=files)
+    print(f"分片 OCR 完成: {md_path}，用时 {time.monotonic() - start:.1f}s")
+    return md_path
 
 # if __name__ == "__main__":
 #     test_filepath = r"C:\Users\zzz\Downloads\2504.17550v1.pdf"
 #     request_mineru_translate(test_filepath)
 
-#     extract_zip(r"C:\zzz_disk\project\translate_paper\output\2504.17550v1_translated.zip", delete_zip=False)
\ No newline at end of file
+#     extract_zip(r"C:\zzz_disk\project\translate_paper\output\2504.17550v1_translated.zip", delete_zip=False)
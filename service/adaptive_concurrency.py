@@ -0,0 +1,182 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+import openai
+
+# 被视为"服务端过载"的 HTTP 状态码：限流与网关超时/不可用
+OVERLOAD_STATUS_CODES = (429, 502, 503, 504)
+
+
+def is_overload_error(error: BaseException) -> bool:
+    """
+    判断异常是否表示服务端过载（限流或超时），此类错误需要降低并发。
+    """
+    if isinstance(error, (openai.RateLimitError, openai.APITimeoutError, TimeoutError)):
+        return True
+    return getattr(error, "status_code", None) in OVERLOAD_STATUS_CODES
+
+
+class AdaptiveConcurrencyController:
+    """
+    AIMD（加性增、乘性减）并发控制器，用于替代固定的 max_workers。
+
+    - 慢启动：在第一次拥塞之前，每个成功请求使并发上限 +1（每轮约翻倍）；
+    - 拥塞避免：之后每个成功请求使上限 +1/limit（每轮约 +1）；
+    - 遇到限流/超时，或近期错误率过高时，上限乘以 decrease_factor；
+      同一轮内（在上次降低之前发出的请求）的多个失败只触发一次降低；
+    - 请求延迟明显高于历史平均时暂停增长。
+
+    工作线程通过 slot() 上下文管理器包裹每一次 LLM 请求，超出当前上限的线程会阻塞等待。
+    """
+
+    def __init__(
+        self,
+        min_limit: int = 1,
+        max_limit: int = 16,
+        initial_limit: Optional[int] = None,
+        decrease_factor: float = 0.5,
+        latency_tolerance: float = 2.0,
+        error_rate_threshold: float = 0.2,
+        window_size: int = 20
+    ):
+        """
+        Args:
+            min_limit: 并发上限的下界
+            max_limit: 并发上限的上界（线程池大小）
+            initial_limit: 初始并发上限，默认为 min_limit
+            decrease_factor: 发生拥塞时上限的缩减系数
+            latency_tolerance: 延迟超过平均延迟的多少倍时停止增长
+            error_rate_threshold: 最近 window_size 个请求的错误率超过该值时降低上限
+            window_size: 计算错误率的滑动窗口大小
+        """
+        if not 1 <= min_limit <= max_limit:
+            raise ValueError(f"需要 1 <= min_limit <= max_limit，实际为 {min_limit}, {max_limit}")
+
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.error_rate_threshold = error_rate_threshold
+        self.window_size = window_size
+
+        self._cond = threading.Condition()
+        self._limit = float(initial_limit if initial_limit is not None else min_limit)
+        self._limit = min(max(self._limit, min_limit), max_limit)
+        self._in_flight = 0
+        self._slow_start = True
+        self._avg_latency: Optional[float] = None
+        self._recent_errors: List[bool] = []
+        self._last_decrease = 0.0
+        self._start_time = time.monotonic()
+        self.history: List[Tuple[float, int]] = [(0.0, int(self._limit))]
+
+    @property
+    def limit(self) -> int:
+        """当前允许的最大在途请求数"""
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def acquire(self) -> float:
+        """
+        阻塞直到在途请求数低于当前上限，返回请求开始时间（传给 release）。
+        """
+        with self._cond:
+            while self._in_flight >= int(self._limit):
+                self._cond.wait()
+            self._in_flight += 1
+            return time.monotonic()
+
+    def release(self, started_at: float, error: Optional[BaseException] = None) -> None:
+        """
+        请求结束时调用，根据延迟与错误类型调整并发上限。
+
+        Args:
+            started_at: acquire() 的返回值
+            error: 请求抛出的异常，成功时为 None
+        """
+        now = time.monotonic()
+        latency = now - started_at
+        with self._cond:
+            self._in_flight -= 1
+            self._recent_errors.append(error is not None)
+            if len(self._recent_errors) > self.window_size:
+                self._recent_errors.pop(0)
+
+            if error is not None:
+                error_rate = sum(self._recent_errors) / len(self._recent_errors)
+                congested = is_overload_error(error) or (
+                    len(self._recent_errors) >= self.window_size // 2
+                    and error_rate > self.error_rate_threshold
+                )
+                # 上次降低之前就已发出的请求反映的是旧的并发水平，不重复惩罚
+                if congested and started_at >= self._last_decrease:
+                    self._set_limit(self._limit * self.decrease_factor, now)
+                    self._slow_start = False
+                    self._last_decrease = now
+            else:
+                healthy = (
+                    self._avg_latency is None
+                    or latency <= self._avg_latency * self.latency_tolerance
+                )
+                if healthy:
+                    step = 1.0 if self._slow_start else 1.0 / max(self._limit, 1.0)
+                    self._set_limit(self._limit + step, now)
+                # 指数加权平均延迟
+                if self._avg_latency is None:
+                    self._avg_latency = latency
+                else:
+                    self._avg_latency = 0.8 * self._avg_latency + 0.2 * latency
+
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self):
+        """
+        包裹一次 LLM 请求：进入时获取名额，退出时按结果调整上限，异常会继续向上抛出。
+        """
+        started_at = self.acquire()
+        try:
+            yield
+        except BaseException as e:
+            self.release(started_at, error=e)
+            raise
+        else:
+            self.release(started_at)
+
+    def summary(self) -> str:
+        """
+        返回运行期间并发上限的变化摘要：最小/最大/时间加权平均值与变化时间线。
+        """
+        with self._cond:
+            history = list(self.history)
+            elapsed = time.monotonic() - self._start_time
+
+        limits = [limit for _, limit in history]
+        weighted = 0.0
+        for (t0, limit), (t1, _) in zip(history, history[1:] + [(elapsed, 0)]):
+            weighted += limit * (t1 - t0)
+        average = weighted / elapsed if elapsed > 0 else float(limits[-1])
+
+        # 时间线过长时只保留均匀采样的若干个点
+        max_points = 12
+        step = max(1, len(history) // max_points)
+        points = history[::step]
+        if points[-1] != history[-1]:
+            points.append(history[-1])
+        timeline = " → ".join(f"{limit}@{t:.0f}s" for t, limit in points)
+
+        return (
+            f"最小 {min(limits)}, 最大 {max(limits)}, 平均 {average:.1f}, 最终 {limits[-1]}\n"
+            f"  变化: {timeline}"
+        )
+
+    def _set_limit(self, value: float, now: float) -> None:
+        old = int(self._limit)
+        self._limit = min(max(value, float(self.min_limit)), float(self.max_limit))
+        if int(self._limit) != old:
+            self.history.append((now - self._start_time, int(self._limit)))
@@ -0,0 +1,106 @@
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional
+
+
+def text_sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def file_sha256(file_path: str) -> str:
+    """
+    计算文件内容的 SHA-256（分块读取，不会一次性载入整个文件）。
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class CheckpointJournal:
+    """
+    每次运行的追加式检查点日志（JSONL）。
+
+    每完成一个块就追加一行 {input_hash, index, chunk_hash, translated} 并立即落盘，
+    进程中途崩溃后，重新运行时可从日志中恢复已完成的块，只翻译缺失或失败的块。
+    恢复时会校验输入文件哈希和块内容哈希，分块参数变化导致的块不一致会被自动忽略。
+    """
+
+    def __init__(self, path: str, input_hash: str, resume: bool = True):
+        """
+        Args:
+            path: 日志文件路径
+            input_hash: 输入文件内容的哈希，只有哈希一致的记录才会被恢复
+            resume: 是否保留已有记录；为 False 时清空旧日志重新开始
+        """
+        journal_dir = os.path.dirname(path)
+        if journal_dir:
+            os.makedirs(journal_dir, exist_ok=True)
+
+        self.path = path
+        self.input_hash = input_hash
+        self._records: Dict[int, dict] = self._load() if resume else {}
+        self._file = open(path, 'a' if resume else 'w', encoding='utf-8')
+
+    def _load(self) -> Dict[int, dict]:
+        records = {}
+        if not os.path.exists(self.path):
+            return records
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # 崩溃时可能留下写了一半的最后一行
+                    continue
+                if record.get("input_hash") == self.input_hash:
+                    records[record["index"]] = record
+        return records
+
+    def completed_chunks(self, chunks: List[str]) -> Dict[int, str]:
+        """
+        返回可以直接复用的已完成块 {index: translated}，块内容哈希不一致的记录会被跳过。
+        """
+        completed = {}
+        for index in self._records:
+            if index < len(chunks):
+                translated = self.completed(index, chunks[index])
+                if translated is not None:
+                    completed[index] = translated
+        return completed
+
+    def completed(self, index: int, chunk: str) -> Optional[str]:
+        """
+        第 index 个块（内容为 chunk）已记录的译文；没有记录或块内容已变化时返回 None。
+        流式分块时逐块调用，不需要预先拿到全部块。
+        """
+        record = self._records.get(index)
+        if record is None or record["chunk_hash"] != text_sha256(chunk):
+            return None
+        return record["translated"]
+
+    def record(self, index: int, chunk: str, translated: str) -> None:
+        """
+        记录一个已成功翻译的块，写入后立即 flush 并 fsync。
+        """
+        record = {
+            "input_hash": self.input_hash,
+            "index": index,
+            "chunk_hash": text_sha256(chunk),
+            "translated": translated,
+        }
+        self._records[index] = record
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self, remove: bool = False) -> None:
+        """
+        关闭日志文件；remove=True 时删除日志（所有块都已成功完成时不再需要）。
+        """
+        if not self._file.closed:
+            self._file.close()
+        if remove and os.path.exists(self.path):
+            os.remove(self.path)
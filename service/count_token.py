@@ -1,6 +1,33 @@
+import math
+import os
+import re
 import tiktoken
 from functools import lru_cache
 
+# count_tokens_batch 的文本总长度超过该值（字符数）时，使用 tiktoken 的多线程批量编码
+PARALLEL_MIN_CHARS = 64 * 1024
+
+# estimate_tokens 按字符类别使用的比例（以 cl100k_base 为准的保守经验值，宁可略微高估）：
+# 英文字母与空白约 4 个字符一个 token；LaTeX/Markdown 符号常常单独成 token；
+# 数字最多 3 位合并为一个 token；中日韩字符大多一个字一个 token，少数生僻字占 2 个；
+# 其余非 ASCII 字符（希腊字母、数学符号、带音标字母等）按 UTF-8 字节数估计
+ENGLISH_CHARS_PER_TOKEN = 4.0
+SYMBOL_CHARS_PER_TOKEN = 1.25
+DIGIT_CHARS_PER_TOKEN = 2.0
+CJK_TOKENS_PER_CHAR = 1.2
+OTHER_TOKENS_PER_BYTE = 0.5
+
+# 估计值的误差范围：真实 token 数落在
+# [estimate * (1 - ESTIMATE_MARGIN) - ESTIMATE_SLACK, estimate * (1 + ESTIMATE_MARGIN) + ESTIMATE_SLACK] 内，
+# 只有这个区间跨过预算上限时才需要精确分词（见 estimate_bounds）
+ESTIMATE_MARGIN = 0.25
+ESTIMATE_SLACK = 8
+
+_SYMBOL_CHARS = "\\{}[]()^_$&=+-*/|<>~,.;:!?'\"#%@`"
+_DIGIT_CHARS = "0123456789"
+# 中日韩统一表意文字、假名、谚文与全角标点
+_CJK_PATTERN = re.compile(r'[\u3000-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]')
+
 @lru_cache(maxsize=8)
 def _get_encoding(model="gpt-3.5-turbo"):
     """
@@ -33,24 +60,83 @@ def count_tokens(text, model="gpt-3.5-turbo"):
     # 使用缓存的编码器
     encoding = _get_encoding(model)
     
-    # 编码文本并返回 token 数量
-    tokens = encoding.encode(text)
+    # 编码文本并返回 token 数量；论文中常见的 "<|endoftext|>" 等特殊 token 文本按普通文本计数，
+    # encode() 遇到它们会抛出 ValueError
+    tokens = encoding.encode_ordinary(text)
     return len(tokens)
 
 
-def count_tokens_batch(texts, model="gpt-3.5-turbo"):
+def count_tokens_batch(texts, model="gpt-3.5-turbo", num_threads=None):
     """
     批量计算多个文本的 token 数量（更高效）
     
+    文本总长度超过 PARALLEL_MIN_CHARS 时使用 tiktoken 的 encode_ordinary_batch 多线程编码
+    （编码在 Rust 中执行并释放 GIL），否则逐个编码。特殊 token 文本（如 "<|endoftext|>"）
+    一律按普通文本计数。
+    
     参数:
         texts (list): 文本列表
         model (str): 使用的模型名称
+        num_threads (int): 批量编码的线程数，默认为 CPU 核数（最多 8）
     
     返回:
         list: 每个文本的 token 数量列表
     """
     encoding = _get_encoding(model)
-    return [len(encoding.encode(text)) for text in texts]
+    if len(texts) > 1 and sum(map(len, texts)) >= PARALLEL_MIN_CHARS:
+        threads = num_threads or min(8, os.cpu_count() or 1)
+        if threads > 1:
+            return [len(tokens) for tokens in encoding.encode_ordinary_batch(list(texts), num_threads=threads)]
+    return [len(encoding.encode_ordinary(text)) for text in texts]
+
+
+def estimate_tokens(text):
+    """
+    不分词，按字符类别快速估计文本的 token 数量（比精确分词快一个数量级以上）
+    
+    英文字母、LaTeX/Markdown 符号、数字、中日韩字符与其他非 ASCII 字符分别按各自的比例折算，
+    比例见模块顶部的 *_PER_TOKEN / *_PER_CHAR 常量。估计值只用于远离预算上限的判断，
+    接近上限时应调用 count_tokens 精确计数（见 estimate_bounds）。
+    
+    参数:
+        text (str): 需要估计 token 的文本
+    
+    返回:
+        int: 估计的 token 数量
+    """
+    if not text:
+        return 0
+    symbols = sum(map(text.count, _SYMBOL_CHARS))
+    digits = sum(map(text.count, _DIGIT_CHARS))
+    if text.isascii():
+        ascii_chars = len(text)
+        cjk = other_bytes = 0
+    else:
+        ascii_chars = len(text.encode('ascii', 'ignore'))
+        cjk = len(_CJK_PATTERN.findall(text))
+        # CJK 字符均在基本多文种平面，UTF-8 编码为 3 个字节
+        other_bytes = len(text.encode('utf-8')) - ascii_chars - 3 * cjk
+    letters = ascii_chars - symbols - digits
+    estimate = (
+        letters / ENGLISH_CHARS_PER_TOKEN
+        + symbols / SYMBOL_CHARS_PER_TOKEN
+        + digits / DIGIT_CHARS_PER_TOKEN
+        + cjk * CJK_TOKENS_PER_CHAR
+        + other_bytes * OTHER_TOKENS_PER_BYTE
+    )
+    return int(math.ceil(estimate))
+
+
+def estimate_bounds(estimate):
+    """
+    估计值对应的真实 token 数范围 (下界, 上界)，见 ESTIMATE_MARGIN 与 ESTIMATE_SLACK
+    
+    下界超过预算时可以确定超限，上界不超过预算时可以确定不超限，两者之间才需要精确分词。
+    """
+    return (
+        max(0.0, estimate * (1 - ESTIMATE_MARGIN) - ESTIMATE_SLACK),
+        estimate * (1 + ESTIMATE_MARGIN) + ESTIMATE_SLACK,
+    )
 
 
 # # 测试示例
@@ -0,0 +1,189 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from functools import partial
+from typing import Callable, Optional, Tuple
+
+
+class HedgePolicy:
+    """
+    对冲请求（hedged requests）策略，用于削减慢块造成的尾部延迟。
+
+    每个请求在独立的线程中发出；如果它的耗时超过了近期成功请求延迟的 percentile 分位数，
+    就再发出一个相同的请求，两者谁先成功就用谁的结果。另一个请求还在排队时直接取消，
+    已发出的则无法中途取消：它成功完成后按实际用量、失败时按估计用量计入 extra_tokens，
+    并通过 on_loser 回调交给调用方向限流器结算。对冲请求数不超过已发出请求数的 max_ratio，
+    避免服务整体变慢时对冲请求成倍放大负载。
+    """
+
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        max_ratio: float = 0.1,
+        min_samples: int = 10,
+        min_delay: float = 1.0,
+        window: int = 200,
+        max_workers: int = 32
+    ):
+        """
+        Args:
+            percentile: 请求耗时超过近期延迟的该分位数（0~100）时发出对冲请求
+            max_ratio: 对冲请求数占已发出请求数的上限
+            min_samples: 至少观测到这么多个成功请求的延迟后才开始对冲
+            min_delay: 对冲等待时间的下限（秒），避免延迟普遍很短时频繁对冲
+            window: 计算分位数时使用的最近延迟样本数
+            max_workers: 发出请求的线程池大小，应不小于在途请求数的两倍
+        """
+        if not 0 < percentile < 100:
+            raise ValueError("percentile 必须在 0~100 之间")
+        self.percentile = percentile
+        self.max_ratio = max_ratio
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.max_workers = max_workers
+
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.requests = 0
+        self.hedges = 0
+        self.wins = 0
+        self.extra_tokens = 0
+
+    def observe(self, latency: float) -> None:
+        """
+        记录一个成功请求的延迟。
+        """
+        with self._lock:
+            self._latencies.append(latency)
+
+    def delay(self) -> Optional[float]:
+        """
+        当前的对冲等待时间：近期延迟的 percentile 分位数（不低于 min_delay）；样本不足时返回 None。
+        """
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        rank = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))
+        return max(self.min_delay, ordered[rank])
+
+    def _try_hedge(self) -> bool:
+        with self._lock:
+            if self.hedges + 1 > self.max_ratio * self.requests:
+                return False
+            self.hedges += 1
+            return True
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="hedge")
+            return self._executor
+
+    def _charge_loser(self, estimated_tokens: int, on_loser: Optional[Callable[[object], None]],
+                      future: Future) -> None:
+        """
+        落败请求结束后，把它消耗的 token 计入 extra_tokens：成功时按响应的 usage（没有 usage 时按估计值），
+        失败时请求可能已在服务端消耗了 token，按估计值计入；在排队中被取消的请求没有发出，不计入。
+        成功的落败请求还会交给 on_loser，由调用方按实际用量结算限流预算。
+        """
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            tokens = estimated_tokens
+        else:
+            response = future.result()
+            usage = getattr(response, "usage", None)
+            tokens = getattr(usage, "total_tokens", None) if usage is not None else None
+            if tokens is None:
+                tokens = estimated_tokens
+            if on_loser is not None:
+                on_loser(response)
+        with self._lock:
+            self.extra_tokens += tokens
+
+    def call(
+        self,
+        func: Callable,
+        *args,
+        before_hedge: Optional[Callable[[], None]] = None,
+        on_loser: Optional[Callable[[object], None]] = None,
+        estimated_tokens: int = 0
+    ) -> Tuple[object, bool, bool]:
+        """
+        以对冲方式调用 func(*args)，返回 (结果, 是否发出了对冲请求, 结果是否来自对冲请求)。
+
+        两个请求都失败时抛出原请求的异常。
+
+        Args:
+            func: 发出请求的函数，如 translate_text
+            before_hedge: 对冲请求发出前在其线程中调用（可选），如向限流器申请预算
+            on_loser: 落败请求成功完成后在其线程中以它的响应调用（可选），如按实际用量向限流器结算
+            estimated_tokens: 单个请求的估计 token 数，落败请求失败或响应没有 usage 时按它计入 extra_tokens
+        """
+        with self._lock:
+            self.requests += 1
+        pool = self._pool()
+        start = time.monotonic()
+        primary = pool.submit(func, *args)
+        delay = self.delay()
+        if delay is not None:
+            done, _ = wait([primary], timeout=delay)
+            if not done and self._try_hedge():
+                charge_loser = partial(self._charge_loser, estimated_tokens, on_loser)
+                return self._race(primary, func, args, before_hedge, charge_loser, start)
+        result = primary.result()
+        self.observe(time.monotonic() - start)
+        return result, False, False
+
+    def _race(self, primary: Future, func: Callable, args: tuple, before_hedge: Optional[Callable[[], None]],
+              charge_loser: Callable[[Future], None], start: float) -> Tuple[object, bool, bool]:
+        """
+        发出对冲请求，返回先成功的那个请求的结果。
+        """
+
+        def hedged_request():
+            if before_hedge is not None:
+                before_hedge()
+            return func(*args)
+
+        hedge = self._pool().submit(hedged_request)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    continue
+                for loser in (done | pending) - {future}:
+                    # 还在线程池中排队的请求直接取消；已发出的请求结束后再计费
+                    loser.cancel()
+                    loser.add_done_callback(charge_loser)
+                won = future is hedge
+                if won:
+                    with self._lock:
+                        self.wins += 1
+                self.observe(time.monotonic() - start)
+                return future.result(), True, won
+        # 两个请求都失败
+        return primary.result(), True, False
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                "percentile": self.percentile,
+                "requests": self.requests,
+                "hedges": self.hedges,
+                "wins": self.wins,
+                "extra_tokens": self.extra_tokens,
+            }
+
+    def close(self) -> None:
+        """
+        关闭请求线程池，不等待仍在进行的落败请求。
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
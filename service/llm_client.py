@@ -0,0 +1,165 @@
+import asyncio
+import os
+import threading
+import weakref
+from typing import Optional
+
+import httpx
+from dotenv import load_dotenv
+from openai import OpenAI, AsyncOpenAI, DefaultHttpxClient, DefaultAsyncHttpxClient
+
+load_dotenv()
+
+# 默认连接池大小与超时（秒），可通过环境变量覆盖
+DEFAULT_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+DEFAULT_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "300"))
+DEFAULT_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "10"))
+# 空闲 keep-alive 连接保留时间（秒）
+KEEPALIVE_EXPIRY = 60.0
+
+_lock = threading.Lock()
+_config = {
+    "max_connections": DEFAULT_MAX_CONNECTIONS,
+    "timeout": DEFAULT_TIMEOUT,
+    "connect_timeout": DEFAULT_CONNECT_TIMEOUT,
+}
+_client: Optional[OpenAI] = None
+# 异步客户端的连接绑定在创建它的事件循环上，每个事件循环各自持有一个
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = weakref.WeakKeyDictionary()
+
+
+def _limits(max_connections: Optional[int] = None) -> httpx.Limits:
+    max_connections = max_connections or _config["max_connections"]
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_connections,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(_config["timeout"], connect=_config["connect_timeout"])
+
+
+def configure_client(
+    max_connections: Optional[int] = None,
+    timeout: Optional[float] = None,
+    connect_timeout: Optional[float] = None
+) -> None:
+    """
+    修改连接池大小与超时设置，下一次 get_client/get_async_client 时按新配置重建客户端。
+
+    旧客户端不会被主动关闭，仍在使用它的请求可以正常完成。
+
+    Args:
+        max_connections: 连接池最大连接数（同时也是 keep-alive 连接数上限）
+        timeout: 单次请求的总超时（秒）
+        connect_timeout: 建立连接的超时（秒）
+    """
+    global _client
+    with _lock:
+        if max_connections is not None:
+            _config["max_connections"] = max_connections
+        if timeout is not None:
+            _config["timeout"] = timeout
+        if connect_timeout is not None:
+            _config["connect_timeout"] = connect_timeout
+        _client = None
+        _async_clients.clear()
+
+
+def ensure_pool_size(max_connections: int) -> None:
+    """
+    保证连接池至少能容纳 max_connections 个并发连接，不足时才重建客户端。
+    translate_chunks_concurrent 启动时按 worker 数调用。
+    """
+    with _lock:
+        if max_connections <= _config["max_connections"]:
+            return
+    configure_client(max_connections=max_connections)
+
+
+def new_client(api_key: Optional[str], base_url: Optional[str], max_connections: Optional[int] = None) -> OpenAI:
+    """
+    创建一个带独立 keep-alive 连接池的 OpenAI 客户端（多提供商路由时每个提供商各持有一个）。
+
+    Args:
+        api_key: API key
+        base_url: OpenAI 兼容接口地址
+        max_connections: 连接池大小，默认使用共享客户端的配置
+
+    SDK 自带的重试（默认 2 次）被关闭：429/5xx 必须交给调用方的重试循环，
+    否则自适应并发控制器收不到限流信号，运行指标也会少算尝试次数。
+    """
+    return OpenAI(
+        api_key=api_key,
+        base_url=base_url,
+        timeout=_timeout(),
+        max_retries=0,
+        http_client=DefaultHttpxClient(limits=_limits(max_connections), timeout=_timeout()),
+    )
+
+
+def new_async_client(api_key: Optional[str], base_url: Optional[str], max_connections: Optional[int] = None) -> AsyncOpenAI:
+    """
+    new_client 的异步版本，返回的客户端只能在创建它的事件循环中使用。
+    """
+    return AsyncOpenAI(
+        api_key=api_key,
+        base_url=base_url,
+        timeout=_timeout(),
+        max_retries=0,
+        http_client=DefaultAsyncHttpxClient(limits=_limits(max_connections), timeout=_timeout()),
+    )
+
+
+def get_client() -> OpenAI:
+    """
+    获取进程内共享的 OpenAI 客户端（线程安全）。
+
+    客户端及其 keep-alive 连接池在所有工作线程间复用，
+    避免每个块都重新创建 httpx 客户端、重新进行 TLS 握手。
+    """
+    global _client
+    client = _client
+    if client is not None:
+        return client
+    with _lock:
+        if _client is None:
+            _client = new_client(os.getenv("DEEPSEEK_API_KEY"), os.getenv("DEEPSEEK_API_URL"))
+        return _client
+
+
+def get_async_client() -> AsyncOpenAI:
+    """
+    获取当前事件循环共享的 AsyncOpenAI 客户端，必须在协程中调用。
+    """
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            client = new_async_client(os.getenv("DEEPSEEK_API_KEY"), os.getenv("DEEPSEEK_API_URL"))
+            _async_clients[loop] = client
+        return client
+
+
+def close_client() -> None:
+    """
+    关闭共享的同步客户端并释放连接池（进程退出前可选调用）。
+    """
+    global _client
+    with _lock:
+        client, _client = _client, None
+    if client is not None:
+        client.close()
+
+
+async def close_async_client() -> None:
+    """
+    关闭当前事件循环的 AsyncOpenAI 客户端，应在事件循环结束前调用。
+    """
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _async_clients.pop(loop, None)
+    if client is not None:
+        await client.close()
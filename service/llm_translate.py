@@ -1,55 +1,38 @@
-from openai import OpenAI
-from dotenv import load_dotenv
-import os
-load_dotenv()
-def translate_text(text):
-    client = OpenAI(
-        api_key=os.getenv("DEEPSEEK_API_KEY"),
-        base_url=os.getenv("DEEPSEEK_API_URL"),
-    )
+from service.llm_client import get_client, get_async_client
+from service.prompt_template import PromptTemplate, TRANSLATE_TEMPLATE
+
+MODEL_NAME = "deepseek-chat"
+
+# 系统提示词（已规范化空白），与 MODEL_NAME 一起参与翻译缓存的键
+SYSTEM_PROMPT = TRANSLATE_TEMPLATE.system
+
+
+def _build_messages(text, template: PromptTemplate = TRANSLATE_TEMPLATE):
+    return template.build_messages(text)
+
+
+def translate_text(text, provider=None):
+    """
+    调用 LLM 翻译文本。provider 为 service.providers.Provider 时使用该提供商的客户端与模型，
+    否则使用 .env 中 DEEPSEEK_API_URL 对应的共享客户端与 MODEL_NAME。
+    """
+    client = provider.client() if provider is not None else get_client()
     response = client.chat.completions.create(
-        model="deepseek-chat",
-        messages=[
-            {
-                "role": "system",
-                "content": """
-                    **角色：** 你是一位顶尖的学术翻译专家，精通计算机和人工智能领域，并对中英双语的学术语境和写作规范有深刻的理解。
-                    **任务：** 请将我提供的英文学术论文，精准、专业且流畅地翻译成符合中文学术规范的译文，并以Markdown格式呈现。
-                    **核心翻译原则：**
-                    1.  **绝对忠实原文 (Accuracy First):**
-                        *   **信息完整性**: 绝对禁止遗漏任何信息，包括但不限于：事实、数据、图表标题、脚注、作者观点及论证逻辑。确保原文的每一个细节都在译文中得到体现。
-                        *   **术语精准性**: 必须使用目标学科领域公认的专业术语。对于尚无通用译法或可能产生歧义的术语，无需翻译。
-                    2.  **专业学术风格 (Academic Tone):**
-                        *   **语体规范**: 译文必须采用正式、严谨、客观的中文书面语风格，完全杜绝口语化、网络用语或任何非正式表达。
-                        *   **逻辑严密**: 精确传达原文的逻辑关系（如因果、并列、转折），确保译文的论证结构与原文保持高度一致。
-                    3.  **流畅与可读性 (Readability & Fluency):**
-                        *   **符合中文表达**: 在确保“忠实原文”的前提下，译文必须符合现代中文的语法和表达习惯。请避免生硬的“翻译腔”和过度复杂的欧化长句，可适当采用拆分、重组等翻译技巧，使句子通顺、自然。
-                    **格式与结构要求 (Markdown):**
-                    *   **结构对齐**: 严格按照原文的篇章结构进行翻译，包括章节标题、子标题、段落、列表（有序/无序）等，保持一一对应。
-                    *   **标题层级**:
-                        *   一级标题 (如 "1. Introduction") 译为中文后使用 `##` (H2) 格式。
-                        *   二级标题 (如 "1.1. Background") 译为中文后使用 `###` (H3) 格式，以此类推。
-                        *   段落内的小标题（若有）翻译后直接**加粗**即可。
-                    *   **不翻译内容 (Preserve Original):**
-                        *   **数学公式**: **所有数学公式必须以LaTeX格式保留原文，并强制使用 `$` 作为起始和结束的定界符。** 公式内容无需翻译，但需确保其编号与上下文引用保持一致。例如，原文中的 `$E=mc^2$` 应原样保留。
-                        *   **代码块/伪代码**: 保留所有代码内容及变量名，不作任何翻译。
-                        *   **参考文献 (References/Bibliography)**: 该部分的所有条目（包括作者、论文标题、期刊、年份等）均保持英文原文，仅需翻译“参考文献”这一节标题。
-                    *   **专有名词处理:**
-                        *   **人名/地名/机构名**: 优先采用学界或权威媒体（如新华社）的通用标准译名。若无通用译名，首次出现时应采用“音译 (英文原文)”的形式，后续可直接使用音译。
-                        *   **图表标题**: "Figure 1" 、“Table 1”等不翻译。标题内容需完整翻译。
-                    **输出指令：**
-                    *   请直接开始输出完整的中文译文，不要包含任何前言、摘要或对任务本身的解释。
-                    *   最终交付的内容应是一篇格式规整、内容完整的Markdown格式学术译文。
-                """
-            },
-            {
-                "role": "user",
-                "content": f"""
-                待翻译的英文论文内容：
-                {text}
-                """
-            },
-        ],
+        model=provider.model if provider is not None else MODEL_NAME,
+        messages=_build_messages(text),
+        stream=False,
+    )
+    return response
+
+
+async def translate_text_async(text):
+    """
+    translate_text 的异步版本，基于 AsyncOpenAI，供 asyncio 并发引擎使用。
+    """
+    client = get_async_client()
+    response = await client.chat.completions.create(
+        model=MODEL_NAME,
+        messages=_build_messages(text),
         stream=False,
     )
     return response
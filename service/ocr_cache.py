@@ -0,0 +1,194 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import List, Optional
+
+INDEX_FILENAME = ".ocr_cache.json"
+
+# 每个缓存的 Markdown 旁边的归属记录（<名称>.md.ocr.json），保存产生该结果的缓存键
+SIDECAR_SUFFIX = ".ocr.json"
+
+# 同一进程内可能有多个 OcrCache 实例指向同一个索引文件（如批量 OCR 的多个线程），
+# 每次读写前都在这把锁下重新加载索引，避免互相覆盖
+_index_lock = threading.Lock()
+
+
+class OcrCache:
+    """
+    OCR 结果缓存：把 (PDF 内容哈希, OCR 参数) 映射到输出目录中已解压的 Markdown。
+
+    索引以 JSON 文件保存在输出目录中（output_dir/.ocr_cache.json），Markdown 路径相对输出目录记录，
+    整个输出目录搬走后缓存依然有效。同一 PDF 换了文件名也能命中，修改 lang、backend 等参数则不会命中。
+
+    结果目录按文件名命名（output/<文件名>/<文件名>.md），同名的另一个 PDF 或不同参数的 OCR 会覆盖它，
+    因此每个 Markdown 旁边写一个归属记录（<文件名>.md.ocr.json）保存产生它的缓存键，命中时核对，
+    已被其他 OCR 覆盖的条目视为未命中。超过条目数或总字节数上限时按最近使用时间淘汰最旧的条目，
+    只删除该次 OCR 创建的文件（译文等其他文件保留），结果已归属其他缓存键时只删除索引条目。
+    每次读写都在模块级锁下重新加载索引，可在批量 OCR 的多个线程间使用。
+    """
+
+    def __init__(
+        self,
+        output_dir: str,
+        max_entries: Optional[int] = 200,
+        max_bytes: Optional[int] = 5 * 1024 * 1024 * 1024
+    ):
+        """
+        Args:
+            output_dir: OCR 结果的输出根目录，索引文件保存在该目录下
+            max_entries: 最多保留的 OCR 结果数，None 表示不限制
+            max_bytes: 结果目录总字节数上限，None 表示不限制
+        """
+        self.output_dir = output_dir
+        self.index_path = os.path.join(output_dir, INDEX_FILENAME)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = self._load()
+
+    @staticmethod
+    def make_key(pdf_hash: str, params: dict) -> str:
+        """
+        计算缓存键：PDF 内容哈希加上按键排序的 OCR 参数。
+        """
+        payload = json.dumps({"pdf": pdf_hash, "params": params}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _load(self) -> dict:
+        if not os.path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"OCR 缓存索引损坏，将重新建立: {e}")
+            return {}
+
+    def _save(self) -> None:
+        os.makedirs(self.output_dir, exist_ok=True)
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._entries, f, ensure_ascii=False, indent=2)
+        # 先写临时文件再替换，进程中断时不会留下写了一半的索引
+        os.replace(tmp_path, self.index_path)
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        查找缓存的 Markdown 路径；结果文件已被手动删除、或已被其他 OCR 覆盖时视为未命中并清理该条目。
+        """
+        with _index_lock:
+            self._entries = self._load()
+            entry = self._entries.get(key)
+            md_path = os.path.join(self.output_dir, entry["markdown"]) if entry else None
+            if md_path is None or not os.path.isfile(md_path) or not self._owns(key, md_path):
+                if entry:
+                    del self._entries[key]
+                    self._save()
+                self.misses += 1
+                return None
+            entry["accessed_at"] = time.time()
+            self._save()
+            self.hits += 1
+            return md_path
+
+    def put(self, key: str, md_path: str, source: str = "", files: Optional[List[str]] = None) -> None:
+        """
+        记录一次 OCR 结果，写入归属记录，然后按上限淘汰旧结果。
+
+        Args:
+            key: make_key 计算的缓存键
+            md_path: 解压出的 Markdown 路径（须位于输出目录内）
+            source: 原始 PDF 路径，仅用于人工查看索引
+            files: 本次 OCR 创建的全部文件（Markdown、图片等），淘汰时只删除这些文件；默认只有 md_path
+        """
+        files = [os.path.relpath(path, self.output_dir) for path in (files or [md_path])]
+        now = time.time()
+        with _index_lock:
+            self._entries = self._load()
+            with open(md_path + SIDECAR_SUFFIX, 'w', encoding='utf-8') as f:
+                json.dump({"key": key, "source": source}, f, ensure_ascii=False)
+            self._entries[key] = {
+                "markdown": os.path.relpath(md_path, self.output_dir),
+                "files": files,
+                "source": source,
+                "size": sum(_file_size(os.path.join(self.output_dir, path)) for path in files),
+                "created_at": now,
+                "accessed_at": now,
+            }
+            self._evict(keep=key)
+            self._save()
+
+    def evict(self) -> None:
+        """
+        按条目数和总字节数上限淘汰最久未使用的结果。
+        """
+        with _index_lock:
+            self._entries = self._load()
+            self._evict()
+            self._save()
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        by_age = sorted(self._entries, key=lambda k: self._entries[k]["accessed_at"])
+        total_bytes = sum(entry["size"] for entry in self._entries.values())
+        for key in by_age:
+            over_count = self.max_entries is not None and len(self._entries) > self.max_entries
+            over_bytes = self.max_bytes is not None and total_bytes > self.max_bytes
+            if not (over_count or over_bytes):
+                break
+            if key == keep:
+                continue
+            entry = self._entries.pop(key)
+            total_bytes -= entry["size"]
+            md_path = os.path.join(self.output_dir, entry["markdown"])
+            if self._owns(key, md_path):
+                self._remove_files(entry.get("files", [entry["markdown"]]) + [entry["markdown"] + SIDECAR_SUFFIX])
+            print(f"OCR 缓存淘汰: {entry['markdown']}")
+
+    @staticmethod
+    def _owns(key: str, md_path: str) -> bool:
+        """
+        Markdown 旁的归属记录是否属于 key（没有记录或已被其他 OCR 覆盖时返回 False）。
+        """
+        try:
+            with open(md_path + SIDECAR_SUFFIX, 'r', encoding='utf-8') as f:
+                return json.load(f).get("key") == key
+        except (OSError, ValueError, AttributeError):
+            return False
+
+    def _remove_files(self, rel_paths: List[str]) -> None:
+        """
+        删除输出目录内的这些文件，再自下而上删除因此变空的目录；不会删除输出目录之外的路径或非空目录。
+        """
+        root = os.path.realpath(self.output_dir)
+        dirs = set()
+        for rel_path in rel_paths:
+            path = os.path.realpath(os.path.join(self.output_dir, rel_path))
+            if not path.startswith(root + os.sep):
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            dirs.add(os.path.dirname(path))
+        for directory in sorted(dirs, key=len, reverse=True):
+            while directory.startswith(root + os.sep):
+                try:
+                    os.rmdir(directory)
+                except OSError:
+                    break
+                directory = os.path.dirname(directory)
+
+    def __len__(self) -> int:
+        with _index_lock:
+            self._entries = self._load()
+            return len(self._entries)
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
@@ -0,0 +1,83 @@
+import os
+from typing import Dict, List, Optional
+
+
+class OrderedChunkWriter:
+    """
+    按原始顺序把翻译块流式追加到输出文件的重排缓冲写入器。
+
+    块可以以任意顺序完成并调用 add()；只有当某个索引之前的所有块都已写出时，
+    该块才会被追加到文件并立即 flush，因此运行过程中输出文件始终是完整的前缀，
+    内存中只保留乱序到达、尚不能写出的块。
+    """
+
+    def __init__(self, output_path: str, separator: str = "\n\n"):
+        """
+        Args:
+            output_path: 输出文件路径，所在目录不存在时自动创建
+            separator: 相邻块之间的分隔符（与 save_translated_markdown 的拼接方式一致）
+        """
+        output_dir = os.path.dirname(output_path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
+        self.output_path = output_path
+        self.separator = separator
+        self.next_index = 0
+        self.max_pending = 0
+        self._pending: Dict[int, str] = {}
+        self._written = False
+        self._file = open(output_path, 'w', encoding='utf-8')
+
+    @property
+    def pending(self) -> int:
+        """已完成但还在等待前面块的数量"""
+        return len(self._pending)
+
+    def add(self, index: int, text: str) -> None:
+        """
+        提交第 index 个块，能连续写出的部分会立即写入磁盘。
+        """
+        if index < self.next_index or index in self._pending:
+            raise ValueError(f"块 {index} 已经写入过")
+        self._pending[index] = text
+        self.max_pending = max(self.max_pending, len(self._pending))
+
+        wrote = False
+        while self.next_index in self._pending:
+            self._write(self._pending.pop(self.next_index))
+            self.next_index += 1
+            wrote = True
+        if wrote:
+            self._file.flush()
+
+    def close(self, errors: Optional[List[str]] = None) -> None:
+        """
+        写出剩余的块（即使中间有缺失）并在末尾附加错误日志，然后关闭文件。
+        """
+        if self._file.closed:
+            return
+        for index in sorted(self._pending):
+            if index > self.next_index:
+                self._write(f"<!-- 缺少块 {self.next_index}~{index - 1} -->")
+            self._write(self._pending.pop(index))
+            self.next_index = index + 1
+
+        if errors:
+            self._file.write("\n\n---\n\n")
+            self._file.write("## 翻译错误日志\n\n")
+            for error in errors:
+                self._file.write(f"- {error}\n")
+        self._file.close()
+
+    def _write(self, text: str) -> None:
+        if self._written:
+            self._file.write(self.separator)
+        self._file.write(text)
+        self._written = True
+
+    def __enter__(self) -> "OrderedChunkWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
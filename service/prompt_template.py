@@ -0,0 +1,128 @@
+import textwrap
+from functools import cached_property
+from typing import Dict, List
+
+from service.count_token import count_tokens
+
+# chat 格式中每条消息的角色与分隔符，以及回复引导大约占用的 token 数
+MESSAGE_OVERHEAD_TOKENS = 4
+REPLY_OVERHEAD_TOKENS = 3
+
+TEXT_PLACEHOLDER = "{text}"
+
+
+def normalize_prompt(text: str) -> str:
+    """
+    规范化提示词中的空白：去掉源码缩进带来的公共前导空白、每行末尾的空白与首尾空行，
+    保留 Markdown 列表的相对缩进。
+    """
+    lines = [line.rstrip() for line in textwrap.dedent(text).splitlines()]
+    return "\n".join(lines).strip("\n")
+
+
+class PromptTemplate:
+    """
+    一组翻译提示词：固定的系统消息 + 带 {text} 占位符的用户消息。
+
+    系统消息与用户消息中原文之前的部分在所有请求中逐字节相同，构成请求的公共前缀，
+    服务端的上下文缓存（如 DeepSeek 的硬盘缓存、OpenAI 的 prompt caching）可以命中这部分；
+    原文只出现在用户消息末尾，且不做任何改动。
+    """
+
+    def __init__(self, name: str, system: str, user: str):
+        """
+        Args:
+            name: 模板名称
+            system: 系统消息，构造时规范化空白
+            user: 用户消息，必须恰好包含一个 {text} 占位符，构造时规范化空白
+        """
+        user = normalize_prompt(user)
+        if user.count(TEXT_PLACEHOLDER) != 1:
+            raise ValueError(f"用户消息模板必须恰好包含一个 {TEXT_PLACEHOLDER} 占位符: {name}")
+        self.name = name
+        self.system = normalize_prompt(system)
+        self.user_prefix, self.user_suffix = user.split(TEXT_PLACEHOLDER)
+
+    def build_messages(self, text: str) -> List[Dict[str, str]]:
+        """
+        构造一次请求的 messages，text 原样放入用户消息。
+        """
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": self.user_prefix + text + self.user_suffix},
+        ]
+
+    @cached_property
+    def overhead_tokens(self) -> int:
+        """
+        除原文以外每次请求固定消耗的输入 token 数（系统消息、用户消息模板与 chat 格式开销）。
+        """
+        return (
+            count_tokens(self.system)
+            + count_tokens(self.user_prefix + self.user_suffix)
+            + 2 * MESSAGE_OVERHEAD_TOKENS
+            + REPLY_OVERHEAD_TOKENS
+        )
+
+    def chunk_budget(self, max_input_tokens: int) -> int:
+        """
+        单次请求的输入 token 上限为 max_input_tokens 时，留给原文的 token 数。
+        """
+        budget = max_input_tokens - self.overhead_tokens
+        if budget <= 0:
+            raise ValueError(
+                f"max_tokens ({max_input_tokens}) 不足以容纳提示词模板 {self.name} 的开销 ({self.overhead_tokens} tokens)"
+            )
+        return budget
+
+
+TRANSLATE_TEMPLATE = PromptTemplate(
+    name="translate",
+    system="""
+        **角色：** 你是一位顶尖的学术翻译专家，精通计算机和人工智能领域，并对中英双语的学术语境和写作规范有深刻的理解。
+        **任务：** 请将我提供的英文学术论文，精准、专业且流畅地翻译成符合中文学术规范的译文，并以Markdown格式呈现。
+        **核心翻译原则：**
+        1.  **绝对忠实原文 (Accuracy First):**
+            *   **信息完整性**: 绝对禁止遗漏任何信息，包括但不限于：事实、数据、图表标题、脚注、作者观点及论证逻辑。确保原文的每一个细节都在译文中得到体现。
+            *   **术语精准性**: 必须使用目标学科领域公认的专业术语。对于尚无通用译法或可能产生歧义的术语，无需翻译。
+        2.  **专业学术风格 (Academic Tone):**
+            *   **语体规范**: 译文必须采用正式、严谨、客观的中文书面语风格，完全杜绝口语化、网络用语或任何非正式表达。
+            *   **逻辑严密**: 精确传达原文的逻辑关系（如因果、并列、转折），确保译文的论证结构与原文保持高度一致。
+        3.  **流畅与可读性 (Readability & Fluency):**
+            *   **符合中文表达**: 在确保“忠实原文”的前提下，译文必须符合现代中文的语法和表达习惯。请避免生硬的“翻译腔”和过度复杂的欧化长句，可适当采用拆分、重组等翻译技巧，使句子通顺、自然。
+        **格式与结构要求 (Markdown):**
+        *   **结构对齐**: 严格按照原文的篇章结构进行翻译，包括章节标题、子标题、段落、列表（有序/无序）等，保持一一对应。
+        *   **标题层级**:
+            *   一级标题 (如 "1. Introduction") 译为中文后使用 `##` (H2) 格式。
+            *   二级标题 (如 "1.1. Background") 译为中文后使用 `###` (H3) 格式，以此类推。
+            *   段落内的小标题（若有）翻译后直接**加粗**即可。
+        *   **不翻译内容 (Preserve Original):**
+            *   **数学公式**: **所有数学公式必须以LaTeX格式保留原文，并强制使用 `$` 作为起始和结束的定界符。** 公式内容无需翻译，但需确保其编号与上下文引用保持一致。例如，原文中的 `$E=mc^2$` 应原样保留。
+            *   **代码块/伪代码**: 保留所有代码内容及变量名，不作任何翻译。
+            *   **占位符**: 形如 `[[M0]]`、`[[C1]]`、`[[I2]]`、`[[T3]]` 的占位符代表已移出的公式、代码、图片或表格，必须原样保留在原来的位置，不得修改、删除或重复。
+            *   **参考文献 (References/Bibliography)**: 该部分的所有条目（包括作者、论文标题、期刊、年份等）均保持英文原文，仅需翻译“参考文献”这一节标题。
+        *   **专有名词处理:**
+            *   **人名/地名/机构名**: 优先采用学界或权威媒体（如新华社）的通用标准译名。若无通用译名，首次出现时应采用“音译 (英文原文)”的形式，后续可直接使用音译。
+            *   **图表标题**: "Figure 1" 、“Table 1”等不翻译。标题内容需完整翻译。
+        **输出指令：**
+        *   请直接开始输出完整的中文译文，不要包含任何前言、摘要或对任务本身的解释。
+        *   最终交付的内容应是一篇格式规整、内容完整的Markdown格式学术译文。
+    """,
+    user="""
+        待翻译的英文论文内容：
+        {text}
+    """,
+)
+
+# 按名称查找的模板表
+TEMPLATES: Dict[str, PromptTemplate] = {TRANSLATE_TEMPLATE.name: TRANSLATE_TEMPLATE}
+
+
+def get_template(name: str = "translate") -> PromptTemplate:
+    """
+    按名称获取提示词模板。
+    """
+    try:
+        return TEMPLATES[name]
+    except KeyError:
+        raise ValueError(f"未知的提示词模板: {name}") from None
@@ -0,0 +1,293 @@
+import json
+import os
+import threading
+import time
+from typing import Callable, Collection, Dict, List, Optional
+
+from openai import OpenAI
+
+from service.llm_client import new_client
+from service.llm_translate import MODEL_NAME, SYSTEM_PROMPT
+from service.rate_limiter import RateLimiter, estimate_request_tokens
+
+# 每个提供商默认的最大在途请求数
+DEFAULT_MAX_CONCURRENCY = 8
+
+# 延迟与错误率的指数滑动平均系数，越大越偏重最近的请求
+EWMA_ALPHA = 0.2
+
+# 连续失败该次数后熔断，熔断期间不再向该提供商派发请求
+FAILURE_THRESHOLD = 3
+
+# 熔断时长（秒）：首次 COOLDOWN_INITIAL，恢复后再次熔断时翻倍，不超过 COOLDOWN_MAX
+COOLDOWN_INITIAL = 10.0
+COOLDOWN_MAX = 300.0
+
+
+class Provider:
+    """
+    一个 OpenAI 兼容的翻译接口：地址、密钥、模型、并发上限与可选的 RPM/TPM 限额，
+    以及路由器维护的实时统计（延迟、错误率、在途请求数、熔断状态）。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        base_url: Optional[str],
+        api_key: Optional[str],
+        model: str = MODEL_NAME,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        weight: float = 1.0,
+        rpm: Optional[int] = None,
+        tpm: Optional[int] = None
+    ):
+        """
+        Args:
+            name: 提供商名称，用于日志与统计
+            base_url: OpenAI 兼容接口地址
+            api_key: API key
+            model: 请求使用的模型名
+            max_concurrency: 最大在途请求数，也是该提供商连接池的大小
+            weight: 静态权重，与实时吞吐估计相乘，可用于偏向更便宜或质量更好的提供商
+            rpm: 每分钟最大请求数（可选）
+            tpm: 每分钟最大 token 数（可选）
+        """
+        if max_concurrency < 1:
+            raise ValueError(f"提供商 {name} 的 max_concurrency 必须大于 0")
+        self.name = name
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.weight = weight
+        self.rate_limiter = RateLimiter(rpm=rpm, tpm=tpm) if rpm or tpm else None
+        self._client: Optional[OpenAI] = None
+        self._client_lock = threading.Lock()
+
+        # 以下统计由 ProviderRouter 在其锁内更新
+        self.in_flight = 0
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.failures = 0
+        self.cooldown = COOLDOWN_INITIAL
+        self.down_until = 0.0
+
+    def client(self) -> OpenAI:
+        """
+        该提供商独立的 OpenAI 客户端（带 keep-alive 连接池），首次使用时创建。
+        """
+        with self._client_lock:
+            if self._client is None:
+                self._client = new_client(self.api_key, self.base_url, max_connections=self.max_concurrency * 2)
+            return self._client
+
+    def close(self) -> None:
+        with self._client_lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
+
+    def summary(self) -> dict:
+        return {
+            "model": self.model,
+            "requests": self.requests,
+            "errors": self.errors,
+            "latency_ewma": round(self.latency, 3) if self.latency is not None else None,
+            "error_rate": round(self.error_rate, 3),
+            "down": self.down_until > time.monotonic(),
+        }
+
+
+def _int_env(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+def load_providers_from_env() -> List[Provider]:
+    """
+    从环境变量读取提供商列表。
+
+    LLM_PROVIDERS 为逗号分隔的名称（如 "deepseek,siliconflow"），每个名称 NAME 读取
+    {NAME}_API_URL、{NAME}_API_KEY、{NAME}_MODEL、{NAME}_MAX_CONCURRENCY、{NAME}_WEIGHT、
+    {NAME}_RPM 与 {NAME}_TPM（名称转为大写）。未设置 LLM_PROVIDERS 时只有 DEEPSEEK 一个提供商。
+    """
+    names = [name.strip() for name in os.getenv("LLM_PROVIDERS", "deepseek").split(",") if name.strip()]
+    providers = []
+    for name in names:
+        prefix = name.upper()
+        providers.append(Provider(
+            name=name,
+            base_url=os.getenv(f"{prefix}_API_URL"),
+            api_key=os.getenv(f"{prefix}_API_KEY"),
+            model=os.getenv(f"{prefix}_MODEL") or MODEL_NAME,
+            max_concurrency=_int_env(f"{prefix}_MAX_CONCURRENCY") or DEFAULT_MAX_CONCURRENCY,
+            weight=float(os.getenv(f"{prefix}_WEIGHT") or 1.0),
+            rpm=_int_env(f"{prefix}_RPM"),
+            tpm=_int_env(f"{prefix}_TPM"),
+        ))
+    return providers
+
+
+def load_providers_from_file(path: str) -> List[Provider]:
+    """
+    从 JSON 文件读取提供商列表，格式为对象数组：
+
+        [{"name": "deepseek", "base_url": "https://api.deepseek.com/v1", "api_key_env": "DEEPSEEK_API_KEY",
+          "model": "deepseek-chat", "max_concurrency": 16, "rpm": 600}, ...]
+
+    密钥可以直接写在 api_key 中，也可以用 api_key_env 指定从哪个环境变量读取（避免把密钥写入文件）。
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        entries = json.load(f)
+    if not isinstance(entries, list) or not entries:
+        raise ValueError(f"提供商配置文件必须是非空的 JSON 数组: {path}")
+    providers = []
+    for entry in entries:
+        entry = dict(entry)
+        api_key_env = entry.pop("api_key_env", None)
+        if api_key_env and not entry.get("api_key"):
+            entry["api_key"] = os.getenv(api_key_env)
+        entry.setdefault("api_key", None)
+        providers.append(Provider(**entry))
+    return providers
+
+
+class ProviderRouter:
+    """
+    在多个 OpenAI 兼容提供商之间分配请求。
+
+    每次请求选择得分最高的可用提供商，得分 = 静态权重 × 空闲容量比例 × (1 - 错误率) / 延迟，
+    即估计的可用吞吐：延迟低、出错少、空闲名额多的提供商分到更多请求。延迟与错误率是最近请求的
+    指数滑动平均；还没有延迟样本的提供商按已知最低延迟的一半估计，使新提供商优先被尝试。
+    请求失败时立即换一个本次尚未尝试过的提供商重发；连续失败 FAILURE_THRESHOLD 次的提供商熔断一段时间，
+    期间不再派发请求，熔断到期后恢复，若再次熔断则熔断时长翻倍。
+    """
+
+    def __init__(self, providers: List[Provider]):
+        if not providers:
+            raise ValueError("至少需要一个提供商")
+        names = [provider.name for provider in providers]
+        if len(set(names)) != len(names):
+            raise ValueError(f"提供商名称重复: {names}")
+        self.providers = providers
+        self._condition = threading.Condition()
+
+    @classmethod
+    def from_env(cls, path: Optional[str] = None) -> Optional["ProviderRouter"]:
+        """
+        按配置创建路由器：优先读取 path 或环境变量 LLM_PROVIDERS_FILE 指定的 JSON 文件，
+        其次读取环境变量 LLM_PROVIDERS；都未配置时返回 None（使用默认的单一提供商）。
+        """
+        path = path or os.getenv("LLM_PROVIDERS_FILE")
+        if path:
+            return cls(load_providers_from_file(path))
+        if os.getenv("LLM_PROVIDERS"):
+            return cls(load_providers_from_env())
+        return None
+
+    @property
+    def capacity(self) -> int:
+        """所有提供商的在途请求上限之和"""
+        return sum(provider.max_concurrency for provider in self.providers)
+
+    @property
+    def model_name(self) -> str:
+        """
+        各提供商模型名去重排序后以 "+" 连接，只有一种模型时就是该模型名。
+        同一个块可能由其中任一模型翻译，翻译缓存与翻译记忆按它区分，更换提供商的模型组合后不会复用旧译文。
+        """
+        return "+".join(sorted({provider.model for provider in self.providers}))
+
+    def _score(self, provider: Provider, default_latency: float) -> float:
+        free = (provider.max_concurrency - provider.in_flight) / provider.max_concurrency
+        latency = provider.latency if provider.latency is not None else default_latency
+        return provider.weight * free * (1.0 - provider.error_rate) / max(latency, 1e-3)
+
+    def acquire(self, exclude: Collection[Provider] = ()) -> Optional[Provider]:
+        """
+        选择一个提供商并占用它的一个在途名额；候选提供商都已满载或熔断时阻塞等待。
+
+        Args:
+            exclude: 不参与选择的提供商（如本次请求已失败过的）；传入时若其余提供商都在熔断中，
+                     不等待熔断到期而是返回 None
+        """
+        candidates = [p for p in self.providers if p not in exclude]
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                if exclude and all(p.down_until > now for p in candidates):
+                    return None
+                available = [p for p in candidates if p.down_until <= now and p.in_flight < p.max_concurrency]
+                if available:
+                    known = [p.latency for p in self.providers if p.latency is not None]
+                    default_latency = min(known) / 2 if known else 1.0
+                    provider = max(available, key=lambda p: self._score(p, default_latency))
+                    provider.in_flight += 1
+                    return provider
+                # 等待有名额释放，或最早的熔断到期
+                recovering = [p.down_until - now for p in candidates if p.down_until > now]
+                self._condition.wait(timeout=min(recovering) if recovering else None)
+
+    def release(self, provider: Provider, latency: Optional[float] = None, failed: bool = False) -> None:
+        """
+        归还名额并更新统计：成功时记录延迟；失败时累计连续失败次数，达到阈值后熔断该提供商。
+        """
+        with self._condition:
+            provider.in_flight -= 1
+            provider.requests += 1
+            provider.error_rate += EWMA_ALPHA * ((1.0 if failed else 0.0) - provider.error_rate)
+            if failed:
+                provider.errors += 1
+                provider.failures += 1
+                if provider.failures >= FAILURE_THRESHOLD:
+                    provider.down_until = time.monotonic() + provider.cooldown
+                    print(f"提供商 {provider.name} 连续失败 {provider.failures} 次，熔断 {provider.cooldown:.0f}s")
+                    provider.cooldown = min(provider.cooldown * 2, COOLDOWN_MAX)
+                    provider.failures = 0
+            else:
+                provider.failures = 0
+                provider.cooldown = COOLDOWN_INITIAL
+                if latency is not None:
+                    provider.latency = latency if provider.latency is None else (
+                        provider.latency + EWMA_ALPHA * (latency - provider.latency)
+                    )
+            self._condition.notify_all()
+
+    def call(self, func: Callable, text: str):
+        """
+        选择一个提供商调用 func(text, provider=provider)（如 translate_text），并记录延迟与成败。
+
+        提供商配置了 RPM/TPM 限额时先向它的限流器申请预算。请求失败时换一个本次尚未尝试过、
+        且未熔断的提供商重发；所有提供商都失败（或其余都在熔断中）时抛出最后一次的异常。
+        """
+        tried: List[Provider] = []
+        provider = self.acquire()
+        while True:
+            charged_tokens = 0
+            try:
+                if provider.rate_limiter is not None:
+                    charged_tokens = provider.rate_limiter.acquire(estimate_request_tokens(text, SYSTEM_PROMPT))
+                start = time.monotonic()
+                response = func(text, provider=provider)
+            except Exception:
+                self.release(provider, failed=True)
+                tried.append(provider)
+                provider = self.acquire(exclude=tried) if len(tried) < len(self.providers) else None
+                if provider is None:
+                    raise
+                continue
+            self.release(provider, latency=time.monotonic() - start)
+            usage = getattr(response, "usage", None)
+            if provider.rate_limiter is not None and usage is not None:
+                provider.rate_limiter.settle(charged_tokens, usage.total_tokens)
+            return response
+
+    def summary(self) -> Dict[str, dict]:
+        with self._condition:
+            return {provider.name: provider.summary() for provider in self.providers}
+
+    def close(self) -> None:
+        for provider in self.providers:
+            provider.close()
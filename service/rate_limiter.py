@@ -0,0 +1,164 @@
+import asyncio
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import Optional
+
+from service.count_token import count_tokens
+
+# 译文 token 数相对原文的估计倍数（英文译为中文后 token 数通常略多）
+DEFAULT_OUTPUT_RATIO = 1.5
+
+
+class TokenBucket:
+    """
+    令牌桶：容量为 capacity，每秒补充 refill_rate 个令牌。
+    """
+
+    def __init__(self, capacity: float, refill_rate: float):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.available = capacity
+        self._updated_at = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        elapsed = now - self._updated_at
+        self.available = min(self.capacity, self.available + elapsed * self.refill_rate)
+        self._updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        """令牌足够时返回 0，否则返回还需等待的秒数"""
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) / self.refill_rate
+
+
+class RateLimiter:
+    """
+    客户端限流器，同时约束每分钟请求数（RPM）与每分钟 token 数（TPM）。
+
+    每个请求按"输入 token + 估计输出 token"扣费，预算不足时阻塞直到令牌桶补足，
+    避免请求一起发出后被服务端 429 拒绝、白白消耗重试次数。
+    请求完成后可用 settle() 按实际用量多退少补。
+    """
+
+    def __init__(self, rpm: Optional[int] = None, tpm: Optional[int] = None):
+        """
+        Args:
+            rpm: 每分钟最大请求数，None 表示不限制
+            tpm: 每分钟最大 token 数，None 表示不限制
+        """
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = TokenBucket(rpm, rpm / 60.0) if rpm else None
+        self._tokens = TokenBucket(tpm, tpm / 60.0) if tpm else None
+        self._lock = threading.Lock()
+        self.total_wait = 0.0
+
+    @classmethod
+    def from_env(cls, provider: str = "DEEPSEEK") -> Optional["RateLimiter"]:
+        """
+        从环境变量 {provider}_RPM / {provider}_TPM 读取限额，都未设置时返回 None。
+        """
+        rpm = os.getenv(f"{provider}_RPM")
+        tpm = os.getenv(f"{provider}_TPM")
+        if not rpm and not tpm:
+            return None
+        return cls(rpm=int(rpm) if rpm else None, tpm=int(tpm) if tpm else None)
+
+    def charge_for(self, tokens: int) -> int:
+        """
+        估计 tokens 个 token 的请求实际扣除的 TPM 预算：
+        单个请求超过整个桶容量时按容量扣费，否则永远无法发出。
+        """
+        if self._tokens is not None:
+            return min(tokens, int(self._tokens.capacity))
+        return tokens
+
+    def try_acquire(self, tokens: int) -> float:
+        """
+        尝试扣除 1 个请求和 tokens 个 token。
+
+        Returns:
+            0 表示已扣除；否则为预计需要等待的秒数（此时不扣除任何预算）
+        """
+        tokens = self.charge_for(tokens)
+        now = time.monotonic()
+        with self._lock:
+            wait = 0.0
+            for bucket, amount in ((self._requests, 1), (self._tokens, tokens)):
+                if bucket is not None:
+                    bucket.refill(now)
+                    wait = max(wait, bucket.wait_time(amount))
+            if wait > 0:
+                return wait
+            if self._requests is not None:
+                self._requests.available -= 1
+            if self._tokens is not None:
+                self._tokens.available -= tokens
+            return 0.0
+
+    def acquire(self, tokens: int) -> int:
+        """
+        阻塞直到预算足够并扣除，返回实际扣除的 token 数（见 charge_for），请求完成后应以它调用 settle()。
+        """
+        waited = 0.0
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0:
+                break
+            time.sleep(wait)
+            waited += wait
+        with self._lock:
+            self.total_wait += waited
+        return self.charge_for(tokens)
+
+    async def acquire_async(self, tokens: int) -> int:
+        """
+        acquire 的异步版本，等待期间不阻塞事件循环。
+        """
+        waited = 0.0
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0:
+                break
+            await asyncio.sleep(wait)
+            waited += wait
+        with self._lock:
+            self.total_wait += waited
+        return self.charge_for(tokens)
+
+    def settle(self, charged: int, actual: int) -> None:
+        """
+        请求完成后按实际 token 用量修正 TPM 预算：扣多了退还，扣少了补扣（可暂时为负）。
+
+        Args:
+            charged: acquire() 返回的实际扣除 token 数（不是扣费前的估计值，两者在超过桶容量时不同）
+            actual: 响应 usage 中的 total_tokens
+        """
+        if self._tokens is None:
+            return
+        with self._lock:
+            self._tokens.refill(time.monotonic())
+            self._tokens.available = min(
+                self._tokens.capacity,
+                self._tokens.available + charged - actual
+            )
+
+
+@lru_cache(maxsize=8)
+def _prompt_tokens(system_prompt: str) -> int:
+    return count_tokens(system_prompt)
+
+
+def estimate_request_tokens(
+    chunk: str,
+    system_prompt: str,
+    output_ratio: float = DEFAULT_OUTPUT_RATIO
+) -> int:
+    """
+    估计一次翻译请求消耗的 token 数：系统提示词 + 文本块 + 估计的译文长度。
+    """
+    chunk_tokens = count_tokens(chunk)
+    return _prompt_tokens(system_prompt) + chunk_tokens + int(chunk_tokens * output_ratio)
@@ -0,0 +1,249 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+# Prometheus 指标名前缀
+METRIC_PREFIX = "paper_translate"
+
+
+def percentile(values: List[float], q: float) -> float:
+    """
+    线性插值的百分位数，q 取 0~100。
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * q / 100
+    low = int(pos)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (pos - low)
+
+
+def cached_prompt_tokens(usage) -> int:
+    """
+    从 response.usage 中取出命中服务端上下文缓存的 prompt token 数：
+    DeepSeek 返回 prompt_cache_hit_tokens，OpenAI 返回 prompt_tokens_details.cached_tokens。
+    """
+    hit = getattr(usage, "prompt_cache_hit_tokens", None)
+    if hit is None:
+        details = getattr(usage, "prompt_tokens_details", None)
+        hit = getattr(details, "cached_tokens", None)
+    return hit or 0
+
+
+class RunMetrics:
+    """
+    一次翻译运行的逐块指标收集器。
+
+    每个块记录一条：输入/输出 token 数与命中上下文缓存的输入 token 数（来自 response.usage）、排队等待（提交到线程池到开始处理）、
+    限流等待（RPM/TPM 限流器与自适应并发名额）、成功请求的延迟、尝试次数、finish_reason 与状态
+    （ok / failed / cached / resumed / skipped / memory）。运行结束后可导出 JSON 报告和 Prometheus textfile。
+    所有方法都是线程安全的。
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.wall_seconds: Optional[float] = None
+        self._start = time.monotonic()
+        self._lock = threading.Lock()
+        self._submitted: Dict[int, float] = {}
+        self._records: Dict[int, dict] = {}
+
+    def submitted(self, index: int) -> None:
+        """
+        标记第 index 个块被提交到线程池（或事件循环）的时刻，用于计算排队等待。
+        """
+        with self._lock:
+            self._submitted[index] = time.monotonic()
+
+    def record(
+        self,
+        index: int,
+        status: str = "ok",
+        started_at: Optional[float] = None,
+        input_tokens: int = 0,
+        output_tokens: int = 0,
+        cached_tokens: int = 0,
+        masked_tokens: int = 0,
+        skipped_tokens: int = 0,
+        memory_tokens: int = 0,
+        latency: float = 0.0,
+        throttle_wait: float = 0.0,
+        attempts: int = 0,
+        finish_reason: Optional[str] = None,
+        error: Optional[str] = None
+    ) -> None:
+        """
+        记录一个块的最终结果。
+
+        Args:
+            index: 块索引
+            status: "ok" / "failed" / "cached" / "resumed" / "skipped"（没有需要翻译的文字，未调用 LLM）
+                    / "memory"（所有段落都由翻译记忆提供，未调用 LLM）
+            started_at: 开始处理该块的 time.monotonic()，与 submitted() 的时刻相减得到排队等待
+            input_tokens: 成功请求的 prompt token 数
+            output_tokens: 成功请求的 completion token 数
+            cached_tokens: 成功请求的 prompt token 中命中服务端上下文缓存的部分
+            masked_tokens: 公式、代码等片段替换为占位符后减少的输入 token 数
+            skipped_tokens: 跳过的块的 token 数
+            memory_tokens: 由翻译记忆提供译文、未发送给 LLM 的原文 token 数
+            latency: 成功请求的耗时（秒），不含重试与退避
+            throttle_wait: 所有尝试中等待限流器与并发名额的总时间（秒）
+            attempts: 发出的请求次数（缓存命中与恢复的块为 0）
+            finish_reason: 成功请求的 finish_reason
+            error: 失败时的错误信息
+        """
+        with self._lock:
+            submitted = self._submitted.get(index)
+            queue_wait = max(0.0, started_at - submitted) if started_at is not None and submitted is not None else 0.0
+            self._records[index] = {
+                "index": index,
+                "status": status,
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "cached_tokens": cached_tokens,
+                "masked_tokens": masked_tokens,
+                "skipped_tokens": skipped_tokens,
+                "memory_tokens": memory_tokens,
+                "queue_wait": round(queue_wait, 4),
+                "throttle_wait": round(throttle_wait, 4),
+                "latency": round(latency, 4),
+                "attempts": attempts,
+                "finish_reason": finish_reason,
+                "error": error,
+            }
+
+    def finish(self) -> None:
+        """
+        标记运行结束，记录总耗时。
+        """
+        self.wall_seconds = time.monotonic() - self._start
+
+    @property
+    def records(self) -> List[dict]:
+        with self._lock:
+            return [dict(self._records[i]) for i in sorted(self._records)]
+
+    def summary(self) -> dict:
+        """
+        汇总指标：各状态块数、token 总数与上下文缓存命中率、延迟与排队等待的 p50/p95、重试次数与吞吐。
+        """
+        records = self.records
+        requested = [r for r in records if r["status"] == "ok"]
+        latencies = [r["latency"] for r in requested]
+        queue_waits = [r["queue_wait"] for r in records if r["attempts"]]
+        wall = self.wall_seconds if self.wall_seconds is not None else time.monotonic() - self._start
+        input_tokens = sum(r["input_tokens"] for r in records)
+        output_tokens = sum(r["output_tokens"] for r in records)
+        cached_tokens = sum(r["cached_tokens"] for r in records)
+        status_counts = {status: 0 for status in ("ok", "failed", "cached", "resumed")}
+        for r in records:
+            status_counts[r["status"]] = status_counts.get(r["status"], 0) + 1
+        finish_reasons: Dict[str, int] = {}
+        for r in requested:
+            reason = r["finish_reason"] or "unknown"
+            finish_reasons[reason] = finish_reasons.get(reason, 0) + 1
+        return {
+            "chunks": len(records),
+            "status": status_counts,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "cached_input_tokens": cached_tokens,
+            "prompt_cache_hit_rate": round(cached_tokens / input_tokens, 4) if input_tokens else 0.0,
+            "masked_tokens": sum(r["masked_tokens"] for r in records),
+            "skipped_tokens": sum(r["skipped_tokens"] for r in records),
+            "memory_tokens": sum(r["memory_tokens"] for r in records),
+            "requests": sum(r["attempts"] for r in records),
+            "retries": sum(max(0, r["attempts"] - 1) for r in records),
+            "finish_reasons": finish_reasons,
+            "latency_p50": round(percentile(latencies, 50), 4),
+            "latency_p95": round(percentile(latencies, 95), 4),
+            "latency_max": round(max(latencies, default=0.0), 4),
+            "queue_wait_p50": round(percentile(queue_waits, 50), 4),
+            "queue_wait_p95": round(percentile(queue_waits, 95), 4),
+            "throttle_wait_total": round(sum(r["throttle_wait"] for r in records), 4),
+            "wall_seconds": round(wall, 4),
+            "chunks_per_second": round(len(requested) / wall, 4) if wall else 0.0,
+            "tokens_per_second": round((input_tokens + output_tokens) / wall, 2) if wall else 0.0,
+        }
+
+    def write_json(self, path: str, extra: Optional[dict] = None) -> None:
+        """
+        写出 JSON 运行报告：{...extra, started_at, summary, chunks}。
+        """
+        report = dict(extra or {})
+        report["started_at"] = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.started_at))
+        report["summary"] = self.summary()
+        report["chunks"] = self.records
+        _atomic_write(path, json.dumps(report, ensure_ascii=False, indent=2))
+
+    def write_prometheus(self, path: str, labels: Optional[Dict[str, str]] = None) -> None:
+        """
+        写出 Prometheus textfile（供 node_exporter 的 textfile collector 采集），只包含汇总指标。
+
+        Args:
+            path: 输出路径，应以 .prom 结尾
+            labels: 附加到每个指标上的标签，如 {"paper": "2504.17550v1"}
+        """
+        summary = self.summary()
+        base = dict(labels or {})
+
+        def fmt(extra: Optional[Dict[str, str]] = None) -> str:
+            merged = {**base, **(extra or {})}
+            if not merged:
+                return ""
+            return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in merged.items()) + "}"
+
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str, samples: List[tuple]) -> None:
+            full = f"{METRIC_PREFIX}_{name}"
+            lines.append(f"# HELP {full} {help_text}")
+            lines.append(f"# TYPE {full} {kind}")
+            for extra, value in samples:
+                lines.append(f"{full}{fmt(extra)} {value}")
+
+        metric("chunks", "gauge", "Chunks in the last run by status.",
+               [({"status": s}, n) for s, n in summary["status"].items()])
+        metric("tokens", "gauge", "Tokens reported by the API in the last run.",
+               [({"direction": "input"}, summary["input_tokens"]), ({"direction": "output"}, summary["output_tokens"]),
+                ({"direction": "cached_input"}, summary["cached_input_tokens"])])
+        metric("masked_tokens", "gauge", "Input tokens saved by masking formulas, code, images and tables.",
+               [(None, summary["masked_tokens"])])
+        metric("skipped_tokens", "gauge", "Tokens in chunks passed through without an LLM call.",
+               [(None, summary["skipped_tokens"])])
+        metric("memory_tokens", "gauge", "Source tokens served from the translation memory instead of the LLM.",
+               [(None, summary["memory_tokens"])])
+        metric("requests", "gauge", "LLM requests sent in the last run, including retries.",
+               [(None, summary["requests"])])
+        metric("retries", "gauge", "Retried LLM requests in the last run.", [(None, summary["retries"])])
+        metric("chunk_latency_seconds", "gauge", "Successful request latency quantiles in the last run.",
+               [({"quantile": "0.5"}, summary["latency_p50"]), ({"quantile": "0.95"}, summary["latency_p95"]),
+                ({"quantile": "1"}, summary["latency_max"])])
+        metric("queue_wait_seconds", "gauge", "Queue wait quantiles in the last run.",
+               [({"quantile": "0.5"}, summary["queue_wait_p50"]), ({"quantile": "0.95"}, summary["queue_wait_p95"])])
+        metric("throttle_wait_seconds", "gauge", "Total time spent waiting for rate limiter or concurrency slots.",
+               [(None, summary["throttle_wait_total"])])
+        metric("wall_seconds", "gauge", "Wall time of the last run.", [(None, summary["wall_seconds"])])
+        metric("last_run_timestamp_seconds", "gauge", "Unix time when the last run started.",
+               [(None, round(self.started_at, 3))])
+        _atomic_write(path, "\n".join(lines) + "\n")
+
+
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _atomic_write(path: str, content: str) -> None:
+    """
+    先写临时文件再替换，采集方不会读到写了一半的文件。
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
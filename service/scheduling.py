@@ -0,0 +1,48 @@
+import heapq
+from typing import List, Sequence
+
+
+def lpt_order(weights: Sequence[float]) -> List[int]:
+    """
+    LPT（Longest Processing Time first）调度顺序：按权重从大到小返回索引，权重相同时保持原顺序。
+    """
+    return sorted(range(len(weights)), key=lambda i: -weights[i])
+
+
+def windowed_lpt_order(weights: Sequence[float], window: int) -> List[int]:
+    """
+    有界窗口的 LPT 顺序：每次从文档顺序上尚未派发的前 window 个任务中取权重最大的（相同时取靠前的）。
+
+    任何任务最多比文档顺序推迟 window - 1 个位置派发，按顺序写出结果时等待前面块的重排缓冲因此有界；
+    window 不小于任务数时等同于 lpt_order，window 为 1 时就是文档顺序。
+    """
+    window = max(1, window)
+    heap = [(-weights[i], i) for i in range(min(window, len(weights)))]
+    heapq.heapify(heap)
+    order = []
+    next_index = len(heap)
+    while heap:
+        _, i = heapq.heappop(heap)
+        order.append(i)
+        if next_index < len(weights):
+            heapq.heappush(heap, (-weights[next_index], next_index))
+            next_index += 1
+    return order
+
+
+def simulate_makespan(durations: Sequence[float], order: Sequence[int], workers: int) -> float:
+    """
+    模拟列表调度：按 order 依次把任务交给最先空闲的工作线程，返回全部完成的时间。
+
+    Args:
+        durations: 每个任务的预计耗时
+        order: 派发顺序（任务索引）
+        workers: 工作线程数
+    """
+    if not order:
+        return 0.0
+    free_at = [0.0] * max(1, min(workers, len(order)))
+    for i in order:
+        start = heapq.heappop(free_at)
+        heapq.heappush(free_at, start + durations[i])
+    return max(free_at)
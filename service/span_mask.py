@@ -0,0 +1,135 @@
+import re
+from typing import List, Tuple
+
+# 行内公式短于该长度（含 $ 定界符）时不替换：占位符本身也要消耗几个 token，替换短公式得不偿失
+MIN_INLINE_MATH_CHARS = 12
+
+# HTML 表格中字母占非空白字符的比例低于该值时视为数据表（数字为主）并替换，
+# 以文字为主的表格仍交给 LLM 翻译
+TABLE_MAX_LETTER_RATIO = 0.5
+
+# 公式、代码块、图片链接与数据表格之外的英文单词少于该数量（且没有带文字的标题）的块不需要翻译
+MIN_PROSE_WORDS = 3
+
+# 占位符的类别：M 公式、C 代码块、I 图片链接、T 表格
+_PLACEHOLDER_PATTERN = re.compile(r'(\$*)\[\[\s*([MCIT])(\d+)\s*\]\](\$*)')
+
+# 按优先级排列的不需要翻译的片段：同一位置先匹配代码块，其次行间公式、表格、图片与行内公式
+_SPAN_PATTERN = re.compile(
+    r'(?P<C>^[ \t]*```[^\n]*\n.*?^[ \t]*```[ \t]*$)'
+    r'|(?P<M>\$\$.+?\$\$)'
+    r'|(?P<T>(?:<html>\s*<body>\s*)?<table\b.*?</table>(?:\s*</body>\s*</html>)?)'
+    r'|(?P<I>!\[[^\]\n]*\]\([^)\n]*\))'
+    r'|(?P<m>(?<![\\$])\$(?!\s)(?:\\.|[^$\\\n])+?(?<!\s)\$(?!\d))',
+    re.DOTALL | re.MULTILINE
+)
+_TAG_PATTERN = re.compile(r'<[^>]+>')
+_PROSE_WORD_PATTERN = re.compile(r"[A-Za-z][A-Za-z'-]+")
+_HEADING_LINE_PATTERN = re.compile(r'^[ \t]*#{1,6}[ \t]+(.*)$', re.MULTILINE)
+
+
+class PlaceholderMismatchError(ValueError):
+    """
+    译文中的占位符与原文不一致（缺失、重复或多出），无法还原。
+    """
+
+
+def _placeholder(kind: str, index: int) -> str:
+    return f"[[{kind}{index}]]"
+
+
+def _is_data_table(table: str) -> bool:
+    """
+    表格内容以数字为主（字母比例低于 TABLE_MAX_LETTER_RATIO）时返回 True。
+    """
+    content = "".join(_TAG_PATTERN.sub(" ", table).split())
+    if not content:
+        return True
+    letters = sum(1 for c in content if c.isalpha())
+    return letters / len(content) < TABLE_MAX_LETTER_RATIO
+
+
+def mask_spans(text: str) -> Tuple[str, List[str]]:
+    """
+    将不需要翻译的片段替换为短占位符（如 [[M0]]），返回 (替换后的文本, 被替换的片段列表)。
+
+    替换的片段：$$...$$ 行间公式、不短于 MIN_INLINE_MATH_CHARS 的 $...$ 行内公式、围栏代码块、
+    图片链接，以及以数字为主的 HTML 表格。第 i 个片段对应编号为 i 的占位符。
+    原文中已经出现形如占位符的文本时不做替换，避免还原时混淆。
+    """
+    if _PLACEHOLDER_PATTERN.search(text):
+        return text, []
+    spans: List[str] = []
+
+    def replace(match: re.Match) -> str:
+        kind = match.lastgroup
+        span = match.group(0)
+        if kind == "m":
+            if len(span) < MIN_INLINE_MATH_CHARS:
+                return span
+            kind = "M"
+        elif kind == "T" and not _is_data_table(span):
+            return span
+        spans.append(span)
+        return _placeholder(kind, len(spans) - 1)
+
+    masked = _SPAN_PATTERN.sub(replace, text)
+    return masked, spans
+
+
+def restore_spans(translated: str, spans: List[str]) -> str:
+    """
+    将译文中的占位符还原为原始片段。
+
+    容忍模型在占位符内加空格或给公式占位符额外套上 $。每个占位符必须恰好出现一次，
+    否则抛出 PlaceholderMismatchError，调用方应改为发送未替换的原文重试。
+    """
+    if not spans:
+        return translated
+    seen = [0] * len(spans)
+
+    def replace(match: re.Match) -> str:
+        leading, kind, number, trailing = match.groups()
+        index = int(number)
+        if index >= len(spans):
+            raise PlaceholderMismatchError(f"译文中出现了原文没有的占位符 {_placeholder(kind, index)}")
+        seen[index] += 1
+        if kind == "M":
+            # 公式原文已带 $ 定界符，去掉模型额外添加的 $
+            return spans[index]
+        return leading + spans[index] + trailing
+
+    restored = _PLACEHOLDER_PATTERN.sub(replace, translated)
+    missing = [i for i, count in enumerate(seen) if count != 1]
+    if missing:
+        raise PlaceholderMismatchError(f"译文中有 {len(missing)} 个占位符缺失或重复: {missing[:5]}")
+    return restored
+
+
+def strip_untranslatable(text: str) -> str:
+    """
+    去掉公式（含短公式）、代码块、图片链接、数据表格与 HTML 标签，只留下需要翻译的文字。
+    """
+    def drop(match: re.Match) -> str:
+        if match.lastgroup == "T" and not _is_data_table(match.group(0)):
+            return " " + _TAG_PATTERN.sub(" ", match.group(0)) + " "
+        return " "
+
+    return _TAG_PATTERN.sub(" ", _SPAN_PATTERN.sub(drop, text))
+
+
+def needs_translation(text: str, min_words: int = MIN_PROSE_WORDS) -> bool:
+    """
+    判断文本块是否含有需要翻译的文字：公式、代码块、图片链接与数据表格之外至少有 min_words 个英文单词，
+    或者有带文字的标题（标题即使很短也要翻译）。只有图片、公式、数字表格或代码的块返回 False。
+    """
+    prose = strip_untranslatable(text)
+    for heading in _HEADING_LINE_PATTERN.findall(prose):
+        if _PROSE_WORD_PATTERN.search(heading):
+            return True
+    words = 0
+    for _ in _PROSE_WORD_PATTERN.finditer(prose):
+        words += 1
+        if words >= min_words:
+            return True
+    return False
@@ -0,0 +1,182 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+DEFAULT_CACHE_PATH = os.path.join("cache", "translation_cache.sqlite3")
+
+
+class TranslationCache:
+    """
+    基于 SQLite 的持久化翻译缓存（内容寻址）。
+
+    缓存键为 (文本块, 模型名, 系统提示词) 的 SHA-256 哈希，任一部分变化都会得到新的键，
+    因此修改提示词或更换模型后不会命中旧译文。支持按条目数、总字节数和存活时间淘汰。
+    所有操作都由一把锁保护，可在 translate_chunks_concurrent 的多个工作线程间共享。
+    """
+
+    # 每写入多少条记录执行一次淘汰检查
+    EVICT_EVERY = 100
+
+    def __init__(
+        self,
+        db_path: str = DEFAULT_CACHE_PATH,
+        max_entries: Optional[int] = 50000,
+        max_bytes: Optional[int] = 512 * 1024 * 1024,
+        max_age_days: Optional[float] = 90
+    ):
+        """
+        Args:
+            db_path: SQLite 数据库文件路径，目录不存在时自动创建
+            max_entries: 最多保留的条目数，None 表示不限制
+            max_bytes: 译文总字节数上限，None 表示不限制
+            max_age_days: 条目最长存活天数，None 表示不限制
+        """
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._puts_since_evict = 0
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS translations (
+                key TEXT PRIMARY KEY,
+                translation TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_translations_accessed ON translations(accessed_at)"
+        )
+        self._conn.commit()
+        self.evict()
+
+    @staticmethod
+    def make_key(text: str, model: str, system_prompt: str) -> str:
+        """
+        计算缓存键。各部分带长度前缀拼接，避免不同组合拼出相同的字节串。
+        """
+        digest = hashlib.sha256()
+        for part in (model, system_prompt, text):
+            data = part.encode("utf-8")
+            digest.update(f"{len(data)}:".encode("ascii"))
+            digest.update(data)
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        查询缓存，命中时刷新访问时间。
+
+        Returns:
+            缓存的译文，未命中（或已过期）返回 None
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT translation, created_at FROM translations WHERE key = ?",
+                (key,)
+            ).fetchone()
+            if row is None or self._is_expired(row[1], now):
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE translations SET accessed_at = ? WHERE key = ?",
+                (now, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, translation: str) -> None:
+        """
+        写入（或覆盖）一条译文。
+        """
+        now = time.time()
+        size = len(translation.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO translations (key, translation, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, translation, size, now, now)
+            )
+            self._conn.commit()
+            self._puts_since_evict += 1
+            should_evict = self._puts_since_evict >= self.EVICT_EVERY
+        if should_evict:
+            self.evict()
+
+    def evict(self) -> int:
+        """
+        淘汰过期条目，再按最近最少访问的顺序淘汰超出条目数/字节数上限的部分。
+
+        Returns:
+            被删除的条目数
+        """
+        removed = 0
+        with self._lock:
+            self._puts_since_evict = 0
+
+            if self.max_age_days is not None:
+                cutoff = time.time() - self.max_age_days * 86400
+                cur = self._conn.execute(
+                    "DELETE FROM translations WHERE created_at < ?", (cutoff,)
+                )
+                removed += cur.rowcount
+
+            if self.max_entries is not None:
+                count = self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+                overflow = count - self.max_entries
+                if overflow > 0:
+                    cur = self._conn.execute(
+                        "DELETE FROM translations WHERE key IN ("
+                        "SELECT key FROM translations ORDER BY accessed_at ASC LIMIT ?)",
+                        (overflow,)
+                    )
+                    removed += cur.rowcount
+
+            if self.max_bytes is not None:
+                total = self._conn.execute(
+                    "SELECT COALESCE(SUM(size), 0) FROM translations"
+                ).fetchone()[0]
+                if total > self.max_bytes:
+                    # 从最久未访问的条目开始删除，直到总大小回到上限以内
+                    excess = total - self.max_bytes
+                    stale_keys = []
+                    for key, size in self._conn.execute(
+                        "SELECT key, size FROM translations ORDER BY accessed_at ASC"
+                    ):
+                        stale_keys.append((key,))
+                        excess -= size
+                        if excess <= 0:
+                            break
+                    self._conn.executemany("DELETE FROM translations WHERE key = ?", stale_keys)
+                    removed += len(stale_keys)
+
+            self._conn.commit()
+        return removed
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return self.max_age_days is not None and now - created_at > self.max_age_days * 86400
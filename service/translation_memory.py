@@ -0,0 +1,473 @@
+import hashlib
+import os
+import re
+import sqlite3
+import struct
+import threading
+import time
+from typing import List, Optional, Sequence, Set, Tuple
+
+from service.span_mask import mask_spans, needs_translation
+from service.translation_cache import TranslationCache
+
+DEFAULT_MEMORY_PATH = os.path.join("cache", "translation_memory.sqlite3")
+
+# 近重复判断使用的词 n-gram 长度
+SHINGLE_SIZE = 3
+
+# MinHash 签名长度与 LSH 分段：BANDS 段 × ROWS 行，Jaccard 相似度约高于 (1/BANDS)^(1/ROWS) ≈ 0.5 的段落会成为候选
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+# LSH 候选段落与记忆中原文的 Jaccard 相似度不低于该值、且去掉大小写、空白与标点后逐词相同时直接复用记忆中的译文。
+# 相似度只用于筛选候选：一个词的改动（如 improves → degrades）在长段落中的 Jaccard 仍高于 0.9，不能作为命中依据
+MIN_SIMILARITY = 0.9
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+# 固定种子生成的哈希置换参数，保证不同进程写入的签名可以互相比较
+_PERMUTATIONS = [
+    (
+        int.from_bytes(hashlib.blake2b(f"a{i}".encode(), digest_size=8).digest(), "big") % (_MERSENNE_PRIME - 1) + 1,
+        int.from_bytes(hashlib.blake2b(f"b{i}".encode(), digest_size=8).digest(), "big") % _MERSENNE_PRIME,
+    )
+    for i in range(NUM_PERM)
+]
+
+_NUMBER_PATTERN = re.compile(r"\d+(?:\.\d+)?")
+_WORD_PATTERN = re.compile(r"\w+")
+_FENCE_PATTERN = re.compile(r"^[ \t]*```")
+_TABLE_ROW_PATTERN = re.compile(r"^[ \t]*\|")
+_LIST_ITEM_PATTERN = re.compile(r"^[ \t]*(?:[-*+]|\d+[.)])[ \t]+")
+_HTML_TABLE_OPEN_PATTERN = re.compile(r"<table\b", re.IGNORECASE)
+_HTML_TABLE_CLOSE_PATTERN = re.compile(r"</table>", re.IGNORECASE)
+
+# 对齐后的段落对中，译文与原文的非空白字符数之比超出该范围时视为没有对齐（英译中通常约为 0.2~0.6）
+MIN_LENGTH_RATIO = 0.1
+MAX_LENGTH_RATIO = 3.0
+
+
+class MemoryAlignmentError(ValueError):
+    """
+    译文的段落数与发送的原文段落数不一致，无法与记忆中的译文拼接。
+    """
+
+
+def split_blocks(text: str) -> Tuple[List[str], List[str]]:
+    """
+    把文本切分为段落，并记录相邻段落之间原有的分隔符，返回 (段落列表, 分隔符列表)，分隔符比段落少一个。
+
+    与 chunk_md 的结构化拆分一致：空行分隔段落；chunk_md 的分块已去掉空行，因此每个非空行也是一个段落，
+    但连续的 Markdown 表格行、连续的列表项（含缩进的续行）、围栏代码块、$$ 行间公式与多行 <table> 各自合为一个段落。
+    分隔符是段落之间的换行（"\n" 或带空行的 "\n\n" 等），拼接时按原样还原排版。返回的段落去掉了首尾空白。
+    """
+    lines = text.split("\n")
+    blocks: List[str] = []
+    separators: List[str] = []
+    current: List[str] = []
+    kind = ""
+    last = 0
+    in_fence = in_math = in_table = False
+
+    def flush() -> None:
+        if current:
+            blocks.append("\n".join(current).strip())
+            current.clear()
+
+    for i, line in enumerate(lines):
+        if current and (in_fence or in_math or in_table):
+            current.append(line)
+            last = i
+        elif line.strip():
+            if _TABLE_ROW_PATTERN.match(line):
+                line_kind = "table"
+            elif _LIST_ITEM_PATTERN.match(line) or (kind == "list" and current and line[:1] in " \t"):
+                line_kind = "list"
+            else:
+                line_kind = "text"
+            if current and line_kind == kind and kind != "text" and last == i - 1:
+                current.append(line)
+            else:
+                flush()
+                if blocks:
+                    separators.append("\n" * (i - last))
+                current.append(line)
+                kind = line_kind
+            last = i
+        else:
+            flush()
+            continue
+
+        if _FENCE_PATTERN.match(line):
+            in_fence = not in_fence
+        elif not in_fence:
+            if line.count("$$") % 2 == 1:
+                in_math = not in_math
+            if _HTML_TABLE_OPEN_PATTERN.search(line) and not _HTML_TABLE_CLOSE_PATTERN.search(line):
+                in_table = True
+            elif in_table and _HTML_TABLE_CLOSE_PATTERN.search(line):
+                in_table = False
+        if kind == "text" and not (in_fence or in_math or in_table):
+            flush()
+    flush()
+    return blocks, separators
+
+
+def split_paragraphs(text: str) -> List[str]:
+    """
+    把文本切分为段落（见 split_blocks），不返回分隔符。
+    """
+    return split_blocks(text)[0]
+
+
+def _aligned(source: str, translation: str) -> bool:
+    """
+    检查一对段落是否确实互为译文：数字完全一致、公式/代码/图片等不翻译的片段完全一致、长度比例合理。
+    用于发现段落数相同但错位（模型合并了一处段落又拆分了另一处）的情况。
+    """
+    if sorted(_NUMBER_PATTERN.findall(source)) != sorted(_NUMBER_PATTERN.findall(translation)):
+        return False
+    if sorted(mask_spans(source)[1]) != sorted(mask_spans(translation)[1]):
+        return False
+    source_chars = len("".join(source.split()))
+    translation_chars = len("".join(translation.split()))
+    return MIN_LENGTH_RATIO * source_chars <= translation_chars <= MAX_LENGTH_RATIO * source_chars
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split())
+
+
+def _words(text: str) -> List[str]:
+    """
+    大小写折叠后的词序列（字母、数字与汉字），忽略空白与标点的差异。
+    """
+    return _WORD_PATTERN.findall(text.casefold())
+
+
+def _shingles(text: str) -> Set[str]:
+    """
+    词序列（见 _words，不含标点）的 SHINGLE_SIZE-gram 集合；不足 SHINGLE_SIZE 个词时整段作为一个元素。
+    """
+    tokens = _words(text)
+    if len(tokens) <= SHINGLE_SIZE:
+        return {" ".join(tokens)}
+    return {" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+
+
+def _jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def minhash(shingles: Set[str]) -> List[int]:
+    """
+    计算 shingle 集合的 MinHash 签名（NUM_PERM 个 32 位值）。
+    """
+    values = [
+        int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for shingle in shingles
+    ]
+    return [
+        min(((a * value + b) % _MERSENNE_PRIME) & _MAX_HASH for value in values)
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def _band_keys(signature: Sequence[int]) -> List[Tuple[int, int]]:
+    """
+    把签名切成 BANDS 段，每段哈希为一个 63 位整数作为 LSH 桶号，返回 [(段号, 桶号)]。
+    """
+    keys = []
+    for band in range(BANDS):
+        data = struct.pack(f"<{ROWS}I", *signature[band * ROWS:(band + 1) * ROWS])
+        bucket = int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big") >> 1
+        keys.append((band, bucket))
+    return keys
+
+
+class MemoryPlan:
+    """
+    一个文本块在翻译记忆中的查询结果：按段落记录命中的译文，未命中的段落需要发送给 LLM。
+    """
+
+    def __init__(self, paragraphs: List[str], matches: List[Optional[str]], separators: Optional[List[str]] = None):
+        """
+        Args:
+            paragraphs: 文本块的段落
+            matches: 每个段落命中的译文，未命中为 None
+            separators: 相邻段落之间原有的分隔符（见 split_blocks），默认为空行
+        """
+        self.paragraphs = paragraphs
+        self.matches = matches
+        self.separators = separators if separators is not None else ["\n\n"] * max(len(paragraphs) - 1, 0)
+
+    @property
+    def pending(self) -> List[str]:
+        """未命中、需要发送给 LLM 的段落"""
+        return [p for p, match in zip(self.paragraphs, self.matches) if match is None]
+
+    @property
+    def complete(self) -> bool:
+        """所有段落都已命中"""
+        return all(match is not None for match in self.matches)
+
+    @property
+    def partial(self) -> bool:
+        """部分段落命中"""
+        return not self.complete and any(match is not None for match in self.matches)
+
+    def _join(self, parts: List[Tuple[int, str]]) -> str:
+        """按段落在原文中的位置拼接，每个段落前使用它在原文中的分隔符"""
+        text = ""
+        for k, (index, part) in enumerate(parts):
+            text += (self.separators[index - 1] if k else "") + part
+        return text
+
+    def pending_text(self) -> str:
+        return self._join([(i, p) for i, (p, match) in enumerate(zip(self.paragraphs, self.matches)) if match is None])
+
+    def merge(self, translated: str) -> str:
+        """
+        把 LLM 对 pending_text() 的译文按段落填回未命中的位置，按原文的分隔符拼接，返回整块译文。
+
+        没有任何段落命中时原样返回 translated；译文段落数与 pending 不一致、或某个段落与原文对不上
+        （数字、公式等不翻译的片段或长度比例不符，见 _aligned）时抛出 MemoryAlignmentError。
+        """
+        if not any(match is not None for match in self.matches):
+            return translated
+        pieces = split_paragraphs(translated) if not self.complete else []
+        if len(pieces) != len(self.pending):
+            raise MemoryAlignmentError(
+                f"译文有 {len(pieces)} 个段落，发送的原文有 {len(self.pending)} 个段落"
+            )
+        for source, piece in zip(self.pending, pieces):
+            if not _aligned(source, piece):
+                raise MemoryAlignmentError(f"译文段落与原文对不上: {piece[:40]!r}")
+        filled = iter(pieces)
+        return self._join([
+            (i, match if match is not None else next(filled)) for i, match in enumerate(self.matches)
+        ])
+
+
+class TranslationMemory:
+    """
+    基于 SQLite 的段落级翻译记忆，跨论文复用相同或几乎相同的段落的译文。
+
+    翻译完成的块切分为段落（见 split_blocks），段落数与原文一致时逐段对齐为 (原文, 译文) 对，
+    通过数字、不翻译片段与长度比例检查（见 _aligned）的段落对存入记忆；
+    每个原文段落按词 3-gram 计算 MinHash 签名并写入 LSH 分段索引。查询时先按规范化空白后的原文精确匹配，
+    再在 LSH 候选中找真实 Jaccard 相似度不低于 min_similarity、且去掉大小写、空白与标点后逐词相同的原文（近似命中）：
+    只容忍 OCR 常见的大小写、空格与标点差异，任何一个词或数字不同（哪怕只是 improves/degrades）都不会命中。
+    记忆按 (模型名, 系统提示词) 分区，换模型或改提示词后不会命中旧译文。
+    所有操作都由一把锁保护，可在多个工作线程间共享。
+    """
+
+    # 每写入多少个段落执行一次淘汰检查
+    EVICT_EVERY = 500
+
+    def __init__(
+        self,
+        db_path: str = DEFAULT_MEMORY_PATH,
+        model: str = "",
+        system_prompt: str = "",
+        min_similarity: float = MIN_SIMILARITY,
+        max_entries: Optional[int] = 200000
+    ):
+        """
+        Args:
+            db_path: SQLite 数据库文件路径，目录不存在时自动创建
+            model: 模型名，与 system_prompt 一起决定记忆分区
+            system_prompt: 系统提示词
+            min_similarity: 近似命中候选所需的最低 Jaccard 相似度（0~1），1 表示只复用规范化空白后完全相同的段落
+            max_entries: 最多保留的段落对数，超出时淘汰最久未命中的，None 表示不限制
+        """
+        if not 0 < min_similarity <= 1:
+            raise ValueError("min_similarity 必须在 (0, 1] 之间")
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        self.db_path = db_path
+        self.namespace = TranslationCache.make_key("", model, system_prompt)[:16]
+        self.min_similarity = min_similarity
+        self.max_entries = max_entries
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._adds_since_evict = 0
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS segments (
+                id INTEGER PRIMARY KEY,
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                source TEXT NOT NULL,
+                translation TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                UNIQUE (namespace, key)
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS segment_bands (
+                band INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                segment_id INTEGER NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_segment_bands ON segment_bands(band, bucket)")
+        # 淘汰时按 segment_id 删除索引行
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_segment_bands_segment ON segment_bands(segment_id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_segments_accessed ON segments(accessed_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def _key(source: str) -> str:
+        return hashlib.sha256(_normalize(source).encode("utf-8")).hexdigest()
+
+    def _find(self, paragraph: str) -> Optional[str]:
+        """
+        在记忆中查找一个段落的译文，调用方需持有锁。
+        """
+        row = self._conn.execute(
+            "SELECT id, translation FROM segments WHERE namespace = ? AND key = ?",
+            (self.namespace, self._key(paragraph))
+        ).fetchone()
+        if row is not None:
+            self.exact_hits += 1
+            self._touch(row[0])
+            return row[1]
+        if self.min_similarity >= 1:
+            return None
+
+        shingles = _shingles(paragraph)
+        words = _words(paragraph)
+        keys = _band_keys(minhash(shingles))
+        candidates = self._conn.execute(
+            "SELECT DISTINCT s.id, s.source, s.translation FROM segment_bands b JOIN segments s ON s.id = b.segment_id "
+            "WHERE s.namespace = ? AND (" + " OR ".join(["(b.band = ? AND b.bucket = ?)"] * len(keys)) + ")",
+            [self.namespace] + [value for key in keys for value in key]
+        ).fetchall()
+        best = None
+        best_similarity = self.min_similarity
+        for segment_id, source, translation in candidates:
+            # 改动一个词（反义词、否定）或数字就可能让意思相反，相似度再高也只复用逐词相同的段落
+            if _words(source) != words:
+                continue
+            similarity = _jaccard(shingles, _shingles(source))
+            if similarity >= best_similarity:
+                best, best_similarity = (segment_id, translation), similarity
+        if best is None:
+            return None
+        self.near_hits += 1
+        self._touch(best[0])
+        return best[1]
+
+    def _touch(self, segment_id: int) -> None:
+        self._conn.execute("UPDATE segments SET accessed_at = ? WHERE id = ?", (time.time(), segment_id))
+
+    def lookup(self, chunk: str) -> MemoryPlan:
+        """
+        按段落查询一个文本块。没有任何文字的段落（只有公式、图片、代码等）原样视为命中，
+        但块中所有需要翻译的段落都未命中时返回全部未命中的结果，整块照常发送翻译。
+        """
+        paragraphs, separators = split_blocks(chunk)
+        matches: List[Optional[str]] = []
+        found = 0
+        with self._lock:
+            for paragraph in paragraphs:
+                if not needs_translation(paragraph, min_words=1):
+                    matches.append(paragraph)
+                    continue
+                match = self._find(paragraph)
+                if match is None:
+                    self.misses += 1
+                else:
+                    found += 1
+                matches.append(match)
+            self._conn.commit()
+        if not found:
+            return MemoryPlan(paragraphs, [None] * len(paragraphs), separators)
+        return MemoryPlan(paragraphs, matches, separators)
+
+    def add(self, source: str, translated: str) -> int:
+        """
+        把一段原文与译文按段落对齐后写入记忆；段落数不一致（模型合并或拆分了段落）时不写入，
+        数字、不翻译片段或长度比例对不上的段落对（可能错位）单独跳过。
+
+        Returns:
+            写入的段落对数
+        """
+        sources = split_paragraphs(source)
+        translations = split_paragraphs(translated)
+        if not sources or len(sources) != len(translations):
+            return 0
+        pairs = [
+            (s, t) for s, t in zip(sources, translations)
+            if t != s and needs_translation(s, min_words=1) and _aligned(s, t)
+        ]
+        if not pairs:
+            return 0
+        now = time.time()
+        added = 0
+        with self._lock:
+            for s, t in pairs:
+                cur = self._conn.execute(
+                    "INSERT OR IGNORE INTO segments (namespace, key, source, translation, created_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (self.namespace, self._key(s), s, t, now, now)
+                )
+                if not cur.rowcount:
+                    continue
+                added += 1
+                self._conn.executemany(
+                    "INSERT INTO segment_bands (band, bucket, segment_id) VALUES (?, ?, ?)",
+                    [(band, bucket, cur.lastrowid) for band, bucket in _band_keys(minhash(_shingles(s)))]
+                )
+            self._conn.commit()
+            self._adds_since_evict += added
+            should_evict = self._adds_since_evict >= self.EVICT_EVERY
+        if should_evict:
+            self.evict()
+        return added
+
+    def evict(self) -> int:
+        """
+        按最久未命中的顺序淘汰超出 max_entries 的段落对及其索引。
+
+        Returns:
+            被删除的段落对数
+        """
+        with self._lock:
+            self._adds_since_evict = 0
+            if self.max_entries is None:
+                return 0
+            count = self._conn.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+            overflow = count - self.max_entries
+            if overflow <= 0:
+                return 0
+            self._conn.execute(
+                "DELETE FROM segments WHERE id IN (SELECT id FROM segments ORDER BY accessed_at ASC LIMIT ?)",
+                (overflow,)
+            )
+            self._conn.execute("DELETE FROM segment_bands WHERE segment_id NOT IN (SELECT id FROM segments)")
+            self._conn.commit()
+            return overflow
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,29 @@
+"""
+测试共用的 fixture
+"""
+from types import SimpleNamespace
+
+import pytest
+
+
+@pytest.fixture
+def make_response():
+    """
+    构造假的 chat completion 响应的工厂：make_response(content, prompt_tokens, completion_tokens, ...)。
+
+    只包含代码实际读取的字段：choices[0].message.content、choices[0].finish_reason 与 usage；
+    with_usage=False 时 usage 为 None（部分兼容接口不返回用量）。
+    """
+    def make(content: str = "", prompt_tokens: int = 10, completion_tokens: int = 10,
+             finish_reason: str = "stop", with_usage: bool = True):
+        usage = SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens,
+        ) if with_usage else None
+        return SimpleNamespace(
+            usage=usage,
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content), finish_reason=finish_reason)],
+        )
+
+    return make
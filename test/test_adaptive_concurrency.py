@@ -0,0 +1,66 @@
+"""
+测试 AIMD 自适应并发控制器
+"""
+import threading
+import time
+from service.adaptive_concurrency import AdaptiveConcurrencyController, is_overload_error
+
+
+class FakeStatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+def test_is_overload_error():
+    """限流与超时属于过载，普通错误不属于"""
+    assert is_overload_error(FakeStatusError(429))
+    assert is_overload_error(FakeStatusError(503))
+    assert is_overload_error(TimeoutError())
+    assert not is_overload_error(FakeStatusError(400))
+    assert not is_overload_error(ValueError("bad"))
+
+
+def test_grows_on_success_and_respects_max():
+    """成功请求使上限增长，但不超过 max_limit"""
+    controller = AdaptiveConcurrencyController(min_limit=1, max_limit=4)
+    for _ in range(10):
+        with controller.slot():
+            pass
+    assert controller.limit == 4
+
+
+def test_backs_off_on_rate_limit_and_respects_min():
+    """限流时乘性减小，且不低于 min_limit"""
+    controller = AdaptiveConcurrencyController(min_limit=2, max_limit=16, initial_limit=16)
+    try:
+        with controller.slot():
+            raise FakeStatusError(429)
+    except FakeStatusError:
+        pass
+    assert controller.limit == 8
+
+    for _ in range(5):
+        started_at = controller.acquire()
+        controller.release(started_at, error=FakeStatusError(429))
+    assert controller.limit == 2
+    assert "最小 2" in controller.summary()
+
+
+def test_acquire_blocks_above_limit():
+    """在途请求数达到上限时，新请求需等待"""
+    controller = AdaptiveConcurrencyController(min_limit=1, max_limit=1)
+    started_at = controller.acquire()
+    acquired = threading.Event()
+
+    def worker():
+        controller.release(controller.acquire())
+        acquired.set()
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    time.sleep(0.05)
+    assert not acquired.is_set()
+    controller.release(started_at)
+    thread.join(timeout=1)
+    assert acquired.is_set()
@@ -0,0 +1,76 @@
+"""
+测试 asyncio 并发翻译引擎
+"""
+import asyncio
+
+import concurrent_translate
+
+
+def test_results_keep_document_order_and_concurrency_is_bounded(monkeypatch, make_response):
+    """完成顺序被打乱时结果仍按原文顺序返回，同时在途的请求数不超过 max_concurrency"""
+    monkeypatch.setattr(concurrent_translate, "count_tokens_batch", lambda texts: [len(t.split()) for t in texts])
+    in_flight = [0]
+    peak = [0]
+
+    async def translate(text):
+        in_flight[0] += 1
+        peak[0] = max(peak[0], in_flight[0])
+        # 越靠前的块越慢，完成顺序与原文顺序相反
+        await asyncio.sleep(0.001 * (20 - int(text.split()[1])))
+        in_flight[0] -= 1
+        return make_response(text.upper())
+
+    monkeypatch.setattr(concurrent_translate, "translate_text_async", translate)
+    chunks = [f"chunk {i}" for i in range(20)]
+    translated, errors = asyncio.run(concurrent_translate.translate_chunks_concurrent_async(
+        chunks, max_concurrency=4, schedule="document"
+    ))
+    assert not errors
+    assert translated == [chunk.upper() for chunk in chunks]
+    assert peak[0] == 4
+
+
+def test_failed_chunk_keeps_original_text_in_place(monkeypatch, make_response):
+    """重试耗尽的块在原位置保留原文并附带错误注释，其余块正常返回"""
+    monkeypatch.setattr(concurrent_translate, "count_tokens_batch", lambda texts: [len(t.split()) for t in texts])
+
+    async def translate(text):
+        if text == "chunk 1":
+            raise RuntimeError("502")
+        return make_response(text.upper())
+
+    monkeypatch.setattr(concurrent_translate, "translate_text_async", translate)
+    chunk_retry = concurrent_translate.translate_chunk_with_retry_async
+
+    async def no_delay(*args, **kwargs):
+        return await chunk_retry(*args, initial_delay=0, **kwargs)
+
+    monkeypatch.setattr(concurrent_translate, "translate_chunk_with_retry_async", no_delay)
+    translated, errors = asyncio.run(concurrent_translate.translate_chunks_concurrent_async(
+        ["chunk 0", "chunk 1", "chunk 2"], max_concurrency=2, max_retries=2
+    ))
+    assert len(errors) == 1 and "502" in errors[0]
+    assert translated[0] == "CHUNK 0" and translated[2] == "CHUNK 2"
+    assert "翻译失败" in translated[1] and translated[1].rstrip().endswith("chunk 1")
+
+
+def test_lpt_with_writer_keeps_reorder_buffer_bounded(tmp_path, monkeypatch, make_response):
+    """传入有序写入器时 LPT 只在有界窗口内调度，末尾的大块不会让开头的小块积压在重排缓冲里"""
+    sizes = [1] * 40 + [50]
+    monkeypatch.setattr(concurrent_translate, "count_tokens_batch", lambda texts: [len(t.split()) for t in texts])
+
+    async def translate(text):
+        await asyncio.sleep(0)
+        return make_response(text.upper())
+
+    monkeypatch.setattr(concurrent_translate, "translate_text_async", translate)
+    chunks = ["w " * size for size in sizes]
+    writer = concurrent_translate.OrderedChunkWriter(str(tmp_path / "paper.md"))
+    translated, errors = asyncio.run(concurrent_translate.translate_chunks_concurrent_async(
+        chunks, max_concurrency=2, schedule="lpt", writer=writer
+    ))
+    writer.close(errors)
+    assert not errors and translated == []
+    with open(tmp_path / "paper.md", encoding="utf-8") as f:
+        assert f.read() == "\n\n".join(chunk.upper() for chunk in chunks)
+    assert writer.max_pending <= concurrent_translate.LPT_WINDOW_PER_WORKER * 2
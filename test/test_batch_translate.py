@@ -0,0 +1,48 @@
+"""
+测试 OCR 与翻译流水线的批量翻译
+"""
+import os
+
+import batch_translate
+
+
+def test_pipeline_continues_after_ocr_and_translation_failures(tmp_path, monkeypatch):
+    """某篇论文 OCR 失败、翻译失败或翻译抛出异常时，其余论文照常完成"""
+    monkeypatch.delenv("LLM_PROVIDERS", raising=False)
+    monkeypatch.delenv("LLM_PROVIDERS_FILE", raising=False)
+    names = ["a", "ocr_error", "ocr_empty", "translate_false", "translate_raise", "b"]
+    for name in names:
+        open(os.path.join(tmp_path, f"{name}.pdf"), 'wb').close()
+
+    def fake_ocr(filepath, output_dir, **kwargs):
+        name = os.path.splitext(os.path.basename(filepath))[0]
+        if name == "ocr_error":
+            raise RuntimeError("MinerU 500")
+        if name == "ocr_empty":
+            return ""
+        return os.path.join(output_dir, name, f"{name}.md")
+
+    translated = []
+
+    def fake_translate(input_md_path, **kwargs):
+        name = os.path.splitext(os.path.basename(input_md_path))[0]
+        if name == "translate_raise":
+            raise RuntimeError("disk full")
+        translated.append(name)
+        return name != "translate_false"
+
+    monkeypatch.setattr(batch_translate, "request_mineru_translate", fake_ocr)
+    monkeypatch.setattr(batch_translate, "translate_paper", fake_translate)
+    results = batch_translate.batch_translate(
+        str(tmp_path), output_dir=str(tmp_path / "out"), paper_workers=1, llm_workers=2, queue_size=1
+    )
+    status = {os.path.splitext(os.path.basename(r["file"]))[0]: r["status"] for r in results}
+    assert status == {
+        "a": "done",
+        "b": "done",
+        "ocr_empty": "ocr_failed",
+        "ocr_error": "ocr_failed",
+        "translate_false": "translate_failed",
+        "translate_raise": "translate_failed",
+    }
+    assert sorted(translated) == ["a", "b", "translate_false"]
@@ -0,0 +1,58 @@
+"""
+测试检查点日志与断点续译
+"""
+import os
+
+import concurrent_translate
+from service.checkpoint import CheckpointJournal
+
+
+def test_journal_restores_only_matching_chunks(tmp_path):
+    """只恢复输入哈希和块哈希都一致的记录，并容忍被截断的最后一行"""
+    path = os.path.join(tmp_path, "paper.journal.jsonl")
+    journal = CheckpointJournal(path, "hash-a")
+    journal.record(0, "chunk 0", "块 0")
+    journal.record(1, "chunk 1", "块 1")
+    journal.close()
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"input_hash": "hash-a", "index": 2, "chunk')
+
+    reopened = CheckpointJournal(path, "hash-a")
+    assert reopened.completed_chunks(["chunk 0", "chunk 1 (changed)", "chunk 2"]) == {0: "块 0"}
+    reopened.close()
+
+    other_input = CheckpointJournal(path, "hash-b")
+    assert other_input.completed_chunks(["chunk 0", "chunk 1"]) == {}
+    other_input.close(remove=True)
+    assert not os.path.exists(path)
+
+
+def test_resume_only_translates_missing_chunks(tmp_path, monkeypatch, make_response):
+    """第一次运行中途失败，第二次运行只翻译缺失的块"""
+    # 用单词数近似 token 数，避免测试依赖 tiktoken 的词表下载
+    monkeypatch.setattr(concurrent_translate, "count_tokens_batch", lambda texts: [len(t.split()) for t in texts])
+    chunks = [f"chunk {i}" for i in range(5)]
+    path = os.path.join(tmp_path, "paper.journal.jsonl")
+    calls = []
+
+    def flaky_translate(text):
+        calls.append(text)
+        if text == "chunk 3":
+            raise RuntimeError("connection reset")
+        return make_response(text.upper())
+
+    monkeypatch.setattr(concurrent_translate, "translate_text", flaky_translate)
+    journal = CheckpointJournal(path, "hash")
+    _, errors = concurrent_translate.translate_chunks_concurrent(chunks, max_retries=1, journal=journal)
+    journal.close()
+    assert len(errors) == 1
+
+    calls.clear()
+    monkeypatch.setattr(concurrent_translate, "translate_text", lambda text: calls.append(text) or make_response(text.upper()))
+    journal = CheckpointJournal(path, "hash")
+    translated, errors = concurrent_translate.translate_chunks_concurrent(chunks, journal=journal)
+    journal.close()
+
+    assert calls == ["chunk 3"]
+    assert errors == []
+    assert translated == [c.upper() for c in chunks]
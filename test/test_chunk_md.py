@@ -0,0 +1,112 @@
+"""
+测试 Markdown 分块与合并
+"""
+import chunk_md
+
+
+def _word_tokens(texts, model="gpt-3.5-turbo"):
+    """用单词数近似 token 数，避免测试依赖 tiktoken 的词表下载"""
+    return [len(text.split()) for text in texts]
+
+
+def test_greedy_merge_respects_budget(monkeypatch):
+    """合并结果不超过 max_tokens，且保持原有顺序与内容"""
+    monkeypatch.setattr(chunk_md, "count_tokens_batch", _word_tokens)
+    chunks = ["a b c\n", "d e\n", "f g h i\n", "j\n", "k l m n o p\n"]
+
+    merged = chunk_md.greedy_merge_chunks(chunks, max_tokens=7)
+
+    assert "".join(merged) == "".join(chunks)
+    assert merged == ["a b c\nd e\n", "f g h i\nj\n", "k l m n o p\n"]
+    for block in merged:
+        assert len(block.split()) <= 7
+
+
+def test_greedy_merge_keeps_oversized_chunk_alone(monkeypatch):
+    """单个超限的块单独成块，前后的块不与它合并"""
+    monkeypatch.setattr(chunk_md, "count_tokens_batch", _word_tokens)
+    chunks = ["a\n", "b c d e f g h i j k\n", "l\n"]
+
+    assert chunk_md.greedy_merge_chunks(chunks, max_tokens=5) == chunks
+
+
+def test_split_oversized_chunk_keeps_structures_intact(monkeypatch):
+    """超限的小节被拆开，但公式、代码块和表格不会被切断，拼接后与原文一致"""
+    monkeypatch.setattr(chunk_md, "count_tokens_batch", _word_tokens)
+    formula = "$$\nL = a + b + c + d\n$$\n"
+    code = "```python\nfor i in range(10):\n    print(i)\n```\n"
+    table = "| a | b |\n| - | - |\n| 1 | 2 |\n"
+    prose = "First sentence here. Second one follows e.g. this. Third with $x. y$ math.\n"
+    chunk = "## 3.1 Method\n" + prose + formula + code + table + "Closing words.\n"
+
+    pieces = chunk_md.split_oversized_chunk(chunk, max_tokens=8)
+
+    assert "".join(pieces) == chunk
+    assert all(len(p.split()) <= 8 for p in pieces if p not in (formula, code, table))
+    for structure in (formula, code, table):
+        assert any(structure in p for p in pieces)
+
+
+def test_split_sentences_respects_math_and_abbreviations():
+    """不在行内公式或缩写处断句"""
+    paragraph = "We follow Smith et al. in this. The value $a. b$ is small! Done.\n"
+    assert chunk_md._split_sentences(paragraph) == [
+        "We follow Smith et al. in this. ",
+        "The value $a. b$ is small! ",
+        "Done.\n",
+    ]
+
+
+def test_greedy_merge_splits_oversized_section(monkeypatch):
+    """greedy_merge_chunks 不再整体输出超限的小节"""
+    monkeypatch.setattr(chunk_md, "count_tokens_batch", _word_tokens)
+    big = "".join(f"Sentence number {i} is here.\n" for i in range(10))
+    merged = chunk_md.greedy_merge_chunks(["# 1 Intro\n", big], max_tokens=12)
+
+    assert "".join(merged) == "# 1 Intro\n" + big
+    assert all(len(block.split()) <= 12 for block in merged)
+
+
+def test_iter_chunks_matches_chunk_md(tmp_path, monkeypatch):
+    """流式分块与 chunk_md 的结果完全一致（含 CRLF 换行、首行非标题与参考文献截断）"""
+    monkeypatch.setattr(chunk_md, "count_tokens_batch", _word_tokens)
+    text = (
+        "Preface line before any heading.\r\n\r\n"
+        "# Title\r\n# Abstract\r\nshort abstract words here\r\n"
+        "# 1 Introduction\r\n" + "intro words go here. " * 6 + "\r\n"
+        "# 1.1 Background\r\nmore background words\r\n\r\n"
+        "$$\r\nx = y + z\r\n$$\r\n"
+        "# 2 Method\r\n" + "method sentence one. " * 10 + "\r\n"
+        "# References\r\n[1] A. Author. Something.\r\n"
+    )
+    path = tmp_path / "paper.md"
+    path.write_bytes(text.encode("utf-8"))
+
+    for max_tokens in (5, 12, 40, 2048):
+        assert list(chunk_md.iter_chunks(str(path), max_tokens)) == chunk_md.chunk_md(str(path), max_tokens)
+
+    empty = tmp_path / "empty.md"
+    empty.write_bytes(b"")
+    assert list(chunk_md.iter_chunks(str(empty))) == []
+
+
+def test_approximate_greedy_merge_matches_exact(monkeypatch):
+    """近似计数只在接近上限时精确分词，估计误差在范围内时结果与精确计数相同"""
+    counted = []
+
+    def counting_tokens(texts, model="gpt-3.5-turbo"):
+        counted.extend(texts)
+        return _word_tokens(texts)
+
+    monkeypatch.setattr(chunk_md, "count_tokens_batch", counting_tokens)
+    # 估计值比真实值偏大 10%，在 estimate_bounds 的误差范围之内
+    monkeypatch.setattr(chunk_md, "estimate_tokens", lambda text: round(len(text.split()) * 1.1))
+    chunks = [f"# {i} Section\n" + "word " * (20 + (i * 37) % 90) + "\n" for i in range(60)]
+    chunks.append("tail " * 700 + "\n")
+
+    exact = chunk_md.greedy_merge_chunks(chunks, max_tokens=400)
+    counted.clear()
+    approx = chunk_md.greedy_merge_chunks(chunks, max_tokens=400, approximate=True)
+
+    assert approx == exact
+    assert 0 < len(counted) < len(chunks)
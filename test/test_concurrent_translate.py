@@ -0,0 +1,60 @@
+"""
+测试线程池并发翻译引擎的流式输入
+"""
+import threading
+import time
+
+import concurrent_translate
+
+
+def test_streaming_input_overlaps_chunking_and_translation(monkeypatch, make_response):
+    """传入生成器时，第一个块在生成器产出后续块之前就开始翻译，结果仍按原顺序返回"""
+    first_started = threading.Event()
+
+    def translate(text):
+        if text == "chunk 0":
+            first_started.set()
+        return make_response(text.upper())
+
+    def chunk_stream():
+        yield "chunk 0"
+        # 第一个块必须已经在翻译中，生成器才继续产出
+        assert first_started.wait(timeout=5)
+        for i in range(1, 4):
+            yield f"chunk {i}"
+
+    monkeypatch.setattr(concurrent_translate, "translate_text", translate)
+    translated, errors = concurrent_translate.translate_chunks_concurrent(chunk_stream(), max_workers=2)
+
+    assert not errors
+    assert translated == [f"CHUNK {i}" for i in range(4)]
+
+
+def test_streaming_input_is_throttled_by_pending_chunks(monkeypatch, make_response):
+    """翻译跟不上时，生成器最多领先 MAX_PENDING_PER_WORKER × max_workers 个块"""
+    release = threading.Event()
+    produced = [0]
+
+    def translate(text):
+        assert release.wait(timeout=5)
+        return make_response(text.upper())
+
+    def chunk_stream():
+        for i in range(20):
+            produced[0] += 1
+            yield f"chunk {i}"
+
+    monkeypatch.setattr(concurrent_translate, "translate_text", translate)
+    result = {}
+    worker = threading.Thread(target=lambda: result.update(out=concurrent_translate.translate_chunks_concurrent(
+        chunk_stream(), max_workers=2
+    )))
+    worker.start()
+    time.sleep(0.2)
+    assert produced[0] == concurrent_translate.MAX_PENDING_PER_WORKER * 2
+    release.set()
+    worker.join(timeout=5)
+
+    translated, errors = result["out"]
+    assert not errors
+    assert translated == [f"CHUNK {i}" for i in range(20)]
@@ -0,0 +1,61 @@
+"""
+测试 token 估计与批量分词
+"""
+from service import count_token
+from service.count_token import estimate_bounds, estimate_tokens
+
+
+class _FakeEncoding:
+    """按单词计数的编码器，记录调用的是逐个编码还是批量编码"""
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, text):
+        # 与 tiktoken 一致：默认不允许特殊 token 文本
+        if "<|endoftext|>" in text:
+            raise ValueError("Encountered text corresponding to disallowed special token")
+        return text.split()
+
+    def encode_ordinary(self, text):
+        self.calls.append("single")
+        return text.split()
+
+    def encode_ordinary_batch(self, texts, num_threads=8):
+        self.calls.append(("batch", num_threads))
+        return [text.split() for text in texts]
+
+
+def test_estimate_tokens_by_character_class():
+    """中文按字、符号与数字按较小的比例计数，英文按约 4 个字符一个 token"""
+    assert estimate_tokens("") == 0
+    english = "the model improves translation quality " * 10
+    assert len(english) / 5 < estimate_tokens(english) < len(english) / 3
+    assert estimate_tokens("这是一个测试句子") >= 8
+    latex = r"\frac{a_{1}}{\sqrt{d_k}}" * 10
+    assert estimate_tokens(latex) > estimate_tokens("x" * len(latex))
+
+    low, high = estimate_bounds(100)
+    assert low < 100 < high
+
+
+def test_count_tokens_batch_uses_threads_for_large_inputs(monkeypatch):
+    """总长度超过 PARALLEL_MIN_CHARS 时使用多线程批量编码，否则逐个编码"""
+    encoding = _FakeEncoding()
+    monkeypatch.setattr(count_token, "_get_encoding", lambda model="gpt-3.5-turbo": encoding)
+    monkeypatch.setattr(count_token, "PARALLEL_MIN_CHARS", 20)
+
+    assert count_token.count_tokens_batch(["a b", "c"]) == [2, 1]
+    assert encoding.calls == ["single", "single"]
+
+    encoding.calls.clear()
+    texts = ["one two three four", "five six seven eight nine"]
+    assert count_token.count_tokens_batch(texts, num_threads=4) == [4, 5]
+    assert encoding.calls == [("batch", 4)]
+
+
+def test_count_tokens_accepts_special_token_text(monkeypatch):
+    """论文中出现的 "<|endoftext|>" 等特殊 token 文本按普通文本计数，不抛出异常"""
+    encoding = _FakeEncoding()
+    monkeypatch.setattr(count_token, "_get_encoding", lambda model="gpt-3.5-turbo": encoding)
+    assert count_token.count_tokens("the <|endoftext|> token") == 3
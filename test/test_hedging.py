@@ -0,0 +1,112 @@
+"""
+测试对冲请求策略
+"""
+import threading
+import time
+
+import pytest
+
+from service.hedging import HedgePolicy
+
+
+def _warm(policy, latency=0.01):
+    for _ in range(policy.min_samples):
+        policy.observe(latency)
+
+
+def test_no_hedge_before_enough_samples(make_response):
+    policy = HedgePolicy(percentile=90, max_ratio=1.0, min_samples=3, min_delay=0.01)
+    try:
+        assert policy.delay() is None
+        result, hedged, won = policy.call(lambda: make_response("only"))
+        assert (result.choices[0].message.content, hedged, won) == ("only", False, False)
+    finally:
+        policy.close()
+
+
+def test_straggler_is_hedged_and_loser_tokens_are_charged(make_response):
+    """原请求超过分位数仍未完成时发出对冲请求，先完成的对冲请求胜出，落败请求的 token 计入额外消耗"""
+    policy = HedgePolicy(percentile=90, max_ratio=1.0, min_samples=3, min_delay=0.01)
+    _warm(policy)
+    release = threading.Event()
+    calls = []
+
+    def request():
+        calls.append(1)
+        if len(calls) == 1:
+            release.wait(5)
+            return make_response("slow", prompt_tokens=30, completion_tokens=0)
+        return make_response("hedge")
+
+    settled = []
+    try:
+        result, hedged, won = policy.call(request, on_loser=settled.append)
+        assert (result.choices[0].message.content, hedged, won) == ("hedge", True, True)
+
+        release.set()
+        deadline = time.monotonic() + 5
+        while policy.summary()["extra_tokens"] == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert policy.summary() == {"percentile": 90, "requests": 1, "hedges": 1, "wins": 1, "extra_tokens": 30}
+        # 落败请求的响应交给调用方按实际用量结算限流预算
+        assert [response.choices[0].message.content for response in settled] == ["slow"]
+    finally:
+        release.set()
+        policy.close()
+
+
+def test_failed_loser_is_charged_estimated_tokens(make_response):
+    """落败请求失败时按估计 token 数计入额外消耗，且不触发结算回调"""
+    policy = HedgePolicy(percentile=90, max_ratio=1.0, min_samples=3, min_delay=0.01)
+    _warm(policy)
+    release = threading.Event()
+    calls = []
+
+    def request():
+        calls.append(1)
+        if len(calls) == 1:
+            release.wait(5)
+            raise RuntimeError("connection reset")
+        return make_response("hedge")
+
+    settled = []
+    try:
+        result, _, won = policy.call(request, on_loser=settled.append, estimated_tokens=25)
+        assert won
+        release.set()
+        deadline = time.monotonic() + 5
+        while policy.summary()["extra_tokens"] == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert policy.summary()["extra_tokens"] == 25
+        assert settled == []
+    finally:
+        release.set()
+        policy.close()
+
+
+def test_hedge_budget_is_capped(make_response):
+    """对冲请求数不超过已发出请求数的 max_ratio"""
+    policy = HedgePolicy(percentile=50, max_ratio=0.0, min_samples=1, min_delay=0.01)
+    _warm(policy)
+    try:
+        result, hedged, _ = policy.call(lambda: (time.sleep(0.05), make_response("slow"))[1])
+        assert result.choices[0].message.content == "slow" and not hedged
+        assert policy.summary()["hedges"] == 0
+    finally:
+        policy.close()
+
+
+def test_raises_when_both_requests_fail():
+    policy = HedgePolicy(percentile=50, max_ratio=1.0, min_samples=1, min_delay=0.01)
+    _warm(policy)
+
+    def failing():
+        time.sleep(0.05)
+        raise RuntimeError("boom")
+
+    try:
+        with pytest.raises(RuntimeError):
+            policy.call(failing)
+        assert policy.summary()["hedges"] == 1
+    finally:
+        policy.close()
@@ -0,0 +1,77 @@
+"""
+测试共享 OpenAI 客户端的复用与重新配置
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from service import llm_client
+
+
+@pytest.fixture(autouse=True)
+def fresh_client(monkeypatch):
+    """每个测试使用独立的客户端配置，结束后恢复"""
+    monkeypatch.setenv("DEEPSEEK_API_KEY", "sk-test")
+    monkeypatch.setenv("DEEPSEEK_API_URL", "http://127.0.0.1:1/v1")
+    monkeypatch.setattr(llm_client, "_config", dict(llm_client._config))
+    monkeypatch.setattr(llm_client, "_client", None)
+    yield
+    llm_client.close_client()
+
+
+def test_client_is_shared_across_threads():
+    """所有工作线程拿到同一个客户端（同一个连接池）"""
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        clients = list(pool.map(lambda _: llm_client.get_client(), range(32)))
+    assert all(client is clients[0] for client in clients)
+
+
+def test_sdk_retries_are_disabled():
+    """SDK 不自行重试 429/5xx，错误交给翻译重试循环与自适应并发控制器处理"""
+    assert llm_client.get_client().max_retries == 0
+    assert llm_client.new_client("sk-test", "http://127.0.0.1:1/v1").max_retries == 0
+
+    async def async_retries():
+        client = llm_client.get_async_client()
+        await llm_client.close_async_client()
+        return client.max_retries
+
+    assert asyncio.run(async_retries()) == 0
+
+
+def test_configure_client_rebuilds_with_new_settings():
+    """configure_client 之后按新配置重建客户端，未调用前一直复用"""
+    first = llm_client.get_client()
+    assert llm_client.get_client() is first
+
+    llm_client.configure_client(max_connections=7, timeout=12.0, connect_timeout=3.0)
+    second = llm_client.get_client()
+    assert second is not first
+    assert second.timeout.read == 12.0 and second.timeout.connect == 3.0
+    assert llm_client._config["max_connections"] == 7
+
+
+def test_ensure_pool_size_only_grows():
+    """连接池已足够大时不重建客户端，不足时才按新大小重建"""
+    llm_client.configure_client(max_connections=10)
+    client = llm_client.get_client()
+    llm_client.ensure_pool_size(4)
+    assert llm_client.get_client() is client
+
+    llm_client.ensure_pool_size(32)
+    assert llm_client._config["max_connections"] == 32
+    assert llm_client.get_client() is not client
+
+
+def test_async_client_is_per_event_loop():
+    """同一事件循环内复用异步客户端，不同事件循环各自创建"""
+    async def twice():
+        first, second = llm_client.get_async_client(), llm_client.get_async_client()
+        await llm_client.close_async_client()
+        return first, second
+
+    a1, a2 = asyncio.run(twice())
+    b1, _ = asyncio.run(twice())
+    assert a1 is a2
+    assert b1 is not a1
@@ -0,0 +1,96 @@
+"""
+测试 MinerU 结果压缩包的选择性解压与分片 OCR
+"""
+import io
+import os
+import zipfile
+import mineru_ocr
+from mineru_ocr import extract_zip, plan_page_shards, read_markdown_from_zip, request_mineru_sharded
+
+
+def _make_zip(path):
+    markdown = "# 1 Intro\n![](images/a.jpg)\n<img src=\"images/b.png\">\n![remote](https://x.org/c.png)\n"
+    with zipfile.ZipFile(path, 'w') as zf:
+        zf.writestr("paper/paper.md", markdown)
+        zf.writestr("paper/images/a.jpg", b"a" * 10)
+        zf.writestr("paper/images/b.png", b"b" * 10)
+        zf.writestr("paper/images/unused.jpg", b"u" * 10)
+        zf.writestr("paper/paper_middle.json", "{}")
+    return markdown
+
+
+def test_extract_only_markdown_and_referenced_images(tmp_path):
+    """markdown_only 只解压 Markdown 与被引用的图片"""
+    zip_path = os.path.join(tmp_path, "paper.zip")
+    _make_zip(zip_path)
+
+    md_path = extract_zip(zip_path, markdown_only=True, delete_zip=True)
+
+    assert md_path == os.path.join(tmp_path, "paper", "paper.md")
+    assert sorted(os.listdir(os.path.join(tmp_path, "paper"))) == ["images", "paper.md"]
+    assert sorted(os.listdir(os.path.join(tmp_path, "paper", "images"))) == ["a.jpg", "b.png"]
+    assert not os.path.exists(zip_path)
+
+
+def test_extract_all_and_read_without_extracting(tmp_path):
+    """默认解压全部文件；也可以不解压直接读取 Markdown"""
+    zip_path = os.path.join(tmp_path, "paper.zip")
+    markdown = _make_zip(zip_path)
+
+    assert read_markdown_from_zip(zip_path) == ("paper/paper.md", markdown)
+
+    extract_zip(zip_path)
+    assert os.path.exists(os.path.join(tmp_path, "paper", "paper_middle.json"))
+    assert os.path.exists(os.path.join(tmp_path, "paper", "images", "unused.jpg"))
+
+
+def test_plan_page_shards():
+    assert plan_page_shards(25, 10) == [(0, 9), (10, 19), (20, 24)]
+    assert plan_page_shards(0, 10) == []
+
+
+def test_page_scan_streams_blocks_without_missing_boundary_matches():
+    """按块扫描的页数与整体正则一致：跨块边界的 /Type /Page 不漏数，/Pages 不误数"""
+    data = b"".join(
+        b"%d 0 obj << /Type /Page /Parent 1 0 R >> endobj\n" % i if i % 5 else b"<< /Type/Pages /Count 4 >>\n"
+        for i in range(40)
+    )
+    expected = len(mineru_ocr._PDF_PAGE_PATTERN.findall(data))
+    assert expected == 32
+    for block_size in (1, 7, 13, 64, 1 << 20):
+        assert mineru_ocr._scan_page_objects(io.BytesIO(data), block_size=block_size) == expected
+
+
+def test_sharded_ocr_stitches_markdown_and_images(tmp_path, monkeypatch):
+    """分片结果按页序拼接，图片合并到同一目录；同名同内容的图片复用，同名不同内容的图片被重命名"""
+    pdf_path = os.path.join(tmp_path, "paper.pdf")
+    with open(pdf_path, 'wb') as f:
+        f.write(b"%PDF-1.4\n" + b"<< /Type /Page >>\n" * 5 + b"<< /Type /Pages >>\n")
+    monkeypatch.setattr(mineru_ocr, "count_pdf_pages", lambda path: 5)
+
+    used_urls = []
+
+    def fake_download(filepath, url, data, zip_path):
+        used_urls.append(url)
+        start = data["start_page_id"]
+        os.makedirs(os.path.dirname(zip_path), exist_ok=True)
+        with zipfile.ZipFile(zip_path, 'w') as zf:
+            zf.writestr("paper/auto/paper.md", f"page {start}\n![](images/fig.jpg)\n")
+            # 大小相同：第 0 页与第 4 页内容一致，第 2 页内容不同
+            zf.writestr("paper/auto/images/fig.jpg", b"y" * 4 if start == "2" else b"x" * 4)
+        return True
+
+    monkeypatch.setattr(mineru_ocr, "_download_mineru_zip", fake_download)
+    output_dir = os.path.join(tmp_path, "out")
+    md_path = request_mineru_sharded(pdf_path, urls=["u1", "u2"], output_dir=output_dir, pages_per_shard=2)
+
+    assert md_path == os.path.join(output_dir, "paper", "paper.md")
+    with open(md_path, encoding='utf-8') as f:
+        assert f.read() == (
+            "page 0\n![](images/fig.jpg)\n\n"
+            "page 2\n![](images/p2_fig.jpg)\n\n"
+            "page 4\n![](images/fig.jpg)\n"
+        )
+    assert sorted(os.listdir(os.path.join(output_dir, "paper", "images"))) == ["fig.jpg", "p2_fig.jpg"]
+    assert sorted(used_urls) == ["u1", "u1", "u2"]
+    assert sorted(os.listdir(output_dir)) == [".ocr_cache.json", "paper"]
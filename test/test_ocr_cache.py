@@ -0,0 +1,127 @@
+"""
+测试 OCR 结果缓存
+"""
+import os
+import zipfile
+import mineru_ocr
+from mineru_ocr import request_mineru_translate
+from service.ocr_cache import OcrCache
+
+
+def _write_result(output_dir, name, size=10):
+    result_dir = os.path.join(output_dir, name)
+    os.makedirs(result_dir, exist_ok=True)
+    md_path = os.path.join(result_dir, name + ".md")
+    with open(md_path, 'w', encoding='utf-8') as f:
+        f.write("x" * size)
+    return md_path
+
+
+def test_cache_key_depends_on_params():
+    """OCR 参数变化时缓存键必须不同"""
+    base = OcrCache.make_key("hash", {"lang_list": "en", "backend": "pipeline"})
+    assert base == OcrCache.make_key("hash", {"backend": "pipeline", "lang_list": "en"})
+    assert base != OcrCache.make_key("hash", {"lang_list": "ch", "backend": "pipeline"})
+    assert base != OcrCache.make_key("other", {"lang_list": "en", "backend": "pipeline"})
+
+
+def test_cache_roundtrip_and_missing_result(tmp_path):
+    """重新打开后仍能命中；结果文件被删除后视为未命中"""
+    md_path = _write_result(tmp_path, "paper")
+    OcrCache(tmp_path).put("k", md_path)
+
+    cache = OcrCache(tmp_path)
+    assert cache.get("k") == md_path
+    os.remove(md_path)
+    assert cache.get("k") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert len(cache) == 0
+
+
+def test_eviction_removes_least_recently_used_result(tmp_path):
+    """超过条目上限时删除最久未使用的结果目录"""
+    cache = OcrCache(tmp_path, max_entries=2)
+    cache.put("a", _write_result(tmp_path, "a"))
+    cache.put("b", _write_result(tmp_path, "b"))
+    cache.get("a")
+    cache.put("c", _write_result(tmp_path, "c"))
+
+    assert cache.get("b") is None
+    assert not os.path.exists(os.path.join(tmp_path, "b"))
+    assert cache.get("a") and cache.get("c")
+
+
+def test_eviction_keeps_translations_and_results_owned_by_other_keys(tmp_path):
+    """淘汰只删除该次 OCR 创建的文件；结果已被其他缓存键覆盖时不删除任何文件"""
+    cache = OcrCache(tmp_path, max_entries=1)
+    md_path = _write_result(tmp_path, "paper")
+    image = os.path.join(tmp_path, "paper", "images", "fig.jpg")
+    os.makedirs(os.path.dirname(image))
+    open(image, 'wb').close()
+    cache.put("a", md_path, files=[md_path, image])
+    translated = os.path.join(tmp_path, "paper", "paper_translated.md")
+    open(translated, 'w').close()
+
+    cache.put("b", _write_result(tmp_path, "other"))
+    assert not os.path.exists(md_path) and not os.path.exists(os.path.join(tmp_path, "paper", "images"))
+    assert os.path.exists(translated)
+
+    # 同名结果被键 c 覆盖后，淘汰旧键 d 的条目不能删掉 c 的结果
+    cache = OcrCache(tmp_path, max_entries=2)
+    md_path = _write_result(tmp_path, "shared")
+    cache.put("d", md_path)
+    cache.put("c", md_path)
+    cache.put("e", _write_result(tmp_path, "e"))
+    assert cache.get("d") is None
+    assert cache.get("c") == md_path
+
+
+def test_overwritten_result_is_not_served_for_stale_key(tmp_path, monkeypatch):
+    """同名的另一个 PDF 覆盖了输出目录后，旧 PDF 的缓存键不再命中"""
+    calls = []
+
+    def fake_download(filepath, url, data, zip_path):
+        with open(filepath, 'rb') as f:
+            content = f.read().decode()
+        calls.append(content)
+        with zipfile.ZipFile(zip_path, 'w') as zf:
+            zf.writestr("paper/paper.md", f"# {content}\n")
+        return True
+
+    monkeypatch.setattr(mineru_ocr, "_download_mineru_zip", fake_download)
+    output_dir = os.path.join(tmp_path, "out")
+    paths = []
+    for folder, content in (("v1", "first"), ("v2", "second")):
+        os.makedirs(os.path.join(tmp_path, folder))
+        paths.append(os.path.join(tmp_path, folder, "paper.pdf"))
+        with open(paths[-1], 'w') as f:
+            f.write(content)
+        request_mineru_translate(paths[-1], output_dir=output_dir, delete_zip=True)
+
+    md_path = request_mineru_translate(paths[0], output_dir=output_dir, delete_zip=True)
+    assert calls == ["first", "second", "first"]
+    with open(md_path, encoding='utf-8') as f:
+        assert f.read() == "# first\n"
+
+
+def test_request_returns_cached_markdown_without_upload(tmp_path, monkeypatch):
+    """同一 PDF 第二次 OCR 直接命中缓存，不再调用 MinerU"""
+    pdf_path = os.path.join(tmp_path, "paper.pdf")
+    with open(pdf_path, 'wb') as f:
+        f.write(b"%PDF-1.4 fake")
+    calls = []
+
+    def fake_download(filepath, url, data, zip_path):
+        calls.append(data["lang_list"])
+        with zipfile.ZipFile(zip_path, 'w') as zf:
+            zf.writestr("paper/paper.md", "# Title\n")
+        return True
+
+    monkeypatch.setattr(mineru_ocr, "_download_mineru_zip", fake_download)
+    output_dir = os.path.join(tmp_path, "out")
+    first = request_mineru_translate(pdf_path, output_dir=output_dir, delete_zip=True)
+    second = request_mineru_translate(pdf_path, output_dir=output_dir, delete_zip=True)
+    request_mineru_translate(pdf_path, output_dir=output_dir, lang="ch", delete_zip=True)
+
+    assert first == second == os.path.join(output_dir, "paper", "paper.md")
+    assert calls == ["en", "ch"]
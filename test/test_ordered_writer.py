@@ -0,0 +1,49 @@
+"""
+测试有序流式写入器
+"""
+import os
+from service.ordered_writer import OrderedChunkWriter
+
+
+def _read(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def test_out_of_order_chunks_are_written_in_order(tmp_path):
+    """乱序完成的块按索引顺序写出，且只写出连续的前缀"""
+    path = os.path.join(tmp_path, "out", "paper.md")
+    writer = OrderedChunkWriter(path)
+
+    writer.add(1, "B")
+    assert _read(path) == ""
+    assert writer.pending == 1
+
+    writer.add(0, "A")
+    assert _read(path) == "A\n\nB"
+    assert writer.pending == 0
+
+    writer.add(2, "C")
+    writer.close(["Chunk 3 failed"])
+    assert _read(path) == "A\n\nB\n\nC\n\n---\n\n## 翻译错误日志\n\n- Chunk 3 failed\n"
+    assert writer.max_pending == 2
+
+
+def test_matches_joined_output(tmp_path):
+    """流式写出的结果与一次性拼接的结果一致"""
+    chunks = [f"chunk {i}\n" for i in range(10)]
+    path = os.path.join(tmp_path, "paper.md")
+    with OrderedChunkWriter(path) as writer:
+        for i in reversed(range(10)):
+            writer.add(i, chunks[i])
+    assert _read(path) == "\n\n".join(chunks)
+
+
+def test_close_marks_missing_chunks(tmp_path):
+    """关闭时仍有缺失的块会留下标记，而不是丢弃后续内容"""
+    path = os.path.join(tmp_path, "paper.md")
+    writer = OrderedChunkWriter(path)
+    writer.add(0, "A")
+    writer.add(2, "C")
+    writer.close()
+    assert _read(path) == "A\n\n<!-- 缺少块 1~1 -->\n\nC"
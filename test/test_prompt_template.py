@@ -0,0 +1,42 @@
+"""
+测试提示词模板
+"""
+import pytest
+
+from service import prompt_template
+from service.prompt_template import PromptTemplate, TRANSLATE_TEMPLATE, normalize_prompt
+
+
+def test_normalize_prompt_strips_source_indentation():
+    """去掉公共缩进、行尾空白与首尾空行，保留列表的相对缩进"""
+    text = """
+            **任务：** 翻译   
+            1.  **原则:**
+                *   细节
+        """
+    assert normalize_prompt(text) == "**任务：** 翻译\n1.  **原则:**\n    *   细节"
+
+
+def test_messages_share_byte_stable_prefix():
+    """不同的块得到逐字节相同的系统消息与用户消息前缀，原文原样放在末尾"""
+    first = TRANSLATE_TEMPLATE.build_messages("  # 1 Intro\n\tindented text\n")
+    second = TRANSLATE_TEMPLATE.build_messages("Another chunk.")
+
+    assert first[0] == second[0]
+    assert not first[0]["content"].startswith((" ", "\n"))
+    assert first[1]["content"] == "待翻译的英文论文内容：\n  # 1 Intro\n\tindented text\n"
+    assert second[1]["content"].startswith(TRANSLATE_TEMPLATE.user_prefix)
+
+
+def test_chunk_budget_subtracts_prompt_overhead(monkeypatch):
+    """分块预算 = 请求输入上限 - 提示词开销；开销超过上限时报错"""
+    monkeypatch.setattr(prompt_template, "count_tokens", lambda text: len(text.split()))
+    template = PromptTemplate("test", system="  you translate papers  ", user="source: {text}")
+    overhead = 3 + 1 + 2 * prompt_template.MESSAGE_OVERHEAD_TOKENS + prompt_template.REPLY_OVERHEAD_TOKENS
+
+    assert template.overhead_tokens == overhead
+    assert template.chunk_budget(100) == 100 - overhead
+    with pytest.raises(ValueError):
+        template.chunk_budget(overhead)
+    with pytest.raises(ValueError):
+        PromptTemplate("bad", system="x", user="no placeholder")
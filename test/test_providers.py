@@ -0,0 +1,104 @@
+"""
+测试多提供商注册与路由
+"""
+import json
+import os
+
+import pytest
+
+import concurrent_translate
+from service.llm_translate import MODEL_NAME, SYSTEM_PROMPT
+from service.providers import FAILURE_THRESHOLD, Provider, ProviderRouter, load_providers_from_env
+from service.translation_cache import TranslationCache
+
+
+def test_registry_from_env_and_file(tmp_path, monkeypatch):
+    """LLM_PROVIDERS 按名称前缀读取各项配置；配置文件可以用 api_key_env 从环境变量取密钥"""
+    monkeypatch.setenv("LLM_PROVIDERS", "deepseek, backup")
+    monkeypatch.setenv("BACKUP_API_URL", "http://backup/v1")
+    monkeypatch.setenv("BACKUP_API_KEY", "sk-backup")
+    monkeypatch.setenv("BACKUP_MODEL", "qwen")
+    monkeypatch.setenv("BACKUP_MAX_CONCURRENCY", "4")
+    monkeypatch.setenv("BACKUP_RPM", "60")
+    providers = load_providers_from_env()
+    assert [p.name for p in providers] == ["deepseek", "backup"]
+    backup = providers[1]
+    assert (backup.base_url, backup.api_key, backup.model, backup.max_concurrency) == (
+        "http://backup/v1", "sk-backup", "qwen", 4
+    )
+    assert backup.rate_limiter.rpm == 60
+
+    path = os.path.join(tmp_path, "providers.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump([{"name": "a", "base_url": "http://a/v1", "api_key_env": "BACKUP_API_KEY", "max_concurrency": 2}], f)
+    router = ProviderRouter.from_env(path)
+    assert router.providers[0].api_key == "sk-backup"
+    assert router.capacity == 2
+
+    monkeypatch.delenv("LLM_PROVIDERS")
+    monkeypatch.delenv("LLM_PROVIDERS_FILE", raising=False)
+    assert ProviderRouter.from_env() is None
+
+
+def test_router_prefers_faster_provider_with_free_capacity():
+    """延迟低的提供商得分更高；满载时请求转到其他提供商"""
+    fast = Provider("fast", None, None, max_concurrency=2)
+    slow = Provider("slow", None, None, max_concurrency=2)
+    router = ProviderRouter([slow, fast])
+    router.release(router.acquire(), latency=5.0)
+    router.release(router.acquire(), latency=0.5)
+    assert (slow.latency, fast.latency) == (5.0, 0.5)
+
+    picked = [router.acquire() for _ in range(3)]
+    assert [p.name for p in picked] == ["fast", "fast", "slow"]
+    for provider in picked:
+        router.release(provider, latency=1.0)
+
+
+def test_failing_provider_is_tripped_and_requests_fail_over(monkeypatch, make_response):
+    """连续失败的提供商被熔断，重试改由健康的提供商完成"""
+    monkeypatch.setattr(concurrent_translate, "count_tokens_batch", lambda texts: [len(t.split()) for t in texts])
+    broken = Provider("broken", None, None, max_concurrency=1)
+    healthy = Provider("healthy", None, None, max_concurrency=1)
+    # 让 broken 先被选中
+    broken.latency, healthy.latency = 0.1, 1.0
+    router = ProviderRouter([broken, healthy])
+
+    def translate(text, provider=None):
+        if provider is broken:
+            raise RuntimeError("503")
+        return make_response(f"{provider.name}:{text}")
+
+    monkeypatch.setattr(concurrent_translate, "translate_text", translate)
+    chunks = [f"chunk {i}" for i in range(FAILURE_THRESHOLD + 2)]
+    translated, errors = concurrent_translate.translate_chunks_concurrent(
+        chunks, max_workers=1, max_retries=2, router=router, schedule="document"
+    )
+    assert not errors
+    assert translated == [f"healthy:{chunk}" for chunk in chunks]
+    assert broken.errors == FAILURE_THRESHOLD
+    assert broken.down_until > 0 and router.summary()["broken"]["down"]
+
+
+def test_cache_is_keyed_by_router_models(tmp_path, monkeypatch, make_response):
+    """缓存键使用路由器的模型组合，默认模型的缓存不会被其他模型的译文命中"""
+    router = ProviderRouter([Provider("a", None, None, model="qwen"), Provider("b", None, None, model="glm")])
+    assert router.model_name == "glm+qwen"
+    assert ProviderRouter([Provider("a", None, None), Provider("b", None, None)]).model_name == MODEL_NAME
+
+    cache = TranslationCache(os.path.join(tmp_path, "cache.sqlite3"))
+    cache.put(TranslationCache.make_key("chunk", MODEL_NAME, SYSTEM_PROMPT), "默认模型的译文")
+    monkeypatch.setattr(concurrent_translate, "translate_text", lambda text, provider=None: make_response(provider.model))
+    _, translated, _ = concurrent_translate.translate_chunk_with_retry("chunk", 0, cache=cache, router=router)
+    assert translated in ("qwen", "glm")
+    assert cache.get(TranslationCache.make_key("chunk", "glm+qwen", SYSTEM_PROMPT)) == translated
+    cache.close()
+
+
+def test_invalid_configuration_is_rejected():
+    with pytest.raises(ValueError):
+        ProviderRouter([])
+    with pytest.raises(ValueError):
+        ProviderRouter([Provider("a", None, None), Provider("a", None, None)])
+    with pytest.raises(ValueError):
+        Provider("a", None, None, max_concurrency=0)
@@ -0,0 +1,71 @@
+"""
+测试 RPM/TPM 令牌桶限流器
+"""
+import concurrent_translate
+from service.rate_limiter import RateLimiter
+
+
+def test_rpm_budget_blocks_after_burst():
+    """一分钟的请求预算用完后需要等待"""
+    limiter = RateLimiter(rpm=60)
+    for _ in range(60):
+        assert limiter.try_acquire(0) == 0
+    wait = limiter.try_acquire(0)
+    assert 0 < wait <= 1.0
+
+
+def test_tpm_budget_and_settle():
+    """TPM 按 token 扣费，settle 按实际用量退还"""
+    limiter = RateLimiter(tpm=1000)
+    assert limiter.try_acquire(800) == 0
+    assert limiter.try_acquire(800) > 0  # 预算不足时不扣费
+
+    limiter.settle(charged=800, actual=100)
+    assert limiter.try_acquire(800) == 0
+
+
+def test_oversized_request_is_clamped_to_capacity():
+    """超过桶容量的请求按容量扣费，不会永久阻塞"""
+    limiter = RateLimiter(tpm=100)
+    assert limiter.try_acquire(5000) == 0
+
+
+def test_settle_uses_clamped_charge():
+    """settle 按实际扣除的（被截断到桶容量的）token 数结算，超出部分记为欠额"""
+    limiter = RateLimiter(tpm=100)
+    charged = limiter.acquire(5000)
+    assert charged == 100
+    limiter.settle(charged, actual=150)
+    assert limiter.try_acquire(1) > 0
+
+
+def test_from_env(monkeypatch):
+    """按提供商前缀读取环境变量"""
+    monkeypatch.delenv("TESTPROVIDER_RPM", raising=False)
+    monkeypatch.delenv("TESTPROVIDER_TPM", raising=False)
+    assert RateLimiter.from_env("TESTPROVIDER") is None
+
+    monkeypatch.setenv("TESTPROVIDER_TPM", "50000")
+    limiter = RateLimiter.from_env("TESTPROVIDER")
+    assert limiter.rpm is None and limiter.tpm == 50000
+
+
+def test_estimate_failure_is_retried_instead_of_aborting_the_run(monkeypatch, make_response):
+    """估计请求 token 数出错时只算作该块的一次失败尝试，不会中断整个并发翻译"""
+    monkeypatch.setattr(concurrent_translate, "count_tokens_batch", lambda texts: [len(t.split()) for t in texts])
+    calls = []
+
+    def flaky_estimate(text, system_prompt):
+        calls.append(text)
+        if text == "bad chunk" and calls.count(text) == 1:
+            raise ValueError("disallowed special token")
+        return 10
+
+    monkeypatch.setattr(concurrent_translate, "estimate_request_tokens", flaky_estimate)
+    monkeypatch.setattr(concurrent_translate, "translate_text", lambda text: make_response(text.upper()))
+    monkeypatch.setattr(concurrent_translate.time, "sleep", lambda seconds: None)
+    translated, errors = concurrent_translate.translate_chunks_concurrent(
+        ["good chunk", "bad chunk"], max_workers=2, rate_limiter=RateLimiter(tpm=100000)
+    )
+    assert not errors
+    assert translated == ["GOOD CHUNK", "BAD CHUNK"]
@@ -0,0 +1,79 @@
+"""
+测试逐块指标收集与运行报告导出
+"""
+import json
+import os
+from types import SimpleNamespace
+
+import concurrent_translate
+from service.run_metrics import RunMetrics, cached_prompt_tokens
+
+
+def test_summary_aggregates_records():
+    """汇总按状态计数，token 与重试次数累加，延迟分位数只统计成功请求"""
+    metrics = RunMetrics()
+    metrics.record(0, "ok", input_tokens=100, output_tokens=150, latency=1.0, attempts=1, finish_reason="stop")
+    metrics.record(1, "ok", input_tokens=50, output_tokens=80, latency=3.0, attempts=2, finish_reason="length")
+    metrics.record(2, "failed", attempts=3, error="boom")
+    metrics.record(3, "cached")
+    metrics.finish()
+
+    summary = metrics.summary()
+    assert summary["status"] == {"ok": 2, "failed": 1, "cached": 1, "resumed": 0}
+    assert (summary["input_tokens"], summary["output_tokens"]) == (150, 230)
+    assert (summary["requests"], summary["retries"]) == (6, 3)
+    assert summary["finish_reasons"] == {"stop": 1, "length": 1}
+    assert summary["latency_p50"] == 2.0
+    assert summary["latency_max"] == 3.0
+
+
+def test_concurrent_translate_records_usage_and_exports(tmp_path, monkeypatch, make_response):
+    """translate_chunks_concurrent 记录每个块的 usage，并导出 JSON 报告与 Prometheus textfile"""
+    monkeypatch.setattr(concurrent_translate, "count_tokens_batch", lambda texts: [len(t.split()) for t in texts])
+    monkeypatch.setattr(
+        concurrent_translate, "translate_text",
+        lambda text: make_response(text.upper(), prompt_tokens=10 * len(text), completion_tokens=len(text))
+    )
+    chunks = ["a", "bb", "ccc"]
+    metrics = RunMetrics()
+    translated, errors = concurrent_translate.translate_chunks_concurrent(chunks, max_workers=2, metrics=metrics)
+    assert translated == ["A", "BB", "CCC"] and not errors
+
+    records = metrics.records
+    assert [(r["index"], r["input_tokens"], r["output_tokens"], r["attempts"]) for r in records] == [
+        (0, 10, 1, 1), (1, 20, 2, 1), (2, 30, 3, 1)
+    ]
+    assert all(r["finish_reason"] == "stop" and r["queue_wait"] >= 0 for r in records)
+
+    report_path = os.path.join(tmp_path, "paper.report.json")
+    metrics.write_json(report_path, extra={"input": "paper.md"})
+    with open(report_path, encoding='utf-8') as f:
+        report = json.load(f)
+    assert report["input"] == "paper.md"
+    assert report["summary"]["input_tokens"] == 60
+    assert len(report["chunks"]) == 3
+
+    prom_path = os.path.join(tmp_path, "paper.prom")
+    metrics.write_prometheus(prom_path, labels={"paper": 'a "b"'})
+    with open(prom_path, encoding='utf-8') as f:
+        text = f.read()
+    assert '# TYPE paper_translate_tokens gauge' in text
+    assert 'paper_translate_tokens{paper="a \\"b\\"",direction="output"} 6' in text
+    assert 'paper_translate_chunks{paper="a \\"b\\"",status="ok"} 3' in text
+
+
+def test_records_prompt_cache_hits_from_either_usage_format():
+    """DeepSeek 的 prompt_cache_hit_tokens 与 OpenAI 的 prompt_tokens_details.cached_tokens 都计入缓存命中"""
+    deepseek = SimpleNamespace(prompt_cache_hit_tokens=64)
+    openai = SimpleNamespace(prompt_tokens_details=SimpleNamespace(cached_tokens=128))
+    assert cached_prompt_tokens(deepseek) == 64
+    assert cached_prompt_tokens(openai) == 128
+    assert cached_prompt_tokens(SimpleNamespace(prompt_tokens=10)) == 0
+    assert cached_prompt_tokens(None) == 0
+
+    metrics = RunMetrics()
+    metrics.record(0, "ok", input_tokens=300, cached_tokens=192)
+    metrics.record(1, "ok", input_tokens=100)
+    summary = metrics.summary()
+    assert summary["cached_input_tokens"] == 192
+    assert summary["prompt_cache_hit_rate"] == 0.48
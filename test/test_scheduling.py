@@ -0,0 +1,51 @@
+"""
+测试 LPT 调度与均衡分块
+"""
+import chunk_md
+from service.scheduling import lpt_order, simulate_makespan, windowed_lpt_order
+
+
+def test_lpt_beats_document_order_when_big_chunk_is_last():
+    """大块排在最后时，LPT 派发的完成时间更短"""
+    durations = [1, 1, 1, 1, 4]
+    assert lpt_order(durations) == [4, 0, 1, 2, 3]
+    assert simulate_makespan(durations, [0, 1, 2, 3, 4], workers=2) == 6
+    assert simulate_makespan(durations, lpt_order(durations), workers=2) == 4
+
+
+def test_windowed_lpt_delays_no_chunk_beyond_the_window():
+    """窗口内大块优先，但任何块相对文档顺序最多推迟 window - 1 个位置"""
+    weights = [1, 1, 1, 1, 1, 1, 9, 1, 5]
+    order = windowed_lpt_order(weights, window=3)
+    assert sorted(order) == list(range(len(weights)))
+    assert all(position - i <= 2 for position, i in enumerate(order))
+    assert order.index(6) < order.index(4)
+    assert windowed_lpt_order(weights, window=len(weights)) == lpt_order(weights)
+    assert windowed_lpt_order(weights, window=1) == list(range(len(weights)))
+
+
+def test_balanced_merge_keeps_chunk_count_and_lowers_max(monkeypatch):
+    """均衡合并与贪心合并块数相同，但最大块更小"""
+    monkeypatch.setattr(chunk_md, "count_tokens_batch", lambda texts: [len(t.split()) for t in texts])
+    chunks = ["w " * size + "\n" for size in (4, 4, 4, 1, 1, 1)]
+
+    greedy = chunk_md.greedy_merge_chunks(chunks, max_tokens=14)
+    balanced = chunk_md.balanced_merge_chunks(chunks, max_tokens=14)
+
+    assert "".join(balanced) == "".join(chunks)
+    assert len(balanced) == len(greedy) == 2
+    assert max(len(b.split()) for b in balanced) < max(len(g.split()) for g in greedy)
+
+
+def test_oversized_atomic_piece_does_not_disable_balancing(monkeypatch):
+    """无法拆分的超限片段单独成块，其余片段照常均衡"""
+    monkeypatch.setattr(chunk_md, "count_tokens_batch", lambda texts: [len(t.split()) for t in texts])
+    chunks = ["w " * 30 + "\n"] + ["w " * size + "\n" for size in (4, 4, 4, 1, 1, 1)]
+
+    greedy = chunk_md.greedy_merge_chunks(chunks, max_tokens=14)
+    balanced = chunk_md.balanced_merge_chunks(chunks, max_tokens=14)
+
+    assert "".join(balanced) == "".join(chunks)
+    assert len(balanced) == len(greedy) == 3
+    assert balanced[0] == greedy[0] == chunks[0]
+    assert max(len(b.split()) for b in balanced[1:]) < max(len(g.split()) for g in greedy[1:])
@@ -0,0 +1,122 @@
+"""
+测试不需要翻译的片段的占位符替换与还原
+"""
+
+import pytest
+
+import concurrent_translate
+from service.run_metrics import RunMetrics
+from service.span_mask import PlaceholderMismatchError, mask_spans, needs_translation, restore_spans
+
+CHUNK = (
+    "# 3 Method\n"
+    "We minimize $\\mathcal{L}_{total} = a + b$ over $x$, which costs $5 and $10.\n\n"
+    "$$\n\\frac{a}{b} = c\n$$\n\n"
+    "```python\nx = \"$a$\"\n```\n\n"
+    "![](images/abc.jpg)\n\nFigure 1: A picture.\n\n"
+    "<html><body><table><tr><td>Acc</td></tr><tr><td>1.23</td></tr><tr><td>4.56</td></tr></table></body></html>\n\n"
+    "<table><tr><td>This column describes things</td></tr></table>\n"
+)
+
+
+def test_mask_and_restore_round_trip():
+    """公式、代码块、图片与数据表格被替换；短公式、货币金额与文字表格保留给 LLM"""
+    masked, spans = mask_spans(CHUNK)
+
+    assert spans == [
+        "$\\mathcal{L}_{total} = a + b$",
+        "$$\n\\frac{a}{b} = c\n$$",
+        "```python\nx = \"$a$\"\n```",
+        "![](images/abc.jpg)",
+        "<html><body><table><tr><td>Acc</td></tr><tr><td>1.23</td></tr><tr><td>4.56</td></tr></table></body></html>",
+    ]
+    assert "We minimize [[M0]] over $x$, which costs $5 and $10." in masked
+    assert "[[M1]]" in masked and "[[C2]]" in masked and "[[I3]]" in masked and "[[T4]]" in masked
+    assert "This column describes things" in masked
+    assert restore_spans(masked, spans) == CHUNK
+
+
+def test_restore_tolerates_spacing_and_extra_dollars():
+    """模型在占位符内加空格或给公式占位符套上 $ 时仍能还原"""
+    spans = ["$a + b + c + d$", "![](images/x.jpg)"]
+    assert restore_spans("令 $[[ M0 ]]$，见 [[I1]]。", spans) == "令 $a + b + c + d$，见 ![](images/x.jpg)。"
+
+
+def test_restore_rejects_missing_or_duplicated_placeholders():
+    spans = ["$a + b + c + d$", "![](images/x.jpg)"]
+    with pytest.raises(PlaceholderMismatchError):
+        restore_spans("只剩 [[M0]]", spans)
+    with pytest.raises(PlaceholderMismatchError):
+        restore_spans("[[M0]] [[M0]] [[I1]]", spans)
+    with pytest.raises(PlaceholderMismatchError):
+        restore_spans("[[M0]] [[I1]] [[C7]]", spans)
+
+
+def test_text_with_placeholder_like_content_is_not_masked():
+    text = "Literal [[M0]] and $\\alpha + \\beta + \\gamma$.\n"
+    assert mask_spans(text) == (text, [])
+
+
+def test_translate_falls_back_to_unmasked_chunk_when_placeholders_change(monkeypatch, make_response):
+    """译文丢失占位符时，重试改为发送原文；占位符完整时记录替换节省的 token 数"""
+    monkeypatch.setattr(concurrent_translate, "count_tokens", lambda text: len(text))
+    sent = []
+    state = {"drop_placeholders": True}
+
+    def fake_translate(text):
+        sent.append(text)
+        if state.pop("drop_placeholders", False):
+            # 只有第一次请求的译文丢掉全部占位符
+            return make_response("译文")
+        return make_response(text)
+
+    monkeypatch.setattr(concurrent_translate, "translate_text", fake_translate)
+    metrics = RunMetrics()
+    _, translated, error = concurrent_translate.translate_chunk_with_retry(
+        CHUNK, 0, max_retries=3, initial_delay=0, metrics=metrics, mask=True
+    )
+    assert error is None and translated == CHUNK
+    assert "[[M1]]" in sent[0] and sent[1] == CHUNK
+    assert metrics.records[0]["masked_tokens"] == 0
+
+    sent.clear()
+    _, translated, error = concurrent_translate.translate_chunk_with_retry(CHUNK, 1, metrics=metrics, mask=True)
+    assert error is None and translated == CHUNK
+    assert metrics.records[1]["masked_tokens"] == len(CHUNK) - len(sent[0])
+    assert metrics.summary()["masked_tokens"] > 0
+
+
+def test_needs_translation_detects_chunks_without_prose():
+    """只有图片、公式、数字表格或代码的块不需要翻译；图注、标题与文字表格需要翻译"""
+    assert not needs_translation("![](images/a.jpg)\n")
+    assert not needs_translation("$$\nx = \\frac{a}{b}\n$$\n\n$y_i$\n")
+    assert not needs_translation("```\nfor word in words: print(word)\n```\n")
+    assert not needs_translation("<html><body><table><tr><td>1.0</td><td>2.5</td></tr></table></body></html>\n")
+    assert needs_translation("![](images/a.jpg)\n\nFigure 1: Overview of the model.\n")
+    assert needs_translation("# 5 Conclusion\n$$x$$\n")
+    assert needs_translation("<table><tr><td>Some descriptive text cell</td></tr></table>")
+
+
+def test_skipped_chunks_bypass_llm_and_are_counted(monkeypatch, make_response):
+    """没有文字内容的块不调用 LLM，原样输出，并在统计中计入跳过的块数与 token 数"""
+    monkeypatch.setattr(concurrent_translate, "count_tokens", lambda text: len(text))
+    monkeypatch.setattr(concurrent_translate, "count_tokens_batch", lambda texts: [len(t) for t in texts])
+    sent = []
+
+    def fake_translate(text):
+        sent.append(text)
+        return make_response(text.upper())
+
+    monkeypatch.setattr(concurrent_translate, "translate_text", fake_translate)
+    chunks = ["Some prose to translate here.\n", "![](images/a.jpg)\n\n$$\nx\n$$\n"]
+    metrics = RunMetrics()
+    translated, errors = concurrent_translate.translate_chunks_concurrent(
+        chunks, max_workers=2, metrics=metrics, skip_min_words=3
+    )
+
+    assert not errors
+    assert translated == ["SOME PROSE TO TRANSLATE HERE.\n", chunks[1]]
+    assert sent == [chunks[0]]
+    summary = metrics.summary()
+    assert summary["status"]["skipped"] == 1
+    assert summary["skipped_tokens"] == len(chunks[1])
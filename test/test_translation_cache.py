@@ -0,0 +1,68 @@
+"""
+测试持久化翻译缓存
+"""
+import os
+import time
+from service.translation_cache import TranslationCache
+
+
+def test_cache_roundtrip_and_counters(tmp_path):
+    """命中/未命中计数，以及重新打开后仍能读到译文"""
+    db_path = os.path.join(tmp_path, "cache.sqlite3")
+    cache = TranslationCache(db_path)
+    key = TranslationCache.make_key("Hello world.", "deepseek-chat", "prompt")
+
+    assert cache.get(key) is None
+    cache.put(key, "你好，世界。")
+    assert cache.get(key) == "你好，世界。"
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.close()
+
+    reopened = TranslationCache(db_path)
+    assert reopened.get(key) == "你好，世界。"
+    reopened.close()
+
+
+def test_cache_key_depends_on_model_and_prompt():
+    """模型或提示词变化时缓存键必须不同"""
+    base = TranslationCache.make_key("text", "model-a", "prompt")
+    assert base != TranslationCache.make_key("text", "model-b", "prompt")
+    assert base != TranslationCache.make_key("text", "model-a", "prompt v2")
+    # 长度前缀避免拼接歧义
+    assert TranslationCache.make_key("bc", "a", "") != TranslationCache.make_key("c", "ab", "")
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    """超过条目上限时淘汰最久未访问的条目"""
+    cache = TranslationCache(os.path.join(tmp_path, "cache.sqlite3"), max_entries=2)
+    cache.put("a", "A")
+    time.sleep(0.01)
+    cache.put("b", "B")
+    time.sleep(0.01)
+    assert cache.get("a") == "A"  # 刷新 a 的访问时间
+    time.sleep(0.01)
+    cache.put("c", "C")
+
+    assert cache.evict() == 1
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    cache.close()
+
+
+def test_cache_evicts_by_size_and_age(tmp_path):
+    """按总字节数和存活时间淘汰"""
+    cache = TranslationCache(os.path.join(tmp_path, "cache.sqlite3"), max_bytes=10)
+    cache.put("a", "x" * 8)
+    time.sleep(0.01)
+    cache.put("b", "y" * 8)
+    cache.evict()
+    assert cache.get("a") is None
+    assert cache.get("b") == "y" * 8
+    cache.close()
+
+    aged = TranslationCache(os.path.join(tmp_path, "aged.sqlite3"), max_age_days=0)
+    aged.put("a", "A")
+    time.sleep(0.01)
+    assert aged.get("a") is None
+    aged.close()
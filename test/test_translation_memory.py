@@ -0,0 +1,142 @@
+"""
+测试段落级翻译记忆
+"""
+import os
+
+import pytest
+
+import concurrent_translate
+from service.run_metrics import RunMetrics
+from service.translation_memory import MemoryAlignmentError, MemoryPlan, TranslationMemory, split_blocks, split_paragraphs
+
+ACK = "We thank the anonymous reviewers for their helpful comments and suggestions on an earlier draft of this paper."
+ACK_ZH = "我们感谢匿名审稿人对本文早期稿件提出的有益意见和建议。"
+DATA = "The dataset contains 10000 images collected from 50 cities across three continents over two years."
+DATA_ZH = "该数据集包含从三大洲 50 个城市在两年内收集的 10000 张图像。"
+
+
+def test_split_paragraphs_keeps_code_and_display_math_together():
+    """每个非空行是一个段落，代码块与 $$ 公式跨越的多行不拆开"""
+    text = "First para.\nSecond para.\n\n```python\nx = 1\n\ny = 2\n```\n$$\na\nb\n$$\nInline $$x$$ here.\nLast."
+    assert split_paragraphs(text) == [
+        "First para.", "Second para.", "```python\nx = 1\n\ny = 2\n```", "$$\na\nb\n$$", "Inline $$x$$ here.", "Last."
+    ]
+
+
+def test_split_blocks_keeps_tables_lists_and_separators():
+    """连续的表格行与列表项各为一个段落，并记录段落之间原有的分隔符"""
+    text = "Intro.\n| a | b |\n| 1 | 2 |\n- item one\n- item two\n  continued\n\n\nOutro."
+    assert split_blocks(text) == (
+        ["Intro.", "| a | b |\n| 1 | 2 |", "- item one\n- item two\n  continued", "Outro."],
+        ["\n", "\n", "\n\n\n"],
+    )
+
+
+def test_merge_restores_original_layout_and_rejects_misaligned_paragraphs():
+    """拼接按原文的分隔符还原排版；段落数相同但数字对不上的译文视为错位"""
+    plan = MemoryPlan(["# Data", DATA, ACK], ["# 数据", None, ACK_ZH], ["\n", "\n"])
+    assert plan.pending_text() == DATA
+    assert plan.merge(DATA_ZH) == f"# 数据\n{DATA_ZH}\n{ACK_ZH}"
+    with pytest.raises(MemoryAlignmentError):
+        plan.merge("该数据集包含大量图像。")
+
+
+def test_add_skips_misaligned_pairs(tmp_path):
+    """段落数相同但内容错位的段落对不写入记忆"""
+    memory = TranslationMemory(os.path.join(tmp_path, "memory.sqlite3"))
+    assert memory.add(f"{ACK}\n{DATA}", f"{DATA_ZH}\n{ACK_ZH}") == 0
+    assert memory.add(f"{ACK}\n{DATA}", f"{ACK_ZH}\n{DATA_ZH}") == 2
+    memory.close()
+
+
+def test_exact_and_near_duplicate_lookup(tmp_path):
+    """相同段落精确命中；只有大小写、空白或标点差异的段落近似命中；数字不同或模型不同的段落不命中"""
+    db_path = os.path.join(tmp_path, "memory.sqlite3")
+    memory = TranslationMemory(db_path, model="m", system_prompt="p")
+    assert memory.add(f"# Acknowledgments\n\n{ACK}\n\n{DATA}", f"# 致谢\n\n{ACK_ZH}\n\n{DATA_ZH}") == 3
+    memory.close()
+
+    memory = TranslationMemory(db_path, model="m", system_prompt="p")
+    plan = memory.lookup(f"{ACK}\n\n![](images/fig1.png)")
+    assert plan.complete and plan.merge("") == f"{ACK_ZH}\n\n![](images/fig1.png)"
+
+    # 大小写、空白与句末标点不同（OCR 结果常见的差异）
+    near = ACK.replace("anonymous", "Anonymous").replace("comments and", "comments  and").rstrip(".")
+    assert memory.lookup(near).matches == [ACK_ZH]
+    assert (memory.exact_hits, memory.near_hits) == (1, 1)
+    assert memory.lookup(DATA.replace("10000", "20000")).matches == [None]
+    memory.close()
+
+    other_model = TranslationMemory(db_path, model="other", system_prompt="p")
+    assert not other_model.lookup(ACK).complete
+    other_model.close()
+
+
+LONG = (
+    "Across all six benchmarks, the proposed curriculum schedule consistently improves the final accuracy of the "
+    "student model while the training loss remains stable throughout optimization. We attribute this behaviour to "
+    "the gradual exposure to harder examples, which prevents the early layers from overfitting to easy patterns. "
+    "The gains are largest on the reading comprehension tasks, where long contexts make the hard examples "
+    "particularly informative, and smaller on the classification tasks, where most examples are already easy."
+)
+LONG_ZH = "在全部六个基准上，所提出的课程调度始终提升学生模型的最终准确率，同时训练损失在整个优化过程中保持稳定。"
+
+
+def test_one_word_edit_in_long_paragraph_is_not_a_near_hit(tmp_path):
+    """长段落中替换一个反义词时 Jaccard 仍高于阈值，但意思相反，不能复用旧译文"""
+    memory = TranslationMemory(os.path.join(tmp_path, "memory.sqlite3"))
+    assert memory.add(LONG, LONG_ZH) == 1
+    for old, new in (("consistently improves", "consistently degrades"), ("remains stable", "becomes unstable"),
+                     ("largest on", "smallest on")):
+        edited = LONG.replace(old, new)
+        assert edited != LONG
+        assert not memory.lookup(edited).complete
+    # 只有大小写与标点不同的仍然命中
+    assert memory.lookup(LONG.upper().replace(",", "")).complete
+    memory.close()
+
+
+def test_partially_covered_chunk_sends_only_remaining_paragraphs(tmp_path, monkeypatch, make_response):
+    """部分段落命中时只发送其余段落并拼回整块译文；整块命中时不调用 LLM"""
+    monkeypatch.setattr(concurrent_translate, "count_tokens", lambda text: len(text.split()))
+    memory = TranslationMemory(os.path.join(tmp_path, "memory.sqlite3"))
+    memory.add(ACK, ACK_ZH)
+    sent = []
+
+    def translate(text):
+        sent.append(text)
+        return make_response(DATA_ZH if text == DATA else "译文")
+
+    monkeypatch.setattr(concurrent_translate, "translate_text", translate)
+    metrics = RunMetrics()
+    chunk = f"{DATA}\n\n{ACK}"
+    _, translated, error = concurrent_translate.translate_chunk_with_retry(chunk, 0, memory=memory, metrics=metrics)
+    assert error is None
+    assert sent == [DATA]
+    assert translated == f"{DATA_ZH}\n\n{ACK_ZH}"
+    assert metrics.records[0]["memory_tokens"] == len(ACK.split())
+
+    # 新翻译的段落已写回记忆，再次翻译同一块不再调用 LLM
+    _, again, _ = concurrent_translate.translate_chunk_with_retry(chunk, 1, memory=memory, metrics=metrics)
+    assert again == translated and len(sent) == 1
+    assert metrics.records[1]["status"] == "memory"
+    memory.close()
+
+
+def test_paragraph_mismatch_falls_back_to_whole_chunk(tmp_path, monkeypatch, make_response):
+    """模型合并了段落导致无法拼接时，下一次尝试发送整块原文"""
+    memory = TranslationMemory(os.path.join(tmp_path, "memory.sqlite3"))
+    memory.add(ACK, ACK_ZH)
+    sent = []
+
+    def translate(text):
+        sent.append(text)
+        return make_response("合并后的一段译文" if len(sent) == 1 else "整块译文")
+
+    monkeypatch.setattr(concurrent_translate, "translate_text", translate)
+    chunk = f"{DATA}\n\nSecond new paragraph with words.\n\n{ACK}"
+    _, translated, error = concurrent_translate.translate_chunk_with_retry(chunk, 0, initial_delay=0, memory=memory)
+    assert error is None
+    assert sent == [f"{DATA}\n\nSecond new paragraph with words.", chunk]
+    assert translated == "整块译文"
+    memory.close()